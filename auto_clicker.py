@@ -17,5 +17,10 @@ from autoclicker.app import main
 
 
 if __name__ == "__main__":
+    # Needed by the frozen executable for the pipelined (multi-process) mode.
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+
     # CLI args are currently ignored; keep behavior compatible with prior versions.
     main()
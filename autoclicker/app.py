@@ -1,29 +1,126 @@
 from __future__ import annotations
 
+import itertools
 import os
 import sys
 import time
 import traceback
+from typing import Callable
 
 import pyscreeze
 
-from .config import load_config
-from .capture import VirtualDesktopCapture
-from .click import click
-from .log_images import ClickLogInfo, save_annotated_click_screenshot
-from .match import MultiScaleTemplateMatcher
-from .paths import list_target_images, resource_path
+from .config import AppConfig, load_config
+from .cooldowns import CooldownTracker
+from .capture import CaptureResult, VirtualDesktopCapture, VirtualDesktopGeometry
+from .changes import FrameChangeDetector
+from .click import ClickBackend, RecordingClickBackend, create_click_backend
+from .hitstats import hit_stats_from_config
+from .log_images import ClickLogInfo, ClickLogOptions, ClickLogWriter
+from .match import PreparedHaystack, matcher_from_config
+from .metrics import Metrics, MetricsExporter
+from .monitors import LAYOUT_POLL, MonitorScan
+from .parallel import ParallelMatcher, TargetHit, find_first
+from .paths import data_path, resource_path
+from .recording import FrameRecorder
+from .regions import Rect
+from .replay import ReplayCaptureBackend, ReplayFinished, replay_backend_from_config
+from .scheduler import AdaptiveScheduler
+from .targets import TargetIndex
+from .template_store import TemplateStore
+
+# Pixels a hit may have moved on the re-captured frame and still be clicked.
+RECHECK_TOLERANCE = 2
 
 
 class AutoClickerApp:
-    def __init__(self):
-        self.config = load_config()
-        self.capture = VirtualDesktopCapture()
-        self.matcher = MultiScaleTemplateMatcher(
-            confidence=self.config.confidence,
-            grayscale=self.config.grayscale,
-            scales=self.config.scales,
+    def __init__(
+        self,
+        config: AppConfig | None = None,
+        capture: VirtualDesktopCapture | None = None,
+        clicker=None,
+    ):
+        # `capture` and `clicker` are injectable so benchmarks can run the loop headless.
+        self.config = config or load_config()
+        if capture is None:
+            backend = self.config.capture_backend
+            capture = VirtualDesktopCapture(replay_backend_from_config(self.config) if backend == "replay" else backend)
+        self.capture = capture
+        # Set when frames come from a recording instead of the screen.
+        self.replay = capture.backend if isinstance(capture.backend, ReplayCaptureBackend) else None
+        if clicker is None and self.replay is not None and self.config.click_backend == "record":
+            # Every click of the replay is kept for the final check.
+            clicker = RecordingClickBackend(limit=0)
+        self._click = clicker or create_click_backend(self.config.click_backend)
+        # None when instrumentation is off; every hot-path timer checks this first.
+        self.metrics = Metrics() if self.config.metrics else None
+        self.metrics_exporter = None
+        self.matcher = matcher_from_config(self.config, metrics=self.metrics)
+        self.click_log = (
+            ClickLogWriter(
+                self.config.log_dir,
+                ClickLogOptions(
+                    mode=self.config.log_mode,
+                    crop_size=self.config.log_crop_size,
+                    max_width=self.config.log_max_width,
+                    format=self.config.log_format,
+                    quality=self.config.log_quality,
+                    png_compress_level=self.config.log_png_level,
+                ),
+                queue_size=self.config.log_queue,
+                max_files=self.config.log_max_files,
+                max_bytes=int(self.config.log_max_mb * 1024 * 1024),
+                metrics=self.metrics,
+            )
+            if self.config.log_clicks
+            else None
+        )
+        self.recorder = (
+            FrameRecorder(
+                self.config.record_dir,
+                max_memory_bytes=int(self.config.record_memory_mb * 1024 * 1024),
+                max_disk_bytes=int(self.config.record_max_mb * 1024 * 1024),
+            )
+            if self.config.record_dir
+            else None
+        )
+        self.parallel = (
+            ParallelMatcher(self.matcher, workers=self.config.match_workers) if self.config.match_workers > 1 else None
+        )
+        self.pipeline = None
+        self.targets: TargetIndex | None = None
+        self._logged_scan_error = False
+        # stream -> `TargetIndex.generation` at its last scan
+        self._targets_seen: dict[str, int] = {}
+        self.change_detector = (
+            FrameChangeDetector(tile_size=self.config.change_tile_size) if self.config.change_detection else None
+        )
+        # Per-target hit rate, search time and last hit; orders and paces the scan.
+        self.hit_stats = (
+            hit_stats_from_config(self.config) if self.config.hit_order or self.config.cold_every else None
+        )
+        self.cooldowns = CooldownTracker(
+            target_cooldown=self.config.click_delay,
+            location_cooldown=self.config.location_cooldown,
+            radius=self.config.location_radius,
         )
+        # Change detector verdict for the last scan (None without change detection).
+        self.last_frame_changed: bool | None = None
+        self.scheduler = (
+            AdaptiveScheduler(
+                min_interval=self.config.scan_min_interval,
+                max_interval=self.config.scan_max_interval,
+                backoff=self.config.scan_backoff,
+                cpu_budget=self.config.cpu_budget,
+            )
+            if self.config.adaptive_scan
+            else None
+        )
+        # Per-monitor scan state in `monitors` capture mode.
+        self.monitor_scans: list[MonitorScan] = []
+        self._monitor_geometries: tuple[VirtualDesktopGeometry, ...] | None = None
+        self._monitor_desktop: VirtualDesktopGeometry | None = None
+        # DPI scale of desktop-mode frames, when every monitor shares one.
+        self._desktop_dpi: float | None = None
 
     def run(self) -> None:
         targets_dir = resource_path("targets")
@@ -33,78 +130,612 @@ class AutoClickerApp:
             print(f"Error: Directory '{targets_dir}' not found.")
             return
 
-        image_paths = list_target_images(targets_dir)
+        self.targets = TargetIndex(
+            targets_dir,
+            self.matcher,
+            store=TemplateStore(data_path(self.config.template_cache)) if self.config.template_cache else None,
+            poll_interval=self.config.targets_poll_interval,
+        )
+        # The first load happens up front, so every template is ready before the first frame.
+        self.targets.refresh()
+        image_paths = self.targets.targets
         if not image_paths:
             print("No .png images found in the 'targets' directory.")
             return
 
         print(f"Found {len(image_paths)} images: {[name for name, _ in image_paths]}")
+        store_info = f" ({self.targets.store.stats.summary()})" if self.targets.store is not None else ""
+        print(f"Templates ready in {self.targets.stats.last_apply_ms:.0f} ms{store_info}.")
         print("Started looking for buttons... Press Ctrl+C to stop.")
 
-        logged_scan_error = False
-        logged_not_found_hint = False
+        if self.config.pipeline:
+            # Matcher processes get a fixed target list; changes to targets/ need a restart.
+            self.targets.close()
+            if self.hit_stats is not None and self.config.hit_order:
+                # Ordered once, by the statistics of earlier runs.
+                image_paths = self.hit_stats.order(image_paths, self._priority)
+        else:
+            self.targets.start()
+        self._start_metrics()
+        try:
+            if self.config.pipeline:
+                self._pipeline_loop(image_paths)
+            elif self.config.capture_mode == "monitors":
+                self._monitor_loop()
+            else:
+                if self.matcher.dpi_model is not None:
+                    self._desktop_dpi = self._uniform_dpi_scale()
+                self._scan_loop()
+        except ReplayFinished:
+            self._finish_replay()
+        finally:
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.close()
+            self.targets.close()
+            if self.parallel is not None:
+                self.parallel.close()
+            if self.click_log is not None:
+                self.click_log.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.hit_stats is not None:
+                self.hit_stats.save()
+            self.capture.close()
+
+    def _start_metrics(self) -> None:
+        if self.metrics is None or not (self.config.metrics_file or self.config.metrics_port):
+            return
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            path=self.config.metrics_file,
+            interval=self.config.metrics_interval,
+            port=self.config.metrics_port,
+        )
+        self.metrics_exporter.start()
+        where = []
+        if self.config.metrics_file:
+            where.append(os.path.abspath(self.config.metrics_file))
+        if self.config.metrics_port:
+            where.append(f"http://127.0.0.1:{self.config.metrics_port}/metrics")
+        print(f"Metrics export: {', '.join(where)}")
+
+    def _scan_loop(self) -> None:
+        last_stats = time.perf_counter()
 
         while True:
             loop_start = time.perf_counter()
-            clicked_this_loop = False
+            cpu_start = time.process_time()
 
-            capture = self.capture.screenshot()
-            screenshot_img = capture.image
-            geom = capture.geometry
-            origin_x, origin_y = geom.left, geom.top
+            if self.config.stats_interval > 0 and loop_start - last_stats >= self.config.stats_interval:
+                last_stats = loop_start
+                self._print_stats()
 
-            for img_name, img_path in image_paths:
-                try:
-                    found, found_scale = self.matcher.locate_center(img_path, screenshot_img)
-                    if not found:
-                        continue
-
-                    x, y = (found.x, found.y) if hasattr(found, "x") else (found[0], found[1])
-                    click_point = (int(x + origin_x), int(y + origin_y))
-
-                    if found_scale and found_scale != 1.0:
-                        print(f"Button '{img_name}' found at {click_point} (scale={found_scale}). Clicking...")
-                    else:
-                        print(f"Button '{img_name}' found at {click_point}. Clicking...")
-
-                    if self.config.log_clicks:
-                        try:
-                            saved = save_annotated_click_screenshot(
-                                screenshot_img=screenshot_img,
-                                geometry=geom,
-                                info=ClickLogInfo(
-                                    target_name=img_name,
-                                    click_point_screen=(int(click_point[0]), int(click_point[1])),
-                                    found_scale=float(found_scale) if found_scale is not None else None,
-                                ),
-                                log_dir=self.config.log_dir,
-                            )
-                            print(f"Saved click log: {saved}")
-                        except Exception as log_e:
-                            print(f"Warning: failed to save click log: {type(log_e).__name__}: {log_e}")
-
-                    click(click_point, geometry=geom)
-                    clicked_this_loop = True
-                    break
-
-                except pyscreeze.ImageNotFoundException as not_found:
+            # Clicked targets cool down on their own; the loop itself never stalls.
+            hits = self.scan_once()
+            wall = time.perf_counter() - loop_start
+            cpu = time.process_time() - cpu_start
+
+            if self.replay is not None and not self.replay.paced:
+                # Unpaced replay measures throughput; the next frame is due at once.
+                continue
+            if self.scheduler is None:
+                self._throttle(loop_start)
+                continue
+            delay = self.scheduler.next_delay(wall, cpu, bool(hits), self.last_frame_changed)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _monitor_loop(self) -> None:
+        last_stats = time.perf_counter()
+        last_layout = -LAYOUT_POLL
+
+        while True:
+            now = time.perf_counter()
+            if self.config.stats_interval > 0 and now - last_stats >= self.config.stats_interval:
+                last_stats = now
+                self._print_stats()
+            if now - last_layout >= LAYOUT_POLL:
+                last_layout = now
+                self._refresh_monitors()
+                if not self.monitor_scans:
+                    print("Monitors cannot be told apart by this capture backend; scanning the whole desktop.")
+                    self._scan_loop()
+                    return
+
+            for scan in self.monitor_scans:
+                loop_start = time.perf_counter()
+                if scan.next_due > loop_start:
+                    continue
+                cpu_start = time.process_time()
+                hits = self.scan_monitor(scan)
+                wall = time.perf_counter() - loop_start
+                cpu = time.process_time() - cpu_start
+                if scan.scheduler is None:
+                    delay = max(0.0, float(self.config.scan_interval) - wall)
+                else:
+                    delay = scan.scheduler.next_delay(wall, cpu, bool(hits), self.last_frame_changed)
+                if self.replay is not None and not self.replay.paced:
+                    delay = 0.0
+                scan.next_due = time.perf_counter() + delay
+
+            sleep_for = min(scan.next_due for scan in self.monitor_scans) - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(min(sleep_for, LAYOUT_POLL))
+
+    def _refresh_monitors(self) -> None:
+        """(Re)build per-monitor scan state when the monitor layout changed."""
+
+        try:
+            monitors = self.capture.monitors()
+        except Exception as e:
+            self._on_scan_error("monitor layout", e)
+            return
+        if [s.info for s in self.monitor_scans] == monitors:
+            return
+
+        # Each monitor gets its share of the CPU budget.
+        budget = self.config.cpu_budget / max(1, len(monitors))
+        self.monitor_scans = [
+            MonitorScan(
+                info,
+                FrameChangeDetector(tile_size=self.config.change_tile_size) if self.config.change_detection else None,
+                (
+                    AdaptiveScheduler(
+                        min_interval=self.config.scan_min_interval,
+                        max_interval=self.config.scan_max_interval,
+                        backoff=self.config.scan_backoff,
+                        cpu_budget=budget,
+                    )
+                    if self.config.adaptive_scan
+                    else None
+                ),
+            )
+            for info in monitors
+        ]
+        self._monitor_geometries = tuple(info.geometry for info in monitors)
+        if isinstance(self._click, ClickBackend):
+            # Cached screen metrics and cursor compensation belong to the old layout.
+            self._click.invalidate()
+        if self.monitor_scans:
+            g = self._monitor_geometries
+            left, top = min(m.left for m in g), min(m.top for m in g)
+            right, bottom = max(m.left + m.width for m in g), max(m.top + m.height for m in g)
+            self._monitor_desktop = VirtualDesktopGeometry(left, top, right - left, bottom - top)
+            print(f"Scanning {len(monitors)} monitor(s): {'; '.join(s.label for s in self.monitor_scans)}")
+
+    def _uniform_dpi_scale(self) -> float | None:
+        """The DPI scale every monitor shares, or None if they differ or are unknown."""
+
+        try:
+            scales = {info.dpi_scale for info in self.capture.monitors()}
+        except Exception:
+            return None
+        return scales.pop() if len(scales) == 1 else None
+
+    def scan_monitor(self, scan: MonitorScan) -> list[TargetHit]:
+        """Capture one monitor, search it for the targets that can appear there, and click.
+
+        Works like `scan_once` with that monitor's own change detector. A
+        monitor no target can appear on is not captured at all.
+        """
+
+        t0 = time.perf_counter()
+        self.last_frame_changed = None
+        if self.cooldowns.release():
+            for other in self.monitor_scans:
+                if other.change_detector is not None:
+                    other.change_detector.reset()
+
+        relevant = scan.targets_for(self.targets.targets, self.matcher, self._monitor_geometries, self._monitor_desktop)
+        if not relevant:
+            scan.stats.idle += 1
+            return []
+
+        capture = self.capture.grab_monitor(scan.info)
+        scan.stats.scans += 1
+        hits = self._scan_capture(
+            capture,
+            scan.change_detector,
+            self.cooldowns.ready(relevant),
+            t0,
+            dpi_scale=scan.info.dpi_scale,
+            stream=scan.label,
+            recapture=lambda: self.capture.grab_monitor(scan.info),
+        )
+        scan.stats.hits += len(hits)
+        return hits
+
+    def scan_once(self) -> list[TargetHit]:
+        """Capture one frame, search it, and click its hits. Returns the clicked hits.
+
+        Targets still cooling down from an earlier click are not searched; the
+        rest are searched by priority, then by hit statistics (see
+        `hitstats.py`), which may also skip cold targets on some scans.
+        Targets added or replaced in `targets/` since the last scan are
+        searched on the whole frame once, even if it is unchanged. After
+        a hit, the targets listed after it are searched again in the same frame
+        (with `find_all`, every match of every target is found at once). With
+        `max_clicks_per_frame` above 1, each further hit is clicked only if a
+        freshly captured frame still shows it in the same place.
+        """
+
+        t0 = time.perf_counter()
+        self.last_frame_changed = None
+        # A target whose cooldown just ended may still be on an unchanged screen;
+        # rescan the full frame so it is retried.
+        if self.cooldowns.release() and self.change_detector is not None:
+            self.change_detector.reset()
+        capture = self.capture.screenshot()
+        return self._scan_capture(
+            capture,
+            self.change_detector,
+            self.cooldowns.ready(self.targets.targets),
+            t0,
+            dpi_scale=self._desktop_dpi,
+            recapture=self.capture.screenshot,
+        )
+
+    def _scan_capture(
+        self,
+        capture,
+        detector: FrameChangeDetector | None,
+        pending,
+        t0: float,
+        dpi_scale: float | None = None,
+        stream: str = "",
+        recapture: Callable[[], CaptureResult] | None = None,
+    ) -> list[TargetHit]:
+        m = self.metrics
+        if m is not None:
+            m.incr("scans")
+            t1 = time.perf_counter()
+            m.stage("capture", t1 - t0)
+
+        # Only search what changed since the previous frame; skip unchanged frames entirely.
+        regions = None
+        changed = True
+        if detector is not None:
+            change = detector.update(capture.pixels)
+            self.last_frame_changed = changed = change.changed
+            if m is not None:
+                m.stage("detect", time.perf_counter() - t1)
+            if changed and not change.full:
+                regions = change.dirty
+        catch_up = []
+        fresh = self._fresh_targets(stream)
+        if fresh:
+            # New or replaced images may have been on screen all along; the dirty regions say nothing about them.
+            catch_up = [t for t in pending if t[1] in fresh]
+            pending = [t for t in pending if t[1] not in fresh]
+        if self.hit_stats is not None:
+            if self.config.hit_order:
+                pending = self.hit_stats.order(pending, self._priority)
+            pending, cold = self.hit_stats.sample(pending, changed, self._priority, stream)
+            catch_up += cold
+        if not changed:
+            if not catch_up:
+                if m is not None:
+                    m.incr("skips")
+                return []
+            # Only fresh targets and cold ones that missed an earlier change are searched.
+            pending = []
+        if changed and self.recorder is not None:
+            # Unchanged frames are skipped above, so only new screen content is recorded.
+            self.recorder.submit(capture)
+
+        # Converted to BGR/gray at most once, shared by every target.
+        haystack = PreparedHaystack(
+            capture.pixels,
+            metrics=m,
+            geometry=capture.geometry,
+            monitors=self._monitor_geometries,
+            desktop=capture.desktop,
+            dpi_scale=dpi_scale,
+        )
+
+        clicked: list[TargetHit] = []
+        hits = self._frame_hits(pending, haystack, regions)
+        if catch_up:
+            # Searched on the whole frame: the dirty regions say nothing about these targets.
+            hits = itertools.chain(hits, self._frame_hits(catch_up, haystack, None))
+        for hit in hits:
+            if m is not None:
+                m.incr("hits")
+            point = (int(hit.found[0] + capture.geometry.left), int(hit.found[1] + capture.geometry.top))
+            if self.cooldowns.location_cooling(point):
+                continue
+            frame = capture
+            if clicked:
+                # The last click may have changed the screen; only click what is still there.
+                frame = self._recheck(hit, capture, recapture, dpi_scale)
+                if frame is None:
+                    self.cooldowns.stats.stale_hits += 1
                     continue
+            try:
+                self._click_hit(hit, frame.geometry, frame.pixels, desktop=frame.desktop_geometry)
+            except Exception as e:
+                self._on_scan_error(hit.name, e)
+                continue
+            self.cooldowns.note_click(hit.path, point)
+            clicked.append(hit)
+            if len(clicked) >= self.config.max_clicks_per_frame:
+                break
+
+        if clicked:
+            # Re-scan the whole next frame, so a click that had no visible
+            # effect is retried instead of being masked as "unchanged".
+            if detector is not None:
+                detector.reset()
+            if len(clicked) > 1:
+                self.cooldowns.stats.multi_click_frames += 1
+        if m is not None:
+            m.stage("scan", time.perf_counter() - t0)
+        return clicked
+
+    def _recheck(
+        self, hit: TargetHit, capture: CaptureResult, recapture, dpi_scale: float | None
+    ) -> CaptureResult | None:
+        """A new frame that still shows `hit` where `capture` did, or None."""
+
+        if recapture is None:
+            return None
+        try:
+            fresh = recapture()
+        except Exception as e:
+            self._on_scan_error(hit.name, e)
+            return None
+        if fresh.geometry != capture.geometry:
+            return None
+        haystack = PreparedHaystack(
+            fresh.pixels,
+            metrics=self.metrics,
+            geometry=fresh.geometry,
+            monitors=self._monitor_geometries,
+            desktop=fresh.desktop,
+            dpi_scale=dpi_scale,
+        )
+        x, y = hit.found
+        scale = hit.scale if hit.scale is not None else 1.0
+        # Searched around the old center only, at the scale it was found at, and
+        # located the way the hit was: response peaks with `find_all`, else the
+        # first location above the confidence (the same one on an unchanged frame).
+        window = [Rect(x, y, x + 1, y + 1)]
+        try:
+            if self.config.find_all:
+                matches = self.matcher.locate_all(hit.path, haystack, window, scales=[scale])
+                centers = [match.center for match in matches]
+                found = min(centers, key=lambda c: max(abs(c[0] - x), abs(c[1] - y)), default=None)
+            else:
+                found = self.matcher.locate_at_scale(hit.path, haystack, scale, window)
+        except Exception as e:
+            self._on_scan_error(hit.name, e)
+            return None
+        if found is None or max(abs(found[0] - x), abs(found[1] - y)) > RECHECK_TOLERANCE:
+            return None
+        return fresh
+
+    def _fresh_targets(self, stream: str) -> set[str]:
+        """Paths added or rebuilt in the target index since the last scan of `stream`."""
+
+        if self.targets is None:
+            return set()
+        generation = self.targets.generation
+        seen = self._targets_seen.get(stream)
+        self._targets_seen[stream] = generation
+        if seen is None or seen == generation:
+            # A stream's first frame is searched in full anyway.
+            return set()
+        return self.targets.changed_since(seen)
 
-                except Exception as inner_e:
-                    if not logged_scan_error:
-                        logged_scan_error = True
-                        print(f"Scan error (first occurrence): {type(inner_e).__name__}: {inner_e}")
+    def _pipeline_loop(self, image_paths: list[tuple[str, str]]) -> None:
+        from .pipeline import CaptureMatchPipeline
+
+        self.pipeline = CaptureMatchPipeline(
+            self.config, image_paths, matchers=self.config.pipeline_matchers, backend=self.replay
+        )
+        self.pipeline.start()
+        print(f"Pipelined mode: 1 capture process, {self.config.pipeline_matchers} matcher process(es).")
+
+        last_stats = time.perf_counter()
+        ignore_before = 0.0
+        try:
+            while True:
+                now = time.perf_counter()
+                if self.config.stats_interval > 0 and now - last_stats >= self.config.stats_interval:
+                    last_stats = now
+                    self._print_stats()
+
+                result = self.pipeline.next_result(timeout=1.0)
+                if result is None and self.pipeline.capture_finished:
+                    raise ReplayFinished("the capture process has no more frames")
+                for search in result.searches if result is not None else ():
+                    self._note_search(*search)
+                # Frames captured before the last click's cool-down ended are stale.
+                if result is None or result.hit is None or result.captured_at < ignore_before:
                     continue
 
-            # If we clicked, honor an explicit cool-down first.
-            if clicked_this_loop:
+                try:
+                    self._click_hit(result.hit, result.geometry)
+                except Exception as e:
+                    self._on_scan_error(result.hit.name, e)
+                    continue
+                self.pipeline.note_click(result)
+                if self.replay is not None and not self.replay.paced:
+                    # Recorded frames are not stale: each one shows a later moment of the recording.
+                    continue
                 time.sleep(self.config.click_delay)
+                ignore_before = time.perf_counter()
+        finally:
+            self.pipeline.close()
 
-            # Throttle scanning to reduce CPU usage.
-            elapsed = time.perf_counter() - loop_start
-            sleep_for = float(self.config.scan_interval) - elapsed
-            if sleep_for > 0:
-                time.sleep(sleep_for)
+    def _on_scan_error(self, name: str, error: Exception) -> None:
+        if isinstance(error, pyscreeze.ImageNotFoundException):
+            return
+        if self.metrics is not None:
+            self.metrics.incr("errors")
+        if not self._logged_scan_error:
+            self._logged_scan_error = True
+            print(f"Scan error (first occurrence): {type(error).__name__}: {error}")
+
+    def _frame_hits(self, targets: list[tuple[str, str]], haystack: PreparedHaystack, regions):
+        """Hits in one frame, lazily, in target order (and reading order within a target)."""
+
+        m = self.metrics
+        if self.config.find_all:
+            for index, (name, path) in enumerate(targets):
+                start = time.perf_counter()
+                try:
+                    matches = self.matcher.locate_all(path, haystack, regions)
+                except Exception as e:
+                    self._on_scan_error(name, e)
+                    continue
+                self._note_search(name, bool(matches), time.perf_counter() - start)
+                for match in matches:
+                    yield TargetHit(index, name, path, match.center, match.scale)
+            return
+
+        pending = targets
+        while pending:
+            t2 = time.perf_counter() if m is not None else 0.0
+            hit = self._find_first(pending, haystack, regions)
+            if m is not None:
+                m.stage("match", time.perf_counter() - t2)
+            if hit is None:
+                return
+            yield hit
+            # Only targets after the hit can still be on screen unclicked.
+            pending = pending[hit.index + 1 :]
+
+    def _find_first(self, image_paths: list[tuple[str, str]], haystack: PreparedHaystack, regions) -> TargetHit | None:
+        on_search = self._note_search if self.hit_stats is not None else None
+        if self.parallel is not None:
+            return self.parallel.locate_first(
+                image_paths, haystack, regions, on_error=self._on_scan_error, on_search=on_search
+            )
+        return find_first(self.matcher, image_paths, haystack, regions, on_error=self._on_scan_error, on_search=on_search)
+
+    def _note_search(self, name: str, hit: bool, seconds: float) -> None:
+        if self.hit_stats is not None:
+            self.hit_stats.note_search(name, hit, seconds)
+
+    def _priority(self, path: str) -> int:
+        profile = self.matcher.profiles.get(path)
+        return profile.priority if profile is not None else 0
+
+    def _click_hit(
+        self,
+        hit: TargetHit,
+        geom: VirtualDesktopGeometry,
+        pixels=None,
+        desktop: VirtualDesktopGeometry | None = None,
+    ) -> None:
+        """Click a hit found in a frame showing `geom`.
+
+        `pixels` is the BGRA frame it was found in, for click logging, if
+        available. `desktop` is the whole virtual desktop when the frame is a
+        single monitor.
+        """
+
+        click_point = (int(hit.found[0] + geom.left), int(hit.found[1] + geom.top))
+        found_scale = hit.scale
+
+        if found_scale and found_scale != 1.0:
+            print(f"Button '{hit.name}' found at {click_point} (scale={found_scale}). Clicking...")
+        else:
+            print(f"Button '{hit.name}' found at {click_point}. Clicking...")
+
+        if self.click_log is not None and pixels is None:
+            print("Click logging is not available in pipelined mode (the frame lives in the capture process).")
+        elif self.click_log is not None:
+            # Only enqueued here; cropping, encoding and writing happen on the writer thread.
+            log_start = time.perf_counter()
+            self.click_log.submit(
+                pixels,
+                geom,
+                ClickLogInfo(
+                    target_name=hit.name,
+                    click_point_screen=(int(click_point[0]), int(click_point[1])),
+                    found_scale=float(found_scale) if found_scale is not None else None,
+                    clicked_at=time.time(),
+                ),
+            )
+            if self.metrics is not None:
+                self.metrics.stage("log", time.perf_counter() - log_start)
+
+        if self.recorder is not None:
+            self.recorder.note_click(click_point, hit.name)
+        click_start = time.perf_counter()
+        self._click(click_point, geometry=desktop or geom)
+        if self.metrics is not None:
+            self.metrics.stage("click", time.perf_counter() - click_start)
+            self.metrics.incr("clicks")
+
+    def _throttle(self, loop_start: float) -> None:
+        # Throttle scanning to reduce CPU usage.
+        elapsed = time.perf_counter() - loop_start
+        sleep_for = float(self.config.scan_interval) - elapsed
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+    def _print_stats(self) -> None:
+        if self.pipeline is not None:
+            # Matching happens in the matcher processes; only pipeline stats are known here.
+            print(f"Pipeline: {self.pipeline.summary()}")
+            return
+        if self.metrics is not None:
+            print(f"Metrics: {self.metrics.summary()}")
+        if self.click_log is not None:
+            print(f"Click logs: {self.click_log.stats.summary()}")
+        print(f"Cooldowns: {self.cooldowns.stats.summary()}")
+        if isinstance(self._click, ClickBackend) and self._click.stats.clicks:
+            print(f"Clicks ({self._click.name}): {self._click.stats.summary()}")
+        if self.replay is not None:
+            print(f"Replay: {self.replay.stats.summary()}")
+        if self.recorder is not None:
+            print(f"Recorder: {self.recorder.stats.summary()}")
+        if self.monitor_scans:
+            for scan in self.monitor_scans:
+                pacing = f", {scan.scheduler.stats.summary()}" if scan.scheduler is not None else ""
+                print(f"Monitor {scan.label}: {scan.stats.summary()}{pacing}")
+        elif self.scheduler is not None:
+            print(f"Scheduler: {self.scheduler.stats.summary()}")
+        if self.targets is not None:
+            print(f"Targets: {self.targets.summary()}")
+        if self.change_detector is not None and not self.monitor_scans:
+            print(f"Change detection: {self.change_detector.stats.summary()}")
+        if self.parallel is not None:
+            print(f"Parallel matching: {self.parallel.stats.summary()}")
+        if self.matcher.locality is not None:
+            for path, stats in self.matcher.locality.stats.items():
+                print(f"Locality [{os.path.basename(path)}]: {stats.summary()}")
+        if self.matcher.dpi_model is not None:
+            for path, stats in self.matcher.dpi_model.stats.items():
+                print(f"DPI scales [{os.path.basename(path)}]: {stats.summary()}")
+        if self.matcher.prefilter.stats.searches:
+            print(f"Color prefilter: {self.matcher.prefilter.stats.summary()}")
+        correlator = getattr(self.matcher.engine, "correlator", None)
+        if correlator is not None and correlator.stats.fft:
+            print(f"Correlation: {correlator.stats.summary()}")
+        if self.hit_stats is not None and self.hit_stats.records:
+            print(f"Target order: {self.hit_stats.summary()}")
+        if self.matcher.features.stats.searches:
+            print(f"Feature search: {self.matcher.features.stats.summary()}")
+
+    def _finish_replay(self) -> None:
+        """Report a finished replay; exits with status 1 if the clicks differ from the expected ones."""
+
+        print("Replay finished.")
+        self._print_stats()
+        if not isinstance(self._click, RecordingClickBackend):
+            return
+        expected = self.replay.expected_clicks() if self.replay is not None else None
+        if expected is None:
+            print(f"Replay clicks: {len(self._click.clicks)} (nothing to check them against).")
+            return
+        check = self._click.check(expected, tolerance=self.config.replay_tolerance)
+        print(f"Replay clicks: {check.summary()}")
+        if not check.ok:
+            raise SystemExit(1)
 
 
 def main() -> None:
@@ -0,0 +1,760 @@
+"""Headless micro-benchmarks.
+
+Run with `python -m autoclicker.bench <name>`. Everything here uses the
+synthetic capture backend, so it works on Linux without a display.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .capture import SyntheticCaptureBackend, VirtualDesktopCapture, VirtualDesktopGeometry, bgra_to_pil
+from .match import MultiScaleTemplateMatcher, OpenCVMatchEngine, PreparedHaystack, locate_center, make_variant, resize_needle
+
+
+def _random_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_capture(width: int = 3840 * 3, height: int = 2160, repeat: int = 20) -> dict[str, float]:
+    """Compare the zero-copy session against per-frame PIL conversion."""
+
+    backend = SyntheticCaptureBackend(frames=[_random_frame(width, height)])
+
+    with VirtualDesktopCapture(backend) as session:
+        session_s = _time_per_call(lambda: session.screenshot().pixels, repeat)
+        # Old path: every frame became a fresh PIL image.
+        pil_s = _time_per_call(lambda: bgra_to_pil(session.screenshot().pixels), repeat)
+
+    return {"session_ms": session_s * 1000.0, "pil_copy_ms": pil_s * 1000.0}
+
+
+def _write_needles(frame: np.ndarray, count: int, size: int, out_dir: str, seed: int = 0) -> list[str]:
+    """Save `count` crops of `frame` as PNG needles and return their paths."""
+
+    rng = np.random.default_rng(seed)
+    h, w = frame.shape[:2]
+    paths = []
+    for i in range(count):
+        x = int(rng.integers(0, w - size))
+        y = int(rng.integers(0, h - size))
+        path = os.path.join(out_dir, f"needle_{i:03d}.png")
+        bgra_to_pil(frame[y : y + size, x : x + size]).save(path)
+        paths.append(path)
+    return paths
+
+
+def synthetic_desktop(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """A desktop-like BGRA frame: gradient background plus flat, noisy windows."""
+
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    frame[..., 0] = (xs[None, :] * 0.5 + 60).astype(np.uint8)
+    frame[..., 1] = (ys[:, None] * 0.4 + 50).astype(np.uint8)
+    frame[..., 2] = 90
+    frame[..., 3] = 255
+
+    for _ in range(max(4, (width * height) // 200_000)):
+        w = int(rng.integers(width // 10, width // 3))
+        h = int(rng.integers(height // 10, height // 2))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        color = [int(c) for c in rng.integers(30, 240, size=3)] + [255]
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, thickness=-1)
+        cv2.rectangle(frame, (x, y), (x + w, y + 24), [c // 2 for c in color[:3]] + [255], thickness=-1)
+        for _ in range(int(rng.integers(3, 12))):
+            tx = int(rng.integers(x, x + w))
+            ty = int(rng.integers(y + 30, y + h + 31))
+            cv2.putText(frame, "lorem ipsum", (tx, ty), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (20, 20, 20, 255), 1)
+
+    noise = rng.integers(-6, 7, size=frame.shape[:2] + (3,), dtype=np.int16)
+    frame[..., :3] = np.clip(frame[..., :3].astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return frame
+
+
+def render_button(label: str, width: int = 120, height: int = 36, seed: int = 0) -> np.ndarray:
+    """A button-like BGRA template: gradient fill, a seeded icon, and a label."""
+
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    lo = rng.integers(20, 120, size=3)
+    hi = rng.integers(lo + 20, lo + 80, size=3)
+    ramp = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :, None]
+    if seed % 2:
+        ramp = ramp[:, ::-1]
+    img = np.empty((height, width, 4), dtype=np.uint8)
+    img[..., :3] = (lo + (hi - lo) * ramp).astype(np.uint8)
+    img[..., 3] = 255
+
+    cx = int(rng.integers(height // 2, width - height // 2))
+    radius = int(rng.integers(height // 6, height // 3))
+    cv2.circle(img, (cx, height // 2), radius, (255, 255, 255, 255), -1)
+    for _ in range(12):
+        x0 = int(rng.integers(0, width - 8))
+        y0 = int(rng.integers(0, height - 4))
+        shade = int(rng.integers(0, 256))
+        cv2.rectangle(img, (x0, y0), (x0 + int(rng.integers(4, 20)), y0 + int(rng.integers(3, 10))), (shade, shade, shade, 255), -1)
+    cv2.rectangle(img, (0, 0), (width - 1, height - 1), (255, 255, 255, 255), 2)
+    cv2.putText(img, label, (6, height * 2 // 3), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (10, 10, 10, 255), 1)
+    return img
+
+
+def plant(frame: np.ndarray, template: np.ndarray, x: int, y: int, scale: float = 1.0) -> tuple[int, int]:
+    """Paste `template` (resized like `resize_needle`) at (x, y); return its center."""
+
+    from .capture import pil_to_bgra
+
+    img = resize_needle(bgra_to_pil(template), scale)
+    scaled = pil_to_bgra(img)
+    h, w = scaled.shape[:2]
+    frame[y : y + h, x : x + w] = scaled
+    return x + w // 2, y + h // 2
+
+
+def bench_match(
+    width: int = 3840,
+    height: int = 2160,
+    targets: int = 5,
+    scales: list[float] | None = None,
+    grayscale: bool = True,
+    repeat: int = 3,
+) -> dict[str, float]:
+    """Time one full scan (every target x every scale) per match engine.
+
+    `legacy` is the pre-engine path: a PIL screenshot handed to pyscreeze for
+    every (target, scale) pair, so the desktop is re-converted each time.
+    """
+
+    import pyscreeze
+    from PIL import Image
+
+    scales = scales or [1.0]
+    frame = _random_frame(width, height)
+
+    result: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Needles cut from a different frame, so every (target, scale) pair is a full miss.
+        needles = _write_needles(_random_frame(256, 256, seed=1), targets, 48, tmp)
+
+        legacy_needles = []
+        for path in needles:
+            with Image.open(path) as img:
+                legacy_needles.extend(resize_needle(img.copy(), scale) for scale in scales)
+        pil_frame = bgra_to_pil(frame)
+
+        def legacy_scan():
+            for needle in legacy_needles:
+                try:
+                    locate_center(needle, pil_frame, confidence=0.9, grayscale=grayscale)
+                except pyscreeze.ImageNotFoundException:
+                    pass
+
+        result["legacy_ms"] = _time_per_call(legacy_scan, repeat) * 1000.0
+
+        for engine in ("pyscreeze", "opencv"):
+            matcher = MultiScaleTemplateMatcher(confidence=0.9, grayscale=grayscale, scales=scales, engine=engine)
+            for path in needles:
+                matcher.load(path)
+
+            def scan():
+                haystack = PreparedHaystack(frame)
+                for path in needles:
+                    matcher.locate_center(path, haystack)
+
+            result[f"{engine}_ms"] = _time_per_call(scan, repeat) * 1000.0
+
+    return result
+
+
+def bench_pyramid(
+    width: int = 3840,
+    height: int = 2160,
+    targets: int = 3,
+    scales: list[float] | None = None,
+    levels: int = 0,
+    candidates: int = 3,
+    grayscale: bool = True,
+    repeat: int = 3,
+) -> dict[str, float]:
+    """Brute-force scale loop vs. pyramid search on planted, multi-scale targets."""
+
+    scales = scales or [0.75, 1.0, 1.25, 1.5]
+    rng = np.random.default_rng(7)
+    frame = synthetic_desktop(width, height)
+
+    result: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        needles: list[str] = []
+        expected: dict[str, tuple[int, int]] = {}
+        for i in range(targets):
+            button = render_button(f"Allow {i}", seed=i)
+            path = os.path.join(tmp, f"target_{i:03d}.png")
+            bgra_to_pil(button).save(path)
+            needles.append(path)
+            scale = scales[i % len(scales)]
+            x = int(rng.integers(0, width - 200))
+            y = int(rng.integers(0, height - 80))
+            expected[path] = plant(frame, button, x, y, scale)
+
+        for search in ("scales", "pyramid"):
+            matcher = MultiScaleTemplateMatcher(
+                confidence=0.9,
+                grayscale=grayscale,
+                scales=scales,
+                search=search,
+                pyramid_levels=levels,
+                pyramid_candidates=candidates,
+            )
+            hits = 0
+            haystack = PreparedHaystack(frame)
+            for path in needles:
+                found, _ = matcher.locate_center(path, haystack)
+                if found and abs(found[0] - expected[path][0]) <= 2 and abs(found[1] - expected[path][1]) <= 2:
+                    hits += 1
+
+            def scan():
+                haystack = PreparedHaystack(frame)
+                for path in needles:
+                    matcher.locate_center(path, haystack)
+
+            result[f"{search}_ms"] = _time_per_call(scan, repeat) * 1000.0
+            result[f"{search}_hits"] = float(hits)
+
+    result["targets"] = float(targets)
+    result["speedup"] = result["scales_ms"] / max(result["pyramid_ms"], 1e-9)
+    return result
+
+
+def bench_features(
+    width: int = 3840,
+    height: int = 2160,
+    targets: int = 5,
+    scale_counts: list[int] | None = None,
+    grayscale: bool = True,
+    repeat: int = 3,
+) -> list[dict[str, float]]:
+    """Scale loop vs. keypoint search, for a growing number of scales between 1.0 and 2.0.
+
+    Targets are planted at the configured scales, so the scale loop can find
+    every one of them; keypoint search is not told the scales at all.
+    """
+
+    rows: list[dict[str, float]] = []
+    for count in scale_counts or [1, 3, 5, 9]:
+        scales = [round(1.0 + i / max(1, count - 1), 4) for i in range(count)] if count > 1 else [1.0]
+        rng = np.random.default_rng(11)
+        frame = synthetic_desktop(width, height)
+        row: dict[str, float] = {"scales": float(count), "targets": float(targets)}
+        with tempfile.TemporaryDirectory() as tmp:
+            needles: list[str] = []
+            expected: dict[str, tuple[int, int]] = {}
+            for i in range(targets):
+                button = render_button(f"Allow {i}", seed=i)
+                path = os.path.join(tmp, f"target_{i:03d}.png")
+                bgra_to_pil(button).save(path)
+                needles.append(path)
+                x = int(rng.integers(0, width - 300))
+                y = int(rng.integers(0, height - 100))
+                expected[path] = plant(frame, button, x, y, scales[i % len(scales)])
+
+            for search in ("scales", "features"):
+                matcher = MultiScaleTemplateMatcher(confidence=0.9, grayscale=grayscale, scales=scales, search=search)
+                hits = 0
+                haystack = PreparedHaystack(frame)
+                for path in needles:
+                    found, _ = matcher.locate_center(path, haystack)
+                    if found and abs(found[0] - expected[path][0]) <= 2 and abs(found[1] - expected[path][1]) <= 2:
+                        hits += 1
+
+                def scan():
+                    haystack = PreparedHaystack(frame)
+                    for path in needles:
+                        matcher.locate_center(path, haystack)
+
+                row[f"{search}_ms"] = _time_per_call(scan, repeat) * 1000.0
+                row[f"{search}_hits"] = float(hits)
+                if search == "features":
+                    row["fallbacks"] = float(matcher.features.stats.fallbacks)
+        row["speedup"] = row["scales_ms"] / max(row["features_ms"], 1e-9)
+        rows.append(row)
+    return rows
+
+
+def bench_fft(
+    width: int = 3840,
+    height: int = 2160,
+    sizes: list[tuple[int, int]] | None = None,
+    grayscale: bool = True,
+    repeat: int = 3,
+    tolerance: float = 5e-3,
+) -> list[dict[str, float]]:
+    """Spatial vs. frequency-domain correlation per template size, and whether they agree.
+
+    Each template is planted once, with a dimmed copy as a decoy. Agreement
+    means the response maps differ by at most `tolerance` everywhere and both
+    paths return the same first match and the same set of matches. `fft_ms`
+    includes building the haystack spectrum, as for the first template of a
+    frame; `fft_cached_ms` is what every further template pays.
+    """
+
+    from .fftmatch import haystack_spectrum
+
+    sizes = sizes or [(60, 24), (120, 40), (200, 80), (320, 120), (480, 300), (800, 500)]
+    rng = np.random.default_rng(5)
+    spatial, fft, auto = OpenCVMatchEngine("spatial"), OpenCVMatchEngine("fft"), OpenCVMatchEngine("auto")
+    rows: list[dict[str, float]] = []
+    for i, (w, h) in enumerate(sizes):
+        frame = synthetic_desktop(width, height, seed=i)
+        button = render_button(f"Continue {i}", width=w, height=h, seed=i)
+        plant(frame, button, int(rng.integers(0, width - w)), int(rng.integers(0, height - h)))
+        decoy = button.copy()
+        decoy[..., :3] //= 2
+        plant(frame, decoy, int(rng.integers(0, width - w)), int(rng.integers(0, height - h)))
+        variant = make_variant(bgra_to_pil(button), 1.0)
+
+        haystack = PreparedHaystack(frame)
+        needle = variant.array(grayscale)
+        hay = haystack.view(grayscale)
+        reference = spatial._response(hay, needle, haystack, None, grayscale)
+        response = fft._response(hay, needle, haystack, None, grayscale)
+        agree = (
+            float(np.abs(reference - response).max()) <= tolerance
+            and spatial.find(variant, haystack, None, 0.9, grayscale) == fft.find(variant, haystack, None, 0.9, grayscale)
+            and [m.rect for m in spatial.find_all(variant, haystack, None, 0.9, grayscale)]
+            == [m.rect for m in fft.find_all(variant, haystack, None, 0.9, grayscale)]
+        )
+        rows.append(
+            {
+                "width": float(w),
+                "height": float(h),
+                "spatial_ms": _time_per_call(lambda: spatial.find(variant, haystack, None, 0.9, grayscale), repeat) * 1000.0,
+                "fft_ms": _time_per_call(
+                    lambda: (haystack.tile_cache.clear(), fft.find(variant, haystack, None, 0.9, grayscale)), repeat
+                )
+                * 1000.0,
+                # The spectrum stays cached on `haystack` from here on, as it does for every target after the first.
+                "fft_cached_ms": _time_per_call(lambda: fft.find(variant, haystack, None, 0.9, grayscale), repeat)
+                * 1000.0,
+                "spectrum_ms": _time_per_call(lambda: haystack_spectrum(hay), repeat) * 1000.0,
+                "max_diff": float(np.abs(reference - response).max()),
+                "agree": float(agree),
+                "auto_fft": float(auto.correlator.use_fft(hay, needle)),
+            }
+        )
+    return rows
+
+
+def bench_parallel(
+    width: int = 3840,
+    height: int = 2160,
+    targets: int = 20,
+    scales: list[float] | None = None,
+    workers: int = 4,
+    grayscale: bool = True,
+    repeat: int = 3,
+) -> dict[str, float]:
+    """Sequential target loop vs. `ParallelMatcher`; the last target is the only one on screen."""
+
+    from .parallel import ParallelMatcher, find_first
+
+    scales = scales or [1.0]
+    rng = np.random.default_rng(11)
+    frame = synthetic_desktop(width, height)
+
+    result: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths: list[tuple[str, str]] = []
+        for i in range(targets):
+            name = f"target_{i:03d}.png"
+            path = os.path.join(tmp, name)
+            button = render_button(f"Btn {i}", seed=100 + i)
+            bgra_to_pil(button).save(path)
+            paths.append((name, path))
+        expected = plant(frame, button, int(rng.integers(0, width - 200)), int(rng.integers(0, height - 80)), scales[-1])
+
+        matcher = MultiScaleTemplateMatcher(confidence=0.9, grayscale=grayscale, scales=scales)
+        parallel = ParallelMatcher(matcher, workers=workers)
+        try:
+            seq_hit = find_first(matcher, paths, PreparedHaystack(frame))
+            par_hit = parallel.locate_first(paths, PreparedHaystack(frame))
+            result["same_result"] = float(
+                seq_hit is not None and par_hit is not None and seq_hit.found == par_hit.found and seq_hit.index == par_hit.index
+            )
+            result["found"] = float(seq_hit is not None and abs(seq_hit.found[0] - expected[0]) <= 2)
+
+            result["sequential_ms"] = _time_per_call(lambda: find_first(matcher, paths, PreparedHaystack(frame)), repeat) * 1000.0
+            result["parallel_ms"] = (
+                _time_per_call(lambda: parallel.locate_first(paths, PreparedHaystack(frame)), repeat) * 1000.0
+            )
+        finally:
+            parallel.close()
+
+    result["speedup"] = result["sequential_ms"] / max(result["parallel_ms"], 1e-9)
+    return result
+
+
+def bench_startup(targets: int = 20, scales: list[float] | None = None, grayscale: bool = True) -> dict[str, float]:
+    """Time to have every template ready: PNG decode + resize vs. the compiled store."""
+
+    from .template_store import TemplateStore
+
+    scales = scales or [0.75, 1.0, 1.25, 1.5]
+    result: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(targets):
+            path = os.path.join(tmp, f"target_{i:03d}.png")
+            bgra_to_pil(render_button(f"Btn {i}", width=160, height=48, seed=i)).save(path)
+            paths.append((os.path.basename(path), path))
+
+        start = time.perf_counter()
+        matcher = MultiScaleTemplateMatcher(confidence=0.9, grayscale=grayscale, scales=scales)
+        for _, path in paths:
+            matcher.load(path)
+        result["png_ms"] = (time.perf_counter() - start) * 1000.0
+
+        store_path = os.path.join(tmp, "template_cache.npz")
+        TemplateStore(store_path).load(paths, scales, grayscale)  # cold build
+        store = TemplateStore(store_path)
+        start = time.perf_counter()
+        variants = store.load(paths, scales, grayscale)
+        matcher = MultiScaleTemplateMatcher(confidence=0.9, grayscale=grayscale, scales=scales)
+        for path, by_scale in variants.items():
+            matcher.add_variants(path, by_scale)
+        result["store_ms"] = (time.perf_counter() - start) * 1000.0
+        del variants, matcher
+        store.close()
+
+    result["speedup"] = result["png_ms"] / max(result["store_ms"], 1e-9)
+    return result
+
+
+class _FakeFunction:
+    # ctypes function stand-in: callable, and accepts argtypes/restype.
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, *args):
+        return self.fn(*args)
+
+
+class _FakeWindows:
+    """Just enough of user32/kernel32 for `SendInputClickBackend`, with a DPI-virtualized cursor."""
+
+    def __init__(self, width: int, height: int, cursor_factor: float = 1.0):
+        self.cursor = (0, 0)
+        self.sent = 0
+        metrics = {76: 0, 77: 0, 78: width, 79: height}
+        self.GetSystemMetrics = _FakeFunction(lambda index: metrics[index])
+        self.SetPhysicalCursorPos = _FakeFunction(self._set_cursor)
+        self.SetCursorPos = _FakeFunction(self._set_cursor)
+        self.GetCursorPos = _FakeFunction(self._get_cursor)
+        self.SendInput = _FakeFunction(self._send)
+        # Sleep like the real one, so the calibration cost shows.
+        self.Sleep = _FakeFunction(lambda ms: time.sleep(ms / 1000.0))
+        self._factor = cursor_factor
+
+    def _set_cursor(self, x, y):
+        self.cursor = (int(x * self._factor), int(y * self._factor))
+        return True
+
+    def _get_cursor(self, ref):
+        ref._obj.x, ref._obj.y = self.cursor
+        return True
+
+    def _send(self, count, events, size):
+        self.sent += count
+        return count
+
+
+def bench_click(repeat: int = 200, cursor_factor: float = 1.25) -> dict[str, float]:
+    """Click dispatch time: a persistent SendInput backend vs. setting everything up per click.
+
+    Runs against stand-in Windows functions (no input is sent), so only the
+    backend's own work and its sleeps are timed.
+    """
+
+    from .click import RecordingClickBackend, SendInputClickBackend
+
+    width, height = 3840, 2160
+    geometry = VirtualDesktopGeometry(0, 0, width, height)
+    rng = np.random.default_rng(0)
+    points = [(int(x), int(y)) for x, y in zip(rng.integers(1, width, repeat), rng.integers(1, height, repeat))]
+
+    fake = _FakeWindows(width, height, cursor_factor)
+    start = time.perf_counter()
+    for point in points:
+        # What every click used to cost: structures, metrics and calibration from scratch.
+        SendInputClickBackend(user32=fake, kernel32=fake)(point, geometry=geometry)
+    result = {"per_click_setup_ms": (time.perf_counter() - start) * 1000.0 / len(points)}
+
+    fake = _FakeWindows(width, height, cursor_factor)
+    backend = SendInputClickBackend(user32=fake, kernel32=fake)
+    backend(points[0], geometry=geometry)  # first click builds and calibrates
+    result["first_click_ms"] = backend.stats.dispatch_ms[0]
+    start = time.perf_counter()
+    for point in points:
+        backend(point, geometry=geometry)
+    result["persistent_ms"] = (time.perf_counter() - start) * 1000.0 / len(points)
+
+    recorder = RecordingClickBackend()
+    start = time.perf_counter()
+    for point in points:
+        recorder(point, geometry=geometry)
+    result["record_ms"] = (time.perf_counter() - start) * 1000.0 / len(points)
+    result["speedup"] = result["per_click_setup_ms"] / max(result["persistent_ms"], 1e-9)
+    return result
+
+
+def _scenarios(only: str):
+    from .benchsuite import default_scenarios
+
+    scenarios = default_scenarios()
+    if only:
+        wanted = [w.strip() for w in only.split(",") if w.strip()]
+        scenarios = [sc for sc in scenarios if any(w in sc.name for w in wanted)]
+    return scenarios
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m autoclicker.bench")
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    p_capture = sub.add_parser("capture", help="capture session vs. per-frame PIL copy")
+    p_capture.add_argument("--width", type=int, default=3840 * 3)
+    p_capture.add_argument("--height", type=int, default=2160)
+    p_capture.add_argument("--repeat", type=int, default=20)
+
+    p_match = sub.add_parser("match", help="legacy pyscreeze path vs. match engines, one scan")
+    p_match.add_argument("--width", type=int, default=3840)
+    p_match.add_argument("--height", type=int, default=2160)
+    p_match.add_argument("--targets", type=int, default=5)
+    p_match.add_argument("--scales", default="1.0")
+    p_match.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+    p_match.add_argument("--repeat", type=int, default=3)
+
+    p_pyr = sub.add_parser("pyramid", help="brute-force scale loop vs. coarse-to-fine pyramid search")
+    p_pyr.add_argument("--width", type=int, default=3840)
+    p_pyr.add_argument("--height", type=int, default=2160)
+    p_pyr.add_argument("--targets", type=int, default=3)
+    p_pyr.add_argument("--scales", default="0.75,1.0,1.25,1.5")
+    p_pyr.add_argument("--levels", type=int, default=0, help="0 picks the level per template")
+    p_pyr.add_argument("--candidates", type=int, default=3)
+    p_pyr.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+    p_pyr.add_argument("--repeat", type=int, default=3)
+
+    p_feat = sub.add_parser("features", help="scale loop vs. ORB keypoint search, by number of scales")
+    p_feat.add_argument("--width", type=int, default=3840)
+    p_feat.add_argument("--height", type=int, default=2160)
+    p_feat.add_argument("--targets", type=int, default=5)
+    p_feat.add_argument("--scale-counts", default="1,3,5,9", help="numbers of scales between 1.0 and 2.0 to try")
+    p_feat.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+    p_feat.add_argument("--repeat", type=int, default=3)
+
+    p_par = sub.add_parser("parallel", help="sequential target loop vs. thread-pool matching")
+    p_par.add_argument("--width", type=int, default=3840)
+    p_par.add_argument("--height", type=int, default=2160)
+    p_par.add_argument("--targets", type=int, default=20)
+    p_par.add_argument("--scales", default="1.0")
+    p_par.add_argument("--workers", type=int, default=4)
+    p_par.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+    p_par.add_argument("--repeat", type=int, default=3)
+
+    p_start = sub.add_parser("startup", help="template loading: PNG decode + resize vs. compiled store")
+    p_start.add_argument("--targets", type=int, default=20)
+    p_start.add_argument("--scales", default="0.75,1.0,1.25,1.5")
+    p_start.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+
+    p_click = sub.add_parser("click", help="click dispatch: persistent SendInput backend vs. per-click setup")
+    p_click.add_argument("--repeat", type=int, default=200)
+    p_click.add_argument("--cursor-factor", type=float, default=1.25, help="simulated DPI virtualization of cursor moves")
+
+    p_suite = sub.add_parser("suite", help="per-stage latency over a matrix of synthetic desktops")
+    p_suite.add_argument("--out", default="bench_results.json", help="JSON results file ('' to skip)")
+    p_suite.add_argument("--repeat", type=int, default=10)
+    p_suite.add_argument("--only", default="", help="comma-separated substrings of scenario names to run")
+
+    p_acc = sub.add_parser("accuracy", help="pyramid vs. brute-force results on desktops with look-alike decoys")
+    p_acc.add_argument("--levels", type=int, default=0, help="0 picks the level per template")
+    p_acc.add_argument("--candidates", type=int, default=3)
+    p_acc.add_argument("--decoys", type=int, default=2, help="look-alikes planted per target")
+    p_acc.add_argument("--repeat", type=int, default=3)
+    p_acc.add_argument("--only", default="", help="comma-separated substrings of scenario names to run")
+
+    p_fft = sub.add_parser("fft", help="spatial vs. frequency-domain correlation, by template size")
+    p_fft.add_argument("--width", type=int, default=3840)
+    p_fft.add_argument("--height", type=int, default=2160)
+    p_fft.add_argument("--sizes", default="60x24,120x40,200x80,320x120,480x300,800x500", help="template sizes, WxH")
+    p_fft.add_argument("--color", action="store_true", help="match in color instead of grayscale")
+    p_fft.add_argument("--repeat", type=int, default=3)
+
+    p_pre = sub.add_parser("prefilter", help="scale loop with vs. without the color prefilter")
+    p_pre.add_argument("--decoys", type=int, default=2, help="look-alikes planted per target")
+    p_pre.add_argument("--repeat", type=int, default=3)
+    p_pre.add_argument("--only", default="", help="comma-separated substrings of scenario names to run")
+
+    p_cmp = sub.add_parser("compare", help="compare two 'suite' result files")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--stat", default="p50_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+
+    args = parser.parse_args(argv)
+
+    if args.name == "capture":
+        result = bench_capture(args.width, args.height, args.repeat)
+        print(f"capture {args.width}x{args.height}")
+        print(f"  session (zero-copy view): {result['session_ms']:.3f} ms/frame")
+        print(f"  per-frame PIL copy:       {result['pil_copy_ms']:.3f} ms/frame")
+    elif args.name == "match":
+        scales = [float(s) for s in args.scales.split(",") if s.strip()]
+        result = bench_match(args.width, args.height, args.targets, scales, not args.color, args.repeat)
+        print(f"match {args.width}x{args.height}, {args.targets} targets x {len(scales)} scales")
+        print(f"  legacy (PIL per pair): {result['legacy_ms']:.1f} ms/scan")
+        print(f"  pyscreeze engine:      {result['pyscreeze_ms']:.1f} ms/scan")
+        print(f"  opencv engine:         {result['opencv_ms']:.1f} ms/scan")
+    elif args.name == "pyramid":
+        scales = [float(s) for s in args.scales.split(",") if s.strip()]
+        result = bench_pyramid(
+            args.width, args.height, args.targets, scales, args.levels, args.candidates, not args.color, args.repeat
+        )
+        n = int(result["targets"])
+        print(f"pyramid {args.width}x{args.height}, {n} targets x {len(scales)} scales, levels={args.levels}")
+        print(f"  scale loop: {result['scales_ms']:.1f} ms/scan ({int(result['scales_hits'])}/{n} found)")
+        print(f"  pyramid:    {result['pyramid_ms']:.1f} ms/scan ({int(result['pyramid_hits'])}/{n} found)")
+        print(f"  speedup:    {result['speedup']:.1f}x")
+    elif args.name == "features":
+        counts = [int(c) for c in args.scale_counts.split(",") if c.strip()]
+        rows = bench_features(args.width, args.height, args.targets, counts, not args.color, args.repeat)
+        n = args.targets
+        print(f"features {args.width}x{args.height}, {n} targets, scales spread over 1.0-2.0")
+        for row in rows:
+            print(
+                f"  {int(row['scales'])} scale(s): scale loop {row['scales_ms']:.1f} ms ({int(row['scales_hits'])}/{n} found)"
+                f" | features {row['features_ms']:.1f} ms ({int(row['features_hits'])}/{n} found,"
+                f" {int(row['fallbacks'])} fallbacks) | {row['speedup']:.1f}x"
+            )
+        wins = [int(row["scales"]) for row in rows if row["speedup"] > 1.0]
+        if wins:
+            print(f"  keypoint search wins from {min(wins)} scale(s) on")
+        else:
+            print("  keypoint search does not win at these settings")
+    elif args.name == "parallel":
+        scales = [float(s) for s in args.scales.split(",") if s.strip()]
+        result = bench_parallel(
+            args.width, args.height, args.targets, scales, args.workers, not args.color, args.repeat
+        )
+        print(f"parallel {args.width}x{args.height}, {args.targets} targets x {len(scales)} scales, workers={args.workers}")
+        print(f"  sequential: {result['sequential_ms']:.1f} ms/scan")
+        print(f"  parallel:   {result['parallel_ms']:.1f} ms/scan")
+        print(f"  speedup:    {result['speedup']:.1f}x (same result: {bool(result['same_result'])})")
+    elif args.name == "startup":
+        scales = [float(s) for s in args.scales.split(",") if s.strip()]
+        result = bench_startup(args.targets, scales, not args.color)
+        print(f"startup {args.targets} targets x {len(scales)} scales")
+        print(f"  PNG + resize:    {result['png_ms']:.1f} ms")
+        print(f"  compiled store:  {result['store_ms']:.1f} ms")
+        print(f"  speedup:         {result['speedup']:.1f}x")
+    elif args.name == "click":
+        result = bench_click(max(1, args.repeat), args.cursor_factor)
+        print(f"click dispatch, {args.repeat} clicks (stand-in Windows API, cursor factor {args.cursor_factor:g})")
+        print(f"  per-click setup:    {result['per_click_setup_ms']:.3f} ms/click")
+        print(f"  first click:        {result['first_click_ms']:.3f} ms (builds and calibrates)")
+        print(f"  persistent backend: {result['persistent_ms']:.3f} ms/click")
+        print(f"  record backend:     {result['record_ms']:.3f} ms/click")
+        print(f"  speedup:            {result['speedup']:.0f}x")
+    elif args.name == "suite":
+        from .benchsuite import run_suite
+
+        scenarios = _scenarios(args.only)
+        print(f"suite: {len(scenarios)} scenarios, p50 ms per stage")
+        run_suite(scenarios, repeat=max(1, args.repeat), out=args.out or None)
+        if args.out:
+            print(f"results written to {args.out}")
+    elif args.name == "accuracy":
+        from .benchsuite import run_accuracy
+
+        failed = False
+        print(f"accuracy: levels={args.levels or 'auto'} candidates={args.candidates} decoys={args.decoys}")
+        for sc in _scenarios(args.only):
+            r = run_accuracy(sc, args.levels, args.candidates, args.decoys, max(1, args.repeat))
+            n = r["targets"]
+            found, fp, match = r["planted_found"], r["false_positives"], r["match"]
+            print(
+                f"  {sc.name}: scales {found['scales']}/{n} fp={fp['scales']} {match['scales']['p50_ms']:.1f} ms"
+                f" | pyramid {found['pyramid']}/{n} fp={fp['pyramid']} {match['pyramid']['p50_ms']:.1f} ms"
+            )
+            if r["disagreements"]:
+                failed = True
+                print(f"    disagree: {', '.join(r['disagreements'])}")
+        if failed:
+            raise SystemExit(1)
+    elif args.name == "fft":
+        sizes = [tuple(int(v) for v in size.lower().split("x")) for size in args.sizes.split(",") if size.strip()]
+        rows = bench_fft(args.width, args.height, sizes, not args.color, max(1, args.repeat))
+        mode = "color" if args.color else "gray"
+        print(f"fft {args.width}x{args.height} {mode}, spectrum {rows[0]['spectrum_ms']:.1f} ms (included in fft)")
+        failed = False
+        for row in rows:
+            size = f"{int(row['width'])}x{int(row['height'])}"
+            print(
+                f"  {size:>9}: spatial {row['spatial_ms']:.1f} ms | fft {row['fft_ms']:.1f} ms"
+                f" ({row['fft_cached_ms']:.1f} ms with the spectrum cached)"
+                f" | max diff {row['max_diff']:.1e} {'agree' if row['agree'] else 'DISAGREE'}"
+                f" | auto picks {'fft' if row['auto_fft'] else 'spatial'}"
+            )
+            failed = failed or not row["agree"]
+        if failed:
+            raise SystemExit(1)
+    elif args.name == "prefilter":
+        from .benchsuite import run_prefilter
+
+        failed = False
+        print(f"prefilter: decoys={args.decoys}")
+        for sc in _scenarios(args.only):
+            r = run_prefilter(sc, args.decoys, max(1, args.repeat))
+            n = r["targets"]
+            found, match = r["planted_found"], r["match"]
+            print(
+                f"  {sc.name}: full {found['full']}/{n} {match['full']['p50_ms']:.1f} ms"
+                f" | prefilter {found['prefilter']}/{n} {match['prefilter']['p50_ms']:.1f} ms,"
+                f" rejected {r['reject_ratio']:.0%}, searched {r['searched_area']:.0%} of the area"
+            )
+            if r["misses"]:
+                failed = True
+                print(f"    missed: {', '.join(r['misses'])}")
+        if failed:
+            raise SystemExit(1)
+    elif args.name == "compare":
+        import json
+
+        from .benchsuite import compare
+
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print(f"compare {args.stat}: {args.old} -> {args.new}")
+        for line in compare(old, new, args.stat):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""Synthetic benchmark suite for the capture -> match -> click loop.
+
+Every scenario renders a synthetic virtual desktop, plants button templates
+at known positions and scales, and then drives the real code through the
+synthetic capture backend and a stub clicker:
+
+- `capture`, `prepare`, `match` and `click` time each stage on its own,
+  with `match` covering every target on a frame where all are planted;
+- `loop` times `AutoClickerApp.scan_once` on a frame where only the last
+  target is planted, so each scan searches every target before it clicks.
+
+Results are written as JSON (see `run_suite`), and `compare` diffs two files.
+
+`run_accuracy` checks the pyramid (downscaled prefilter) search against the
+plain scale loop on the same desktops, with look-alike decoys planted next
+to the targets to compete for the prefilter's candidate slots.
+`run_prefilter` does the same for the color prefilter against no prefilter.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import numpy as np
+
+from .bench import plant, render_button, synthetic_desktop
+from .capture import SyntheticCaptureBackend, VirtualDesktopCapture, bgra_to_pil
+from .config import AppConfig
+from .match import PreparedHaystack, matcher_from_config
+
+STAGES = ("capture", "prepare", "match", "click", "loop")
+
+DESKTOPS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "2x4k": (7680, 2160),
+    "3x4k": (11520, 2160),
+}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    desktop: str = "1080p"
+    targets: int = 5
+    template: tuple[int, int] = (120, 36)
+    scales: tuple[float, ...] = (1.0,)
+    grayscale: bool = True
+
+    @property
+    def name(self) -> str:
+        scales = "-".join(f"{s:g}" for s in self.scales)
+        mode = "gray" if self.grayscale else "color"
+        return f"{self.desktop}_t{self.targets}_{self.template[0]}x{self.template[1]}_s{scales}_{mode}"
+
+
+def default_scenarios() -> list[Scenario]:
+    """Vary one dimension at a time around a 1080p / 5 targets / 1 scale baseline."""
+
+    base = Scenario()
+    scenarios = [dataclasses.replace(base, desktop=d) for d in DESKTOPS]
+    scenarios += [dataclasses.replace(base, targets=n) for n in (1, 20)]
+    scenarios += [dataclasses.replace(base, template=t) for t in ((60, 24), (240, 72))]
+    scenarios += [dataclasses.replace(base, scales=s) for s in ((0.8, 1.0, 1.25), (0.75, 1.0, 1.25, 1.5))]
+    scenarios.append(dataclasses.replace(base, grayscale=False))
+
+    unique: dict[str, Scenario] = {}
+    for sc in scenarios:
+        unique.setdefault(sc.name, sc)
+    return list(unique.values())
+
+
+def _config(sc: Scenario) -> AppConfig:
+    # Plain full-frame search: locality and change detection would turn repeated
+    # scans of the same frame into near no-ops.
+    return AppConfig(
+        confidence=0.9,
+        grayscale=sc.grayscale,
+        scales=list(sc.scales),
+        scan_interval=0.0,
+        adaptive_scan=False,
+        scan_min_interval=0.0,
+        scan_max_interval=0.0,
+        scan_backoff=1.0,
+        cpu_budget=0.0,
+        click_delay=0.0,
+        location_cooldown=0.0,
+        location_radius=24,
+        max_clicks_per_frame=1,
+        find_all=False,
+        log_clicks=False,
+        log_dir="logs",
+        log_mode="full",
+        log_crop_size=400,
+        log_max_width=1920,
+        log_format="png",
+        log_quality=85,
+        log_png_level=1,
+        log_queue=8,
+        log_max_files=0,
+        log_max_mb=0.0,
+        capture_backend="synthetic",
+        capture_mode="desktop",
+        click_backend="record",
+        replay_source="",
+        replay_paced=False,
+        replay_fps=2.0,
+        replay_loop=False,
+        replay_expected="",
+        replay_tolerance=4,
+        record_dir="",
+        record_memory_mb=0.0,
+        record_max_mb=0.0,
+        template_cache="",
+        template_memory_mb=0.0,
+        targets_poll_interval=0.0,
+        hit_order=False,
+        target_stats="",
+        cold_every=0,
+        cold_after=600.0,
+        match_engine="opencv",
+        correlation="auto",
+        fft_cache_mb=128.0,
+        search_mode="scales",
+        pyramid_levels=0,
+        pyramid_candidates=3,
+        feature_count=20000,
+        match_workers=1,
+        pipeline=False,
+        pipeline_matchers=1,
+        locality=False,
+        locality_history=4,
+        locality_padding=48,
+        locality_full_scan_every=10,
+        dpi_scales=False,
+        dpi_scale_band=0.0,
+        dpi_full_scan_every=20,
+        prefilter=False,
+        prefilter_tile=32,
+        change_detection=False,
+        change_tile_size=64,
+        stats_interval=0.0,
+        metrics=False,
+        metrics_file="",
+        metrics_interval=10.0,
+        metrics_port=0,
+    )
+
+
+def _placements(sc: Scenario, width: int, height: int, seed: int) -> list[tuple[int, int, float]]:
+    """Non-overlapping (x, y, scale) spots, one per target, on a shuffled grid."""
+
+    rng = np.random.default_rng(seed)
+    cell_w = int(sc.template[0] * max(sc.scales)) + 8
+    cell_h = int(sc.template[1] * max(sc.scales)) + 8
+    cols, rows = width // cell_w, height // cell_h
+    if cols * rows < sc.targets:
+        raise ValueError(f"{sc.name}: {sc.targets} templates do not fit on the desktop")
+
+    cells = rng.permutation(cols * rows)[: sc.targets]
+    return [
+        (int(c % cols) * cell_w + 4, int(c // cols) * cell_h + 4, float(rng.choice(sc.scales)))
+        for c in cells
+    ]
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+
+
+def _max_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows.
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _build_desktop(sc: Scenario, tmp: str, seed: int, decoys: int = 0):
+    """Save templates to `tmp` and plant them on a desktop.
+
+    Returns (templates, frame, expected centers by path, spots). With
+    `decoys`, that many look-alikes of each template (blended with another
+    button, so they correlate well but stay below the confidence) are
+    planted as well.
+    """
+
+    width, height = DESKTOPS[sc.desktop]
+    templates = []
+    for i in range(sc.targets):
+        template = render_button(f"T{i}", width=sc.template[0], height=sc.template[1], seed=seed + i)
+        bgra_to_pil(template).save(os.path.join(tmp, f"target_{i:03d}.png"))
+        templates.append(template)
+
+    frame = synthetic_desktop(width, height, seed=seed)
+    expected: dict[str, tuple[int, int]] = {}
+    spots = _placements(dataclasses.replace(sc, targets=sc.targets * (1 + decoys)), width, height, seed)
+    for i, (x, y, scale) in enumerate(spots[: sc.targets]):
+        expected[os.path.join(tmp, f"target_{i:03d}.png")] = plant(frame, templates[i], x, y, scale)
+    for j, (x, y, scale) in enumerate(spots[sc.targets :]):
+        i = j % sc.targets
+        other = render_button(f"D{j}", width=sc.template[0], height=sc.template[1], seed=seed + 1000 + j)
+        decoy = (templates[i] * 0.3 + other * 0.7).astype(np.uint8)
+        plant(frame, decoy, x, y, scale)
+    return templates, frame, expected, spots[: sc.targets]
+
+
+def run_scenario(sc: Scenario, repeat: int = 10, seed: int = 0) -> dict:
+    from .app import AutoClickerApp
+    from .targets import TargetIndex
+
+    width, height = DESKTOPS[sc.desktop]
+    config = _config(sc)
+    clicks: list[tuple[int, int]] = []
+
+    def stub_click(point, geometry=None):
+        clicks.append((int(point[0]), int(point[1])))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loop_frame = synthetic_desktop(width, height, seed=seed)
+        templates, full, expected, spots = _build_desktop(sc, tmp, seed)
+
+        backend = SyntheticCaptureBackend(frames=[full])
+        app = AutoClickerApp(config=config, capture=VirtualDesktopCapture(backend), clicker=stub_click)
+        app.targets = TargetIndex(tmp, app.matcher, poll_interval=0)
+        app.targets.refresh()
+        targets = app.targets.targets
+
+        # The loop frame holds only the target searched last.
+        last_path = targets[-1][1]
+        last = list(expected).index(last_path)
+        x, y, scale = spots[last]
+        plant(loop_frame, templates[last], x, y, scale)
+
+        samples: dict[str, list[float]] = {stage: [] for stage in STAGES}
+        found = 0
+        max_error = 0.0
+        matcher = matcher_from_config(config)
+        for _, path in targets:
+            matcher.load(path)
+
+        with VirtualDesktopCapture(backend) as session:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                capture = session.screenshot()
+                t1 = time.perf_counter()
+                haystack = PreparedHaystack(capture.pixels, geometry=capture.geometry)
+                haystack.full(sc.grayscale)
+                t2 = time.perf_counter()
+                hits = {path: matcher.locate_center(path, haystack)[0] for _, path in targets}
+                t3 = time.perf_counter()
+                stub_click((0, 0), capture.geometry)
+                t4 = time.perf_counter()
+                samples["capture"].append(t1 - t0)
+                samples["prepare"].append(t2 - t1)
+                samples["match"].append(t3 - t2)
+                samples["click"].append(t4 - t3)
+
+        for path, center in expected.items():
+            got = hits.get(path)
+            if got is None:
+                continue
+            found += 1
+            max_error = max(max_error, float(np.hypot(got[0] - center[0], got[1] - center[1])))
+
+        backend.set_frames([loop_frame])
+        clicks.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                app.scan_once()
+                samples["loop"].append(time.perf_counter() - t0)
+
+            # One more scan under tracemalloc for the allocation peak (NumPy
+            # buffers included; OpenCV's internal buffers are not traced).
+            tracemalloc.start()
+            app.scan_once()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        app.capture.close()
+
+    return {
+        "name": sc.name,
+        "params": {
+            "desktop": sc.desktop,
+            "width": width,
+            "height": height,
+            "targets": sc.targets,
+            "template": list(sc.template),
+            "scales": list(sc.scales),
+            "grayscale": sc.grayscale,
+            "repeat": repeat,
+        },
+        "stages": {stage: _percentiles(values) for stage, values in samples.items()},
+        "targets_found": found,
+        "max_center_error_px": max_error,
+        "loop_clicks": len(clicks),
+        "scan_peak_alloc_mb": peak / (1024 * 1024),
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a[0] - b[0]) <= 2 and abs(a[1] - b[1]) <= 2
+
+
+def _compare_searches(sc: Scenario, configs: dict[str, AppConfig], decoys: int, repeat: int, seed: int):
+    """Run every target with each config on a desktop with decoys, and on one without the targets.
+
+    Returns (expected centers by path, results by config name, matchers by config name).
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, frame, expected, spots = _build_desktop(sc, tmp, seed, decoys=decoys)
+        paths = list(expected)
+        # Same desktop and decoys with the targets painted over by the background.
+        negative = frame.copy()
+        background = synthetic_desktop(*DESKTOPS[sc.desktop], seed=seed)
+        for x, y, scale in spots:
+            w, h = int(round(sc.template[0] * scale)) + 1, int(round(sc.template[1] * scale)) + 1
+            negative[y : y + h, x : x + w] = background[y : y + h, x : x + w]
+
+        results: dict[str, dict] = {}
+        matchers = {}
+        for name, config in configs.items():
+            matcher = matchers[name] = matcher_from_config(config)
+            for path in paths:
+                matcher.load(path)
+            found = {}
+            timings = []
+            for _ in range(max(1, repeat)):
+                t0 = time.perf_counter()
+                haystack = PreparedHaystack(frame)
+                found = {path: matcher.locate_center(path, haystack)[0] for path in paths}
+                timings.append(time.perf_counter() - t0)
+            haystack = PreparedHaystack(negative)
+            results[name] = {
+                "found": found,
+                "negative": {path: matcher.locate_center(path, haystack)[0] for path in paths},
+                "match": _percentiles(timings),
+            }
+            results[name]["planted"] = sum(
+                1 for p in paths if found[p] is not None and _same(found[p], expected[p])
+            )
+            results[name]["false_positives"] = sum(1 for p in paths if results[name]["negative"][p] is not None)
+    return expected, results, matchers
+
+
+def run_accuracy(
+    sc: Scenario,
+    levels: int = 0,
+    candidates: int = 3,
+    decoys: int = 2,
+    repeat: int = 3,
+    seed: int = 0,
+) -> dict:
+    """Pyramid search vs. the plain scale loop on one scenario's desktop.
+
+    Both searches run every target on a frame holding the targets and their
+    decoys, and on a frame holding only the decoys. A disagreement is a target
+    one search finds where the other does not, or finds more than 2 px away.
+    """
+
+    config = _config(sc)
+    expected, results, _ = _compare_searches(
+        sc,
+        {
+            search: dataclasses.replace(
+                config, search_mode=search, pyramid_levels=levels, pyramid_candidates=candidates
+            )
+            for search in ("scales", "pyramid")
+        },
+        decoys,
+        repeat,
+        seed,
+    )
+    brute, pyr = results["scales"], results["pyramid"]
+    disagreements = [
+        os.path.basename(p)
+        for p in expected
+        if not _same(brute["found"][p], pyr["found"][p]) or not _same(brute["negative"][p], pyr["negative"][p])
+    ]
+    return {
+        "name": sc.name,
+        "levels": levels,
+        "candidates": candidates,
+        "decoys": decoys,
+        "targets": len(expected),
+        "planted_found": {search: r["planted"] for search, r in results.items()},
+        "false_positives": {search: r["false_positives"] for search, r in results.items()},
+        "disagreements": disagreements,
+        "match": {search: r["match"] for search, r in results.items()},
+    }
+
+
+def run_prefilter(sc: Scenario, decoys: int = 2, repeat: int = 3, seed: int = 0) -> dict:
+    """The same searches with and without the color prefilter on one scenario's desktop.
+
+    A miss is a planted target found without the prefilter but not with it.
+    """
+
+    config = _config(sc)
+    expected, results, matchers = _compare_searches(
+        sc,
+        {"full": config, "prefilter": dataclasses.replace(config, prefilter=True)},
+        decoys,
+        repeat,
+        seed,
+    )
+    full, pre = results["full"], results["prefilter"]
+    misses = [
+        os.path.basename(p)
+        for p in expected
+        if _same(full["found"][p], expected[p]) and not _same(pre["found"][p], expected[p])
+    ]
+    stats = matchers["prefilter"].prefilter.stats
+    return {
+        "name": sc.name,
+        "decoys": decoys,
+        "targets": len(expected),
+        "planted_found": {name: r["planted"] for name, r in results.items()},
+        "false_positives": {name: r["false_positives"] for name, r in results.items()},
+        "misses": misses,
+        "reject_ratio": stats.reject_ratio,
+        "searched_area": stats.kept_ratio,
+        "match": {name: r["match"] for name, r in results.items()},
+    }
+
+
+def _metadata() -> dict:
+    import cv2
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run_suite(scenarios: list[Scenario], repeat: int = 10, out: str | None = None, progress=print) -> dict:
+    """Run `scenarios` and optionally write the results to `out` as JSON.
+
+    Layout: {"meta": {...}, "scenarios": [{"name", "params", "stages":
+    {stage: {"p50_ms", "p95_ms", "p99_ms", "mean_ms"}}, "targets_found", ...}]}.
+    """
+
+    results = {"meta": _metadata(), "scenarios": []}
+    for sc in scenarios:
+        res = run_scenario(sc, repeat=repeat)
+        results["scenarios"].append(res)
+        if progress is not None:
+            stages = "  ".join(f"{s}={res['stages'][s]['p50_ms']:.2f}" for s in STAGES)
+            progress(
+                f"{sc.name:<40} {stages}  found={res['targets_found']}/{sc.targets} "
+                f"peak={res['scan_peak_alloc_mb']:.1f}MB"
+            )
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+def compare(old: dict, new: dict, stat: str = "p50_ms") -> list[str]:
+    """One line per scenario present in both runs: `stat` per stage, old -> new."""
+
+    by_name = {sc["name"]: sc for sc in old["scenarios"]}
+    lines = []
+    for sc in new["scenarios"]:
+        before = by_name.get(sc["name"])
+        if before is None:
+            continue
+        parts = []
+        for stage in STAGES:
+            a = before["stages"].get(stage, {}).get(stat)
+            b = sc["stages"].get(stage, {}).get(stat)
+            if a is None or b is None:
+                continue
+            ratio = b / a if a > 0 else float("inf")
+            parts.append(f"{stage} {a:.2f}->{b:.2f} ({ratio:.2f}x)")
+        lines.append(f"{sc['name']:<40} " + "  ".join(parts))
+    return lines
@@ -2,8 +2,11 @@ from __future__ import annotations
 
 import os
 import sys
+import time
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
 
+import numpy as np
 from PIL import Image
 
 
@@ -33,50 +36,342 @@ class VirtualDesktopGeometry:
 
 
 @dataclass(frozen=True)
+class MonitorInfo:
+    """One physical monitor, in screen coordinates; `dpi_scale` is 1.0 at 96 DPI."""
+
+    index: int  # numbered from 1, as mss does
+    geometry: VirtualDesktopGeometry
+    dpi_scale: float = 1.0
+
+
+@lru_cache(maxsize=4)
+def list_monitors(desktop: VirtualDesktopGeometry | None = None) -> tuple[VirtualDesktopGeometry, ...]:
+    """Screen rectangles of the physical monitors, numbered from 1 as mss does.
+
+    Cached per desktop geometry, so a changed monitor layout (which changes the
+    virtual desktop) is enumerated again. Empty when monitors cannot be listed.
+    """
+
+    try:
+        import mss
+
+        with mss.mss() as sct:
+            monitors = sct.monitors[1:]
+    except Exception:
+        return ()
+    return tuple(
+        VirtualDesktopGeometry(left=int(m["left"]), top=int(m["top"]), width=int(m["width"]), height=int(m["height"]))
+        for m in monitors
+    )
+
+
+def pil_to_bgra(img: Image.Image) -> np.ndarray:
+    """Convert a PIL image into a (H, W, 4) uint8 BGRA array."""
+
+    raw = img.convert("RGBA").tobytes("raw", "BGRA")
+    w, h = img.size
+    return np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 4)
+
+
+def bgra_to_pil(pixels: np.ndarray) -> Image.Image:
+    """Convert a (H, W, 4) BGRA array into an RGB PIL image (copies)."""
+
+    h, w = pixels.shape[:2]
+    buf = np.ascontiguousarray(pixels)
+    return Image.frombuffer("RGB", (w, h), buf, "raw", "BGRX", 0, 1)
+
+
+@dataclass(frozen=True, eq=False)
 class CaptureResult:
-    image: Image.Image
+    """One captured frame.
+
+    `pixels` is a (H, W, 4) BGRA uint8 array. For the mss backend it is a view
+    over the grabber's own buffer, so nothing is copied between capture and
+    matching. `image` is built lazily for consumers that still need PIL.
+
+    For a single monitor's frame, `geometry` is that monitor and `desktop` the
+    whole virtual desktop, which is what `click()` maps coordinates against.
+    """
+
+    pixels: np.ndarray
     geometry: VirtualDesktopGeometry
+    desktop: VirtualDesktopGeometry | None = None
 
+    @property
+    def desktop_geometry(self) -> VirtualDesktopGeometry:
+        return self.desktop or self.geometry
 
-class VirtualDesktopCapture:
-    """Captures the full virtual desktop and returns (PIL.Image, origin_xy)."""
+    @cached_property
+    def image(self) -> Image.Image:
+        return bgra_to_pil(self.pixels)
 
-    def screenshot(self) -> CaptureResult:
-        if sys.platform == "win32":
-            # Prefer mss on Windows for multi-monitor reliability.
+
+class CaptureBackend:
+    """Source of raw BGRA frames. Subclasses keep their handles open between grabs."""
+
+    name = "base"
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def grab(self) -> CaptureResult:
+        raise NotImplementedError
+
+    def monitors(self) -> list[MonitorInfo]:
+        """The physical monitors, or [] if this backend cannot tell them apart."""
+
+        return []
+
+    def grab_monitor(self, monitor: MonitorInfo) -> CaptureResult:
+        """One monitor's frame. This fallback grabs the desktop and crops it (no copy)."""
+
+        full = self.grab()
+        g, d = monitor.geometry, full.geometry
+        x, y = g.left - d.left, g.top - d.top
+        pixels = full.pixels[max(0, y) : y + g.height, max(0, x) : x + g.width]
+        return CaptureResult(pixels=pixels, geometry=g, desktop=d)
+
+
+class MssCaptureBackend(CaptureBackend):
+    name = "mss"
+
+    def __init__(self):
+        self._sct = None
+
+    def open(self) -> None:
+        if self._sct is None:
+            import mss
+
+            self._sct = mss.mss()
+
+    def close(self) -> None:
+        if self._sct is not None:
             try:
-                import mss
-
-                with mss.mss() as sct:
-                    mon = sct.monitors[0]  # virtual screen
-                    left = int(mon["left"])
-                    top = int(mon["top"])
-                    width = int(mon["width"])
-                    height = int(mon["height"])
-                    grabbed = sct.grab(mon)
-
-                    img = Image.frombytes(
-                        "RGB",
-                        (grabbed.width, grabbed.height),
-                        grabbed.rgb,
-                    )
-                    geom = VirtualDesktopGeometry(left=left, top=top, width=width, height=height)
-                    return CaptureResult(image=img, geometry=geom)
-            except Exception:
-                pass
+                self._sct.close()
+            finally:
+                self._sct = None
+
+    def grab(self) -> CaptureResult:
+        self.open()
+        mon = self._sct.monitors[0]  # virtual screen
+        grabbed = self._sct.grab(mon)
+
+        # `raw` is the BGRA bytearray filled by the OS call; wrap it, don't copy it.
+        pixels = np.frombuffer(grabbed.raw, dtype=np.uint8).reshape(grabbed.height, grabbed.width, 4)
+        geom = VirtualDesktopGeometry(
+            left=int(mon["left"]),
+            top=int(mon["top"]),
+            width=int(mon["width"]),
+            height=int(mon["height"]),
+        )
+        return CaptureResult(pixels=pixels, geometry=geom)
+
+    def monitors(self) -> list[MonitorInfo]:
+        from .dpi import monitor_dpi_scale
+
+        self.open()
+        result = []
+        for i, mon in enumerate(self._sct.monitors[1:], start=1):
+            geom = VirtualDesktopGeometry(
+                left=int(mon["left"]), top=int(mon["top"]), width=int(mon["width"]), height=int(mon["height"])
+            )
+            result.append(MonitorInfo(i, geom, monitor_dpi_scale(geom)))
+        return result
+
+    def grab_monitor(self, monitor: MonitorInfo) -> CaptureResult:
+        self.open()
+        g = monitor.geometry
+        # Only this monitor's pixels cross from the OS into our buffer.
+        grabbed = self._sct.grab({"left": g.left, "top": g.top, "width": g.width, "height": g.height})
+        pixels = np.frombuffer(grabbed.raw, dtype=np.uint8).reshape(grabbed.height, grabbed.width, 4)
+        desk = self._sct.monitors[0]
+        desktop = VirtualDesktopGeometry(
+            left=int(desk["left"]), top=int(desk["top"]), width=int(desk["width"]), height=int(desk["height"])
+        )
+        return CaptureResult(pixels=pixels, geometry=g, desktop=desktop)
 
-            # Fallback to Pillow ImageGrab
-            from PIL import ImageGrab
 
-            bbox, origin = get_virtual_screen_bbox_windows()
-            img = ImageGrab.grab(bbox=bbox)
-            left, top, right, bottom = bbox
-            geom = VirtualDesktopGeometry(left=int(left), top=int(top), width=int(right - left), height=int(bottom - top))
-            return CaptureResult(image=img, geometry=geom)
+class ImageGrabCaptureBackend(CaptureBackend):
+    name = "imagegrab"
 
+    def grab(self) -> CaptureResult:
+        from PIL import ImageGrab
+
+        bbox, origin = get_virtual_screen_bbox_windows()
+        img = ImageGrab.grab(bbox=bbox)
+        left, top, right, bottom = bbox
+        geom = VirtualDesktopGeometry(left=int(left), top=int(top), width=int(right - left), height=int(bottom - top))
+        return CaptureResult(pixels=pil_to_bgra(img), geometry=geom)
+
+
+class PyAutoGuiCaptureBackend(CaptureBackend):
+    name = "pyautogui"
+
+    def grab(self) -> CaptureResult:
         import pyautogui
 
         img = pyautogui.screenshot()
         w, h = img.size
         geom = VirtualDesktopGeometry(left=0, top=0, width=int(w), height=int(h))
-        return CaptureResult(image=img, geometry=geom)
+        return CaptureResult(pixels=pil_to_bgra(img), geometry=geom)
+
+
+class SyntheticCaptureBackend(CaptureBackend):
+    """In-memory backend for benchmarks and headless runs.
+
+    Cycles through the given BGRA frames (or a single blank frame). Frames are
+    handed out as-is, so grabbing is as close to free as a backend can get.
+    `monitors` (screen coordinates) splits the frame into monitors; by default
+    the whole frame is one monitor.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        width: int = 1920,
+        height: int = 1080,
+        left: int = 0,
+        top: int = 0,
+        frames: list[np.ndarray] | None = None,
+        monitors: list[MonitorInfo] | None = None,
+    ):
+        if frames:
+            height, width = frames[0].shape[:2]
+        else:
+            frames = [np.zeros((height, width, 4), dtype=np.uint8)]
+        self.frames = list(frames)
+        self.geometry = VirtualDesktopGeometry(left=int(left), top=int(top), width=int(width), height=int(height))
+        self._monitors = list(monitors) if monitors else [MonitorInfo(1, self.geometry)]
+        self._index = 0
+
+    def set_frames(self, frames: list[np.ndarray]) -> None:
+        self.frames = list(frames)
+        self._index = 0
+
+    def grab(self) -> CaptureResult:
+        pixels = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        return CaptureResult(pixels=pixels, geometry=self.geometry)
+
+    def monitors(self) -> list[MonitorInfo]:
+        return list(self._monitors)
+
+
+_BACKENDS: dict[str, type[CaptureBackend]] = {
+    MssCaptureBackend.name: MssCaptureBackend,
+    ImageGrabCaptureBackend.name: ImageGrabCaptureBackend,
+    PyAutoGuiCaptureBackend.name: PyAutoGuiCaptureBackend,
+    SyntheticCaptureBackend.name: SyntheticCaptureBackend,
+}
+
+
+def default_backend_names() -> list[str]:
+    if sys.platform == "win32":
+        # Prefer mss on Windows for multi-monitor reliability.
+        return ["mss", "imagegrab"]
+    return ["pyautogui"]
+
+
+def create_capture_backend(name: str) -> CaptureBackend:
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown capture backend: {name!r}") from None
+
+
+# Seconds a failed backend is passed over before it is tried again; doubles per failure in a row.
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 30.0
+
+
+class VirtualDesktopCapture:
+    """Long-lived capture session for the full virtual desktop.
+
+    Keeps the backend open across frames. With `backend="auto"` a call that
+    fails on the preferred backend falls back to the next candidate for that
+    call only: the failed backend is closed and retried after a backoff, so a
+    transient failure (the secure desktop, the lock screen) does not lose it
+    for the rest of the session.
+    """
+
+    def __init__(self, backend: str | CaptureBackend = "auto"):
+        if isinstance(backend, CaptureBackend):
+            self._candidates = [backend]
+        elif backend == "auto":
+            self._candidates = [create_capture_backend(n) for n in default_backend_names()]
+        else:
+            self._candidates = [create_capture_backend(backend)]
+        self._active = 0
+        self._opened: set[int] = set()
+        self._failures = [0] * len(self._candidates)
+        self._retry_at = [0.0] * len(self._candidates)
+
+    @property
+    def backend(self) -> CaptureBackend:
+        """The backend that served the last successful call."""
+
+        return self._candidates[self._active]
+
+    def open(self) -> None:
+        self._open(self._active)
+
+    def _open(self, index: int) -> None:
+        if index not in self._opened:
+            self._candidates[index].open()
+            self._opened.add(index)
+
+    def close(self) -> None:
+        opened, self._opened = self._opened, set()
+        for index in sorted(opened):
+            self._candidates[index].close()
+
+    def __enter__(self) -> VirtualDesktopCapture:
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def screenshot(self) -> CaptureResult:
+        return self._with_backend(lambda backend: backend.grab())
+
+    def monitors(self) -> list[MonitorInfo]:
+        # Polled rarely, so the preferred backend is always asked: a fallback that
+        # cannot tell monitors apart must not decide the layout during its backoff.
+        return self._with_backend(lambda backend: backend.monitors(), retry=True)
+
+    def grab_monitor(self, monitor: MonitorInfo) -> CaptureResult:
+        return self._with_backend(lambda backend: backend.grab_monitor(monitor))
+
+    def _with_backend(self, call, retry: bool = False):
+        now = time.monotonic()
+        last = len(self._candidates) - 1
+        for index, backend in enumerate(self._candidates):
+            if index < last and not retry and self._retry_at[index] > now:
+                continue
+            try:
+                self._open(index)
+                result = call(backend)
+            except Exception:
+                if index == last:
+                    raise
+                self._failed(index, now)
+                continue
+            self._failures[index] = 0
+            self._retry_at[index] = 0.0
+            self._active = index
+            return result
+
+    def _failed(self, index: int, now: float) -> None:
+        self._opened.discard(index)
+        try:
+            self._candidates[index].close()
+        except Exception:
+            pass
+        self._failures[index] += 1
+        backoff = RETRY_BACKOFF * 2 ** (self._failures[index] - 1)
+        self._retry_at[index] = now + min(RETRY_BACKOFF_MAX, backoff)
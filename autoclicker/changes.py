@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .regions import Rect, merge_rects, tile_runs
+
+
+@dataclass(frozen=True)
+class FrameChange:
+    """Result of comparing a frame against the previous one.
+
+    `dirty` lists the changed areas in frame pixels. When `full` is set the
+    whole frame should be treated as changed (first frame, size change, or too
+    many dirty tiles for regional search to pay off).
+    """
+
+    changed: bool
+    full: bool
+    dirty: list[Rect] = field(default_factory=list)
+
+
+@dataclass
+class ChangeStats:
+    frames: int = 0
+    skipped: int = 0
+    partial: int = 0
+    full: int = 0
+    dirty_area: int = 0
+    total_area: int = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def searched_ratio(self) -> float:
+        """Fraction of captured pixels that still had to be searched."""
+
+        return self.dirty_area / self.total_area if self.total_area else 1.0
+
+    def summary(self) -> str:
+        return (
+            f"frames={self.frames} skipped={self.skipped} ({self.skip_ratio:.0%}) "
+            f"partial={self.partial} full={self.full} searched_area={self.searched_ratio:.0%}"
+        )
+
+
+class FrameChangeDetector:
+    """Tile the frame and keep a cheap fingerprint per tile.
+
+    The fingerprint is a random bilinear hash of the tile's 32-bit BGRA pixels
+    (sum of pixel * row_weight * col_weight mod 2**64). Any realistic pixel
+    change alters it, including content that merely moves within a tile, and it
+    is computed band by band so the temporary memory stays small.
+    """
+
+    def __init__(self, tile_size: int = 64, full_frame_ratio: float = 0.5, seed: int = 0x5EED):
+        self.tile_size = max(8, int(tile_size))
+        self.full_frame_ratio = float(full_frame_ratio)
+        self.stats = ChangeStats()
+        self._rng = np.random.default_rng(seed)
+        self._prev: np.ndarray | None = None
+        self._shape: tuple[int, int] | None = None
+        self._row_w: np.ndarray | None = None
+        self._col_w: np.ndarray | None = None
+
+    def reset(self) -> None:
+        """Forget the previous frame so the next one is reported as fully changed."""
+
+        self._prev = None
+
+    def _weights(self, height: int, width: int) -> None:
+        if self._shape == (height, width):
+            return
+        self._shape = (height, width)
+        info = np.iinfo(np.uint64)
+        # Odd multipliers keep every pixel's contribution invertible mod 2**64.
+        self._row_w = self._rng.integers(0, info.max, size=height, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._col_w = self._rng.integers(0, info.max, size=width, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._prev = None
+
+    def fingerprint(self, pixels: np.ndarray) -> np.ndarray:
+        height, width = pixels.shape[:2]
+        self._weights(height, width)
+
+        if pixels.ndim == 3 and pixels.shape[2] == 4:
+            words = np.ascontiguousarray(pixels).view(np.uint32)[..., 0]
+        else:
+            words = pixels.reshape(height, width, -1)[..., 0]
+
+        ts = self.tile_size
+        col_starts = np.arange(0, width, ts)
+        rows = []
+        for top in range(0, height, ts):
+            band = words[top : top + ts].astype(np.uint64)
+            band *= self._row_w[top : top + ts, None]
+            col_sums = band.sum(axis=0, dtype=np.uint64)
+            col_sums *= self._col_w
+            rows.append(np.add.reduceat(col_sums, col_starts))
+        return np.vstack(rows)
+
+    def update(self, pixels: np.ndarray) -> FrameChange:
+        height, width = pixels.shape[:2]
+        prints = self.fingerprint(pixels)
+        prev, self._prev = self._prev, prints
+
+        self.stats.frames += 1
+        self.stats.total_area += height * width
+
+        if prev is None or prev.shape != prints.shape:
+            self.stats.full += 1
+            self.stats.dirty_area += height * width
+            return FrameChange(changed=True, full=True, dirty=[Rect(0, 0, width, height)])
+
+        dirty_tiles = prints != prev
+        n_dirty = int(dirty_tiles.sum())
+        if n_dirty == 0:
+            self.stats.skipped += 1
+            return FrameChange(changed=False, full=False)
+
+        if n_dirty >= self.full_frame_ratio * dirty_tiles.size:
+            self.stats.full += 1
+            self.stats.dirty_area += height * width
+            return FrameChange(changed=True, full=True, dirty=[Rect(0, 0, width, height)])
+
+        dirty = merge_rects(tile_runs(dirty_tiles, self.tile_size, width, height), gap=1)
+        self.stats.partial += 1
+        self.stats.dirty_area += sum(r.area for r in dirty)
+        return FrameChange(changed=True, full=False, dirty=dirty)
@@ -1,219 +1,414 @@
+"""Click backends.
+
+A backend is created once and kept for the whole run, so whatever it needs
+per click is prepared up front. `sendinput` (Windows) builds its ctypes
+structures once and caches the virtual screen metrics and the cursor
+compensation it learns on the first click. Both are re-read only when the
+display configuration changes: when the capture geometry changes, when the
+app notices a new monitor layout (`invalidate`), or after `METRICS_REFRESH`
+seconds. `pyautogui` is the portable fallback, and `record` only records the
+clicks, which lets the loop and the click latency be measured headless.
+"""
+
 from __future__ import annotations
 
 import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import numpy as np
 
 from .capture import VirtualDesktopGeometry
 
+# Seconds a cached virtual screen metric is trusted without a layout change.
+METRICS_REFRESH = 5.0
+
 
 def _to_int_xy(point):
     x, y = point
     return int(x), int(y)
 
 
-def click(point, geometry: VirtualDesktopGeometry | None = None):
-    x, y = _to_int_xy(point)
+@dataclass
+class ClickStats:
+    clicks: int = 0
+    calibrations: int = 0
+    metric_reads: int = 0
+    dispatch_ms: deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def summary(self) -> str:
+        if not self.dispatch_ms:
+            return f"clicks={self.clicks}"
+        ms = np.asarray(self.dispatch_ms)
+        return (
+            f"clicks={self.clicks} dispatch p50={np.percentile(ms, 50):.2f} ms max={ms.max():.2f} ms "
+            f"calibrations={self.calibrations} metric_reads={self.metric_reads}"
+        )
 
-    if sys.platform == "win32":
-        try:
-            _click_windows_virtual_desktop(x, y, geometry)
-            return
-        except Exception:
-            pass
 
-    import pyautogui
+class ClickBackend:
+    """Sends left clicks at screen coordinates; call it with (point, geometry=...)."""
+
+    name = "base"
 
-    pyautogui.click((x, y))
+    def __init__(self):
+        self.stats = ClickStats()
 
+    def click(self, x: int, y: int, geometry: VirtualDesktopGeometry | None) -> None:
+        raise NotImplementedError
 
-def _click_windows_virtual_desktop(x: int, y: int, geometry: VirtualDesktopGeometry | None) -> None:
-    import ctypes
+    def invalidate(self) -> None:
+        """Forget cached display state; the monitor layout or DPI changed."""
 
-    user32 = ctypes.windll.user32
+    def __call__(self, point, geometry: VirtualDesktopGeometry | None = None) -> None:
+        x, y = _to_int_xy(point)
+        start = time.perf_counter()
+        self.click(x, y, geometry)
+        self.stats.clicks += 1
+        self.stats.dispatch_ms.append((time.perf_counter() - start) * 1000.0)
 
-    # SendInput with MOUSEEVENTF_VIRTUALDESK maps absolute coordinates using the
-    # system's virtual screen metrics. Therefore, we always normalize against
-    # system metrics, and (optionally) map coordinates from the capture backend
-    # geometry into system space when they differ.
-    SM_XVIRTUALSCREEN = 76
-    SM_YVIRTUALSCREEN = 77
-    SM_CXVIRTUALSCREEN = 78
-    SM_CYVIRTUALSCREEN = 79
-    sys_left = int(user32.GetSystemMetrics(SM_XVIRTUALSCREEN))
-    sys_top = int(user32.GetSystemMetrics(SM_YVIRTUALSCREEN))
-    sys_width = int(user32.GetSystemMetrics(SM_CXVIRTUALSCREEN))
-    sys_height = int(user32.GetSystemMetrics(SM_CYVIRTUALSCREEN))
 
-    if sys_width <= 1 or sys_height <= 1:
+class PyAutoGuiClickBackend(ClickBackend):
+    name = "pyautogui"
+
+    def click(self, x, y, geometry):
         import pyautogui
 
         pyautogui.click((x, y))
-        return
-
-    # Map capture-space coordinates into system-space if capture geometry is provided.
-    # This fixes mixed-DPI setups where the screenshot backend reports a different
-    # virtual desktop size than the system metrics used by SendInput.
-    click_x = int(x)
-    click_y = int(y)
-    if geometry is not None:
-        cap_left = int(geometry.left)
-        cap_top = int(geometry.top)
-        cap_width = int(geometry.width)
-        cap_height = int(geometry.height)
-
-        if cap_width > 1 and cap_height > 1:
-            if (
-                cap_left != sys_left
-                or cap_top != sys_top
-                or cap_width != sys_width
-                or cap_height != sys_height
-            ):
-                # Scale relative position from capture-space into system-space.
-                rx = (click_x - cap_left) / (cap_width - 1)
-                ry = (click_y - cap_top) / (cap_height - 1)
-                click_x = int(round(sys_left + rx * (sys_width - 1)))
-                click_y = int(round(sys_top + ry * (sys_height - 1)))
 
-    click_x = max(sys_left, min(sys_left + sys_width - 1, int(click_x)))
-    click_y = max(sys_top, min(sys_top + sys_height - 1, int(click_y)))
 
-    class POINT(ctypes.Structure):
-        _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+@dataclass(frozen=True)
+class RecordedClick:
+    x: int
+    y: int
+    geometry: VirtualDesktopGeometry | None
+    at: float
 
-    def _get_cursor_pos() -> tuple[int, int]:
-        pt = POINT()
-        user32.GetCursorPos(ctypes.byref(pt))
-        return int(pt.x), int(pt.y)
 
-    def _get_physical_cursor_pos() -> tuple[int, int] | None:
-        try:
-            if hasattr(user32, "GetPhysicalCursorPos"):
-                user32.GetPhysicalCursorPos.argtypes = [ctypes.POINTER(POINT)]
-                user32.GetPhysicalCursorPos.restype = ctypes.c_bool
-                pt = POINT()
-                if bool(user32.GetPhysicalCursorPos(ctypes.byref(pt))):
-                    return int(pt.x), int(pt.y)
-        except Exception:
-            return None
-        return None
+class RecordingClickBackend(ClickBackend):
+    """Records clicks instead of sending them (the last `limit`; 0 keeps every click)."""
+
+    name = "record"
+
+    def __init__(self, limit: int = 1000):
+        super().__init__()
+        self.clicks: deque[RecordedClick] = deque(maxlen=int(limit) if limit > 0 else None)
+
+    def click(self, x, y, geometry):
+        self.clicks.append(RecordedClick(x, y, geometry, time.time()))
+
+    def check(self, expected, tolerance: int = 4) -> ClickCheck:
+        """Compare the recorded clicks with `expected` (anything with `x` and `y`)."""
+
+        return check_clicks(list(self.clicks), expected, tolerance)
 
-    def _set_cursor(px: int, py: int) -> bool:
+
+@dataclass
+class ClickCheck:
+    matched: int
+    # expected clicks that did not happen, and clicks nobody expected
+    missing: list
+    unexpected: list
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.unexpected
+
+    def summary(self) -> str:
+        def points(clicks) -> str:
+            shown = ", ".join(f"({c.x}, {c.y})" for c in clicks[:5])
+            return shown + (f" and {len(clicks) - 5} more" if len(clicks) > 5 else "")
+
+        text = f"matched={self.matched} missing={len(self.missing)} unexpected={len(self.unexpected)}"
+        if self.missing:
+            text += f"; missing: {points(self.missing)}"
+        if self.unexpected:
+            text += f"; unexpected: {points(self.unexpected)}"
+        return text
+
+
+def check_clicks(clicks, expected, tolerance: int = 4) -> ClickCheck:
+    """Pair each expected click, in order, with the first unpaired click within `tolerance` px."""
+
+    unpaired = list(clicks)
+    missing = []
+    for want in expected:
+        for i, got in enumerate(unpaired):
+            if abs(got.x - want.x) <= tolerance and abs(got.y - want.y) <= tolerance:
+                del unpaired[i]
+                break
+        else:
+            missing.append(want)
+    return ClickCheck(len(expected) - len(missing), missing, unpaired)
+
+
+class SendInputClickBackend(ClickBackend):
+    """`SendInput` in virtual-desktop absolute coordinates (Windows).
+
+    `user32`/`kernel32` default to private handles of the real DLLs (the
+    process-wide `ctypes.windll` ones are left untouched); anything with the
+    same functions can stand in for them (the click benchmark does).
+    """
+
+    name = "sendinput"
+
+    def __init__(self, user32=None, kernel32=None):
+        super().__init__()
+        self._user32 = user32
+        self._kernel32 = kernel32
+        self._api: SimpleNamespace | None = None
+        # (left, top, width, height) of the system's virtual screen
+        self._metrics: tuple[int, int, int, int] | None = None
+        self._metrics_at = 0.0
+        self._geometry: VirtualDesktopGeometry | None = None
+        # Learned cursor compensation (see `_calibrate`).
+        self._ratios: tuple[float, float] | None = None
+
+    def invalidate(self) -> None:
+        self._metrics = None
+        self._ratios = None
+
+    def _setup(self) -> SimpleNamespace:
+        import ctypes
+
+        # Private DLL handles: prototypes set on the shared `ctypes.windll` ones would break
+        # other callers of the same functions (pyautogui passes its own POINT to GetCursorPos).
+        user32 = self._user32 if self._user32 is not None else ctypes.WinDLL("user32", use_last_error=True)
+        kernel32 = self._kernel32 if self._kernel32 is not None else ctypes.WinDLL("kernel32", use_last_error=True)
+
+        class POINT(ctypes.Structure):
+            _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [
+                ("dx", ctypes.c_long),
+                ("dy", ctypes.c_long),
+                ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong),
+                ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong)),
+            ]
+
+        class INPUT(ctypes.Structure):
+            class _I(ctypes.Union):
+                _fields_ = [("mi", MOUSEINPUT)]
+
+            _anonymous_ = ("i",)
+            _fields_ = [("type", ctypes.c_ulong), ("i", _I)]
+
+        set_cursor = []
         # Prefer SetPhysicalCursorPos when available.
-        try:
-            if hasattr(user32, "SetPhysicalCursorPos"):
-                user32.SetPhysicalCursorPos.argtypes = [ctypes.c_int, ctypes.c_int]
-                user32.SetPhysicalCursorPos.restype = ctypes.c_bool
-                if bool(user32.SetPhysicalCursorPos(int(px), int(py))):
+        for name in ("SetPhysicalCursorPos", "SetCursorPos"):
+            fn = getattr(user32, name, None)
+            if fn is not None:
+                fn.argtypes = [ctypes.c_int, ctypes.c_int]
+                fn.restype = ctypes.c_bool
+                set_cursor.append(fn)
+        user32.GetCursorPos.argtypes = [ctypes.POINTER(POINT)]
+        user32.GetSystemMetrics.argtypes = [ctypes.c_int]
+        user32.SendInput.argtypes = [ctypes.c_uint, ctypes.POINTER(INPUT), ctypes.c_int]
+        user32.SendInput.restype = ctypes.c_uint
+
+        INPUT_MOUSE = 0
+        MOUSEEVENTF_MOVE = 0x0001
+        MOUSEEVENTF_LEFTDOWN = 0x0002
+        MOUSEEVENTF_LEFTUP = 0x0004
+        MOUSEEVENTF_ABSOLUTE = 0x8000
+        MOUSEEVENTF_VIRTUALDESK = 0x4000
+
+        # IMPORTANT:
+        # - For button events, Windows ignores dx/dy unless MOUSEEVENTF_MOVE is set.
+        # - SetCursorPos/SetPhysicalCursorPos can be DPI-virtualized on mixed-DPI setups.
+        # Therefore, always move via SendInput in virtual-desktop absolute coordinates
+        # right before clicking. All three events go out in one call.
+        events = (INPUT * 3)()
+        for event, flags in zip(
+            events,
+            (MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK, MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+        ):
+            event.type = INPUT_MOUSE
+            event.mi.dwFlags = flags
+
+        point = POINT()
+        return SimpleNamespace(
+            user32=user32,
+            kernel32=kernel32,
+            point=point,
+            point_ref=ctypes.byref(point),
+            set_cursor=set_cursor,
+            events=events,
+            event_size=ctypes.sizeof(INPUT),
+        )
+
+    def _system_metrics(self, geometry: VirtualDesktopGeometry | None) -> tuple[int, int, int, int]:
+        now = time.monotonic()
+        if self._metrics is None or geometry != self._geometry or now - self._metrics_at > METRICS_REFRESH:
+            # SendInput with MOUSEEVENTF_VIRTUALDESK maps absolute coordinates using the
+            # system's virtual screen metrics, so those are what clicks are normalized against.
+            SM_XVIRTUALSCREEN = 76
+            SM_YVIRTUALSCREEN = 77
+            SM_CXVIRTUALSCREEN = 78
+            SM_CYVIRTUALSCREEN = 79
+            user32 = self._api.user32
+            metrics = (
+                int(user32.GetSystemMetrics(SM_XVIRTUALSCREEN)),
+                int(user32.GetSystemMetrics(SM_YVIRTUALSCREEN)),
+                int(user32.GetSystemMetrics(SM_CXVIRTUALSCREEN)),
+                int(user32.GetSystemMetrics(SM_CYVIRTUALSCREEN)),
+            )
+            self.stats.metric_reads += 1
+            if metrics != self._metrics:
+                self._ratios = None
+            self._metrics, self._metrics_at, self._geometry = metrics, now, geometry
+        return self._metrics
+
+    def _set_cursor(self, x: int, y: int) -> bool:
+        for fn in self._api.set_cursor:
+            try:
+                if bool(fn(int(x), int(y))):
                     return True
-        except Exception:
-            pass
+            except Exception:
+                pass
+        return False
 
-        try:
-            user32.SetCursorPos.argtypes = [ctypes.c_int, ctypes.c_int]
-            user32.SetCursorPos.restype = ctypes.c_bool
-            return bool(user32.SetCursorPos(int(px), int(py)))
-        except Exception:
-            return False
+    def _cursor_pos(self) -> tuple[int, int]:
+        self._api.user32.GetCursorPos(self._api.point_ref)
+        return int(self._api.point.x), int(self._api.point.y)
 
-    def _maybe_empirical_compensate(target_x: int, target_y: int, actual_x: int, actual_y: int) -> tuple[int, int, str] | None:
-        # Empirical compensation for DPI-virtualized cursor movement.
-        # We assume a mapping like: actual = origin + (requested-origin) * factor.
-        # If we requested target and got actual, estimate factor and invert it.
-        if abs(actual_x - target_x) <= 2 and abs(actual_y - target_y) <= 2:
-            return None
+    def _calibrate(self, x: int, y: int, metrics: tuple[int, int, int, int]) -> None:
+        """Learn how the OS scales cursor moves (DPI virtualization) from one probe move.
 
-        ox, oy = sys_left, sys_top
-        dx_t = float(target_x - ox)
-        dy_t = float(target_y - oy)
-        dx_a = float(actual_x - ox)
-        dy_a = float(actual_y - oy)
+        We assume a mapping like: actual = origin + (requested - origin) * factor,
+        and store the inverse factor. A probe too close to the origin teaches
+        nothing; the next click probes again.
+        """
+
+        self.stats.calibrations += 1
+        self._set_cursor(x, y)
+        try:
+            self._api.kernel32.Sleep(10)
+        except Exception:
+            pass
+        actual_x, actual_y = self._cursor_pos()
+        if abs(actual_x - x) <= 2 and abs(actual_y - y) <= 2:
+            self._ratios = (1.0, 1.0)
+            return
 
+        ox, oy = metrics[0], metrics[1]
+        dx_a, dy_a = float(actual_x - ox), float(actual_y - oy)
         # Avoid division by zero.
         if abs(dx_a) < 1.0 or abs(dy_a) < 1.0:
-            return None
+            return
+        # Clamp to sane range to avoid wild jumps.
+        self._ratios = (
+            max(0.5, min(2.0, (x - ox) / dx_a)),
+            max(0.5, min(2.0, (y - oy) / dy_a)),
+        )
 
-        ratio_x = dx_t / dx_a
-        ratio_y = dy_t / dy_a
+    def click(self, x, y, geometry):
+        if self._api is None:
+            self._api = self._setup()
+        sys_left, sys_top, sys_width, sys_height = self._system_metrics(geometry)
+        if sys_width <= 1 or sys_height <= 1:
+            import pyautogui
 
-        # Clamp to sane range to avoid wild jumps.
-        ratio_x = max(0.5, min(2.0, ratio_x))
-        ratio_y = max(0.5, min(2.0, ratio_y))
+            pyautogui.click((x, y))
+            return
+
+        # Map capture-space coordinates into system-space if capture geometry is provided.
+        # This fixes mixed-DPI setups where the screenshot backend reports a different
+        # virtual desktop size than the system metrics used by SendInput.
+        click_x, click_y = x, y
+        if geometry is not None and geometry.width > 1 and geometry.height > 1:
+            if (geometry.left, geometry.top, geometry.width, geometry.height) != (sys_left, sys_top, sys_width, sys_height):
+                # Scale relative position from capture-space into system-space.
+                rx = (click_x - geometry.left) / (geometry.width - 1)
+                ry = (click_y - geometry.top) / (geometry.height - 1)
+                click_x = int(round(sys_left + rx * (sys_width - 1)))
+                click_y = int(round(sys_top + ry * (sys_height - 1)))
+
+        click_x = max(sys_left, min(sys_left + sys_width - 1, int(click_x)))
+        click_y = max(sys_top, min(sys_top + sys_height - 1, int(click_y)))
+
+        # Put the cursor there first (compensated for DPI-virtualized cursor moves).
+        if self._ratios is None:
+            self._calibrate(click_x, click_y, (sys_left, sys_top, sys_width, sys_height))
+        if self._ratios is not None and self._ratios != (1.0, 1.0):
+            req_x = int(round(sys_left + (click_x - sys_left) * self._ratios[0]))
+            req_y = int(round(sys_top + (click_y - sys_top) * self._ratios[1]))
+            self._set_cursor(
+                max(sys_left, min(sys_left + sys_width - 1, req_x)),
+                max(sys_top, min(sys_top + sys_height - 1, req_y)),
+            )
+        elif self._ratios is not None:
+            self._set_cursor(click_x, click_y)
+
+        move = self._api.events[0].mi
+        move.dx = int(round((click_x - sys_left) * 65535 / (sys_width - 1)))
+        move.dy = int(round((click_y - sys_top) * 65535 / (sys_height - 1)))
+        self._api.user32.SendInput(3, self._api.events, self._api.event_size)
 
-        req_x = int(round(ox + dx_t * ratio_x))
-        req_y = int(round(oy + dy_t * ratio_y))
 
-        # Keep within virtual desktop bounds.
-        req_x = max(sys_left, min(sys_left + sys_width - 1, req_x))
-        req_y = max(sys_top, min(sys_top + sys_height - 1, req_y))
+_BACKENDS: dict[str, type[ClickBackend]] = {
+    SendInputClickBackend.name: SendInputClickBackend,
+    PyAutoGuiClickBackend.name: PyAutoGuiClickBackend,
+    RecordingClickBackend.name: RecordingClickBackend,
+}
 
-        details = f"emp_fix ratio=({ratio_x:.3f},{ratio_y:.3f}) requested=({req_x},{req_y})"
-        return req_x, req_y, details
 
-    # Prefer moving cursor via SetPhysicalCursorPos/SetCursorPos.
-    kernel32 = ctypes.windll.kernel32
-    moved = _set_cursor(click_x, click_y)
+def default_click_backend_names() -> list[str]:
+    if sys.platform == "win32":
+        return ["sendinput", "pyautogui"]
+    return ["pyautogui"]
+
+
+class FallbackClickBackend(ClickBackend):
+    """Uses the first backend; if it fails, the next one takes over for the rest of the run."""
+
+    def __init__(self, candidates: list[ClickBackend]):
+        super().__init__()
+        self._candidates = candidates
+
+    @property
+    def backend(self) -> ClickBackend:
+        return self._candidates[0]
+
+    @property
+    def name(self) -> str:
+        return f"auto: {self.backend.name}"
+
+    def invalidate(self) -> None:
+        self.backend.invalidate()
+
+    def click(self, x, y, geometry):
+        while True:
+            try:
+                return self.backend.click(x, y, geometry)
+            except Exception as e:
+                if len(self._candidates) == 1:
+                    raise
+                print(f"Click backend '{self.backend.name}' failed ({e}); falling back to '{self._candidates[1].name}'.")
+                self._candidates.pop(0)
+
+
+def create_click_backend(name: str = "auto") -> ClickBackend:
+    if name == "auto":
+        return FallbackClickBackend([_BACKENDS[n]() for n in default_click_backend_names()])
     try:
-        kernel32.Sleep(10)
-    except Exception:
-        pass
-    after1_x, after1_y = _get_cursor_pos()
-    phys1 = _get_physical_cursor_pos()
-
-    fix_details = None
-    after2_x, after2_y = after1_x, after1_y
-    phys2 = phys1
-    compensated = False
-    correction = _maybe_empirical_compensate(click_x, click_y, after1_x, after1_y)
-    if correction is not None:
-        req_x, req_y, fix_details = correction
-        moved = _set_cursor(req_x, req_y) or moved
-        compensated = True
-        try:
-            kernel32.Sleep(10)
-        except Exception:
-            pass
-        after2_x, after2_y = _get_cursor_pos()
-        phys2 = _get_physical_cursor_pos()
-
-    # Fallback: move using SendInput absolute mapping.
-    nx = int(round((click_x - sys_left) * 65535 / (sys_width - 1)))
-    ny = int(round((click_y - sys_top) * 65535 / (sys_height - 1)))
-
-    INPUT_MOUSE = 0
-    MOUSEEVENTF_MOVE = 0x0001
-    MOUSEEVENTF_LEFTDOWN = 0x0002
-    MOUSEEVENTF_LEFTUP = 0x0004
-    MOUSEEVENTF_ABSOLUTE = 0x8000
-    MOUSEEVENTF_VIRTUALDESK = 0x4000
-
-    class MOUSEINPUT(ctypes.Structure):
-        _fields_ = [
-            ("dx", ctypes.c_long),
-            ("dy", ctypes.c_long),
-            ("mouseData", ctypes.c_ulong),
-            ("dwFlags", ctypes.c_ulong),
-            ("time", ctypes.c_ulong),
-            ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong)),
-        ]
-
-    class INPUT(ctypes.Structure):
-        class _I(ctypes.Union):
-            _fields_ = [("mi", MOUSEINPUT)]
-
-        _anonymous_ = ("i",)
-        _fields_ = [("type", ctypes.c_ulong), ("i", _I)]
-
-    def _send(flags):
-        inp = INPUT(
-            type=INPUT_MOUSE,
-            mi=MOUSEINPUT(dx=nx, dy=ny, mouseData=0, dwFlags=flags, time=0, dwExtraInfo=None),
-        )
-        user32.SendInput(1, ctypes.byref(inp), ctypes.sizeof(inp))
-
-    # IMPORTANT:
-    # - For button events, Windows ignores dx/dy unless MOUSEEVENTF_MOVE is set.
-    # - SetCursorPos/SetPhysicalCursorPos can be DPI-virtualized on mixed-DPI setups.
-    # Therefore, always move via SendInput in virtual-desktop absolute coordinates
-    # right before clicking.
-    _send(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK)
-    _send(MOUSEEVENTF_LEFTDOWN)
-    _send(MOUSEEVENTF_LEFTUP)
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown click backend: {name!r}") from None
+
+
+_default: ClickBackend | None = None
+
+
+def click(point, geometry: VirtualDesktopGeometry | None = None):
+    """Click through a process-wide `auto` backend, created on first use."""
+
+    global _default
+    if _default is None:
+        _default = create_click_backend("auto")
+    _default(point, geometry=geometry)
@@ -23,6 +23,23 @@ def _env_float(name: str, default: float) -> float:
         return default
 
 
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def _env_choice(name: str, default: str, choices: set[str]) -> str:
+    raw = (os.getenv(name) or "").strip().lower()
+    if raw in choices:
+        return raw
+    return default
+
+
 def _env_scales(name: str, default_csv: str) -> list[float]:
     raw = os.getenv(name, default_csv)
     parts = [p.strip() for p in raw.split(",") if p.strip()]
@@ -54,9 +71,72 @@ class AppConfig:
     grayscale: bool
     scales: list[float]
     scan_interval: float
+    adaptive_scan: bool
+    scan_min_interval: float
+    scan_max_interval: float
+    scan_backoff: float
+    cpu_budget: float
     click_delay: float
+    location_cooldown: float
+    location_radius: int
+    max_clicks_per_frame: int
+    find_all: bool
     log_clicks: bool
     log_dir: str
+    log_mode: str
+    log_crop_size: int
+    log_max_width: int
+    log_format: str
+    log_quality: int
+    log_png_level: int
+    log_queue: int
+    log_max_files: int
+    log_max_mb: float
+    capture_backend: str
+    capture_mode: str
+    click_backend: str
+    replay_source: str
+    replay_paced: bool
+    replay_fps: float
+    replay_loop: bool
+    replay_expected: str
+    replay_tolerance: int
+    record_dir: str
+    record_memory_mb: float
+    record_max_mb: float
+    template_cache: str
+    template_memory_mb: float
+    targets_poll_interval: float
+    hit_order: bool
+    target_stats: str
+    cold_every: int
+    cold_after: float
+    match_engine: str
+    correlation: str
+    fft_cache_mb: float
+    search_mode: str
+    pyramid_levels: int
+    pyramid_candidates: int
+    feature_count: int
+    match_workers: int
+    pipeline: bool
+    pipeline_matchers: int
+    locality: bool
+    locality_history: int
+    locality_padding: int
+    locality_full_scan_every: int
+    dpi_scales: bool
+    dpi_scale_band: float
+    dpi_full_scan_every: int
+    prefilter: bool
+    prefilter_tile: int
+    change_detection: bool
+    change_tile_size: int
+    stats_interval: float
+    metrics: bool
+    metrics_file: str
+    metrics_interval: float
+    metrics_port: int
 
 
 def load_config() -> AppConfig:
@@ -66,25 +146,206 @@ def load_config() -> AppConfig:
     confidence = max(0.0, min(1.0, _env_float("AUTO_CLICKER_CONFIDENCE", 0.9)))
     grayscale = _env_bool("AUTO_CLICKER_GRAYSCALE", True)
     scales = _env_scales("AUTO_CLICKER_SCALES", "1.0")
+    match_engine = _env_choice("AUTO_CLICKER_MATCH_ENGINE", "opencv", {"opencv", "pyscreeze"})
+    correlation = _env_choice("AUTO_CLICKER_CORRELATION", "auto", {"auto", "spatial", "fft"})
+    # Per-frame budget for cached haystack spectra; 0 = unbounded.
+    fft_cache_mb = max(0.0, _env_float("AUTO_CLICKER_FFT_CACHE_MB", 128.0))
+    search_mode = _env_choice("AUTO_CLICKER_SEARCH_MODE", "scales", {"scales", "pyramid", "features"})
+    # 0 (or "auto") picks the level per template from its size.
+    pyramid_levels = max(0, _env_int("AUTO_CLICKER_PYRAMID_LEVELS", 0))
+    pyramid_candidates = max(1, _env_int("AUTO_CLICKER_PYRAMID_CANDIDATES", 3))
+    # Most ORB keypoints detected per frame (or changed area) by `features` search.
+    feature_count = max(500, _env_int("AUTO_CLICKER_FEATURE_COUNT", 20000))
+    # >1 spreads targets (and scales) over a thread pool.
+    match_workers = max(1, _env_int("AUTO_CLICKER_MATCH_WORKERS", 1))
+    # Capture and matching in separate processes, sharing frames via shared memory.
+    pipeline = _env_bool("AUTO_CLICKER_PIPELINE", False)
+    pipeline_matchers = max(1, _env_int("AUTO_CLICKER_PIPELINE_MATCHERS", 1))
+    # Search around previous hits first; full-frame search on a miss or every Nth scan.
+    # Off by default: a recent position may win over the first match in reading order.
+    locality = _env_bool("AUTO_CLICKER_LOCALITY", False)
+    locality_history = max(1, _env_int("AUTO_CLICKER_LOCALITY_HISTORY", 4))
+    locality_padding = max(0, _env_int("AUTO_CLICKER_LOCALITY_PADDING", 48))
+    locality_full_scan_every = max(0, _env_int("AUTO_CLICKER_LOCALITY_FULL_SCAN_EVERY", 10))
+    # Search each target at the one scale its DPI predicts (plus a relative band).
+    dpi_scales = _env_bool("AUTO_CLICKER_DPI_SCALES", False)
+    dpi_scale_band = max(0.0, min(0.5, _env_float("AUTO_CLICKER_DPI_SCALE_BAND", 0.0)))
+    dpi_full_scan_every = max(0, _env_int("AUTO_CLICKER_DPI_FULL_SCAN_EVERY", 20))
+    # Only search where a target's dominant colors appear (profiles can opt in or out).
+    prefilter = _env_bool("AUTO_CLICKER_PREFILTER", False)
+    prefilter_tile = max(8, _env_int("AUTO_CLICKER_PREFILTER_TILE", 32))
     # Throttle scanning to reduce CPU usage.
     scan_interval = _env_float("AUTO_CLICKER_SCAN_INTERVAL", 1.0)
     if scan_interval < 0:
         scan_interval = 1.0
+    # Opt-in adaptive pacing replaces the fixed interval: back off while idle, speed up on activity.
+    adaptive_scan = _env_bool("AUTO_CLICKER_ADAPTIVE_SCAN", False)
+    scan_min_interval = max(0.0, _env_float("AUTO_CLICKER_SCAN_MIN_INTERVAL", 0.1))
+    scan_max_interval = max(scan_min_interval, _env_float("AUTO_CLICKER_SCAN_MAX_INTERVAL", 2.0))
+    scan_backoff = max(1.0, _env_float("AUTO_CLICKER_SCAN_BACKOFF", 1.5))
+    # Percent of one CPU core scanning may use on average; 0 disables the budget.
+    cpu_budget = max(0.0, _env_float("AUTO_CLICKER_CPU_BUDGET", 5.0)) / 100.0
 
+    # Per-target cooldown: a clicked target is not searched again for this long.
     click_delay = _env_float("AUTO_CLICKER_CLICK_DELAY", 2.0)
     if click_delay < 0:
         click_delay = 2.0
+    # The same screen spot is not clicked again (through any target) for this long.
+    location_cooldown = _env_float("AUTO_CLICKER_LOCATION_COOLDOWN", -1.0)
+    if location_cooldown < 0:
+        location_cooldown = click_delay
+    location_radius = max(0, _env_int("AUTO_CLICKER_LOCATION_RADIUS", 24))
+    max_clicks_per_frame = max(1, _env_int("AUTO_CLICKER_MAX_CLICKS_PER_FRAME", 1))
+    # Click every instance of a target in a frame, not only the first one found.
+    find_all = _env_bool("AUTO_CLICKER_FIND_ALL", False)
     log_clicks = _env_bool("AUTO_CLICKER_LOG_CLICKS", False)
     log_dir = os.getenv("AUTO_CLICKER_LOG_DIR", "logs")
     if log_dir is None or log_dir.strip() == "":
         log_dir = "logs"
+    # Click logs are written on a background thread; these bound their cost and disk use.
+    log_mode = _env_choice("AUTO_CLICKER_LOG_MODE", "full", {"full", "crop", "downscale"})
+    log_crop_size = max(32, _env_int("AUTO_CLICKER_LOG_CROP", 400))
+    log_max_width = max(0, _env_int("AUTO_CLICKER_LOG_MAX_WIDTH", 1920))
+    log_format = _env_choice("AUTO_CLICKER_LOG_FORMAT", "png", {"png", "jpeg", "webp"})
+    log_quality = max(1, min(100, _env_int("AUTO_CLICKER_LOG_QUALITY", 85)))
+    log_png_level = max(0, min(9, _env_int("AUTO_CLICKER_LOG_PNG_LEVEL", 1)))
+    log_queue = max(1, _env_int("AUTO_CLICKER_LOG_QUEUE", 8))
+    log_max_files = max(0, _env_int("AUTO_CLICKER_LOG_MAX_FILES", 500))
+    log_max_mb = max(0.0, _env_float("AUTO_CLICKER_LOG_MAX_MB", 1024.0))
+    # Compiled templates; empty or "0" disables the on-disk store.
+    template_cache = os.getenv("AUTO_CLICKER_TEMPLATE_CACHE", "template_cache.npz").strip()
+    if template_cache == "0":
+        template_cache = ""
+    # Upper bound for templates held in memory; 0 means unbounded.
+    template_memory_mb = max(0.0, _env_float("AUTO_CLICKER_TEMPLATE_MEMORY_MB", 256.0))
+    # How often targets/ is checked for added, changed or removed images; 0 disables.
+    targets_poll_interval = max(0.0, _env_float("AUTO_CLICKER_TARGETS_POLL", 2.0))
+    # Order targets of equal priority by hit rate per millisecond of search (see hitstats.py).
+    # Off by default: the scan keeps the directory order and no statistics are kept.
+    hit_order = _env_bool("AUTO_CLICKER_HIT_ORDER", False)
+    # Where the per-target statistics are kept across runs (next to the executable when frozen);
+    # empty or "0" keeps them in memory only.
+    target_stats = os.getenv("AUTO_CLICKER_TARGET_STATS", "target_stats.json").strip()
+    if target_stats == "0":
+        target_stats = ""
+    # Search cold, expensive targets only every N-th scan; 0 searches every target every scan.
+    cold_every = max(0, _env_int("AUTO_CLICKER_COLD_EVERY", 0))
+    cold_after = max(0.0, _env_float("AUTO_CLICKER_COLD_AFTER", 600.0))
+    capture_backend = _env_choice(
+        "AUTO_CLICKER_CAPTURE_BACKEND",
+        "auto",
+        {"auto", "mss", "imagegrab", "pyautogui", "synthetic", "replay"},
+    )
+    # `monitors` grabs and scans each monitor separately, on its own cadence.
+    capture_mode = _env_choice("AUTO_CLICKER_CAPTURE_MODE", "desktop", {"desktop", "monitors"})
+    # `record` sends nothing and only records where clicks would have gone.
+    click_backend = _env_choice("AUTO_CLICKER_CLICK_BACKEND", "auto", {"auto", "sendinput", "pyautogui", "record"})
+    # The `replay` capture backend plays a recording, PNG directory or video (see replay.py).
+    replay_source = os.getenv("AUTO_CLICKER_REPLAY_SOURCE", "recordings").strip()
+    # Paced replay keeps the recorded timing; unpaced runs as fast as the app can scan.
+    replay_paced = _env_bool("AUTO_CLICKER_REPLAY_PACED", True)
+    replay_fps = _env_float("AUTO_CLICKER_REPLAY_FPS", 2.0)
+    if replay_fps <= 0:
+        replay_fps = 2.0
+    replay_loop = _env_bool("AUTO_CLICKER_REPLAY_LOOP", False)
+    replay_expected = os.getenv("AUTO_CLICKER_REPLAY_EXPECTED", "").strip()
+    replay_tolerance = max(0, _env_int("AUTO_CLICKER_REPLAY_TOLERANCE", 4))
+    if capture_backend == "replay" and click_backend == "auto":
+        # Never click the real screen at positions found in a recording.
+        click_backend = "record"
+    # Record scanned frames for later replay; empty or "0" disables.
+    record_dir = os.getenv("AUTO_CLICKER_RECORD_DIR", "").strip()
+    if record_dir == "0":
+        record_dir = ""
+    record_memory_mb = max(0.0, _env_float("AUTO_CLICKER_RECORD_MEMORY_MB", 128.0))
+    record_max_mb = max(0.0, _env_float("AUTO_CLICKER_RECORD_MAX_MB", 2048.0))
+
+    # Skip matching on frames that did not change since the previous scan. Off by default:
+    # an ignored button on a static screen would stay unclicked until its tiles change.
+    change_detection = _env_bool("AUTO_CLICKER_CHANGE_DETECTION", False)
+    change_tile_size = _env_int("AUTO_CLICKER_CHANGE_TILE", 64)
+    if change_tile_size < 8:
+        change_tile_size = 64
+    stats_interval = _env_float("AUTO_CLICKER_STATS_INTERVAL", 60.0)
+    if stats_interval < 0:
+        stats_interval = 0.0
+    # Per-stage timers and counters; exported to a JSON file and/or a local endpoint.
+    metrics = _env_bool("AUTO_CLICKER_METRICS", False)
+    metrics_file = os.getenv("AUTO_CLICKER_METRICS_FILE", "metrics.json").strip()
+    if metrics_file == "0":
+        metrics_file = ""
+    metrics_interval = max(0.5, _env_float("AUTO_CLICKER_METRICS_INTERVAL", 10.0))
+    metrics_port = max(0, _env_int("AUTO_CLICKER_METRICS_PORT", 0))
 
     return AppConfig(
         confidence=confidence,
         grayscale=grayscale,
         scales=scales,
         scan_interval=scan_interval,
+        adaptive_scan=adaptive_scan,
+        scan_min_interval=scan_min_interval,
+        scan_max_interval=scan_max_interval,
+        scan_backoff=scan_backoff,
+        cpu_budget=cpu_budget,
         click_delay=click_delay,
+        location_cooldown=location_cooldown,
+        location_radius=location_radius,
+        max_clicks_per_frame=max_clicks_per_frame,
+        find_all=find_all,
         log_clicks=log_clicks,
         log_dir=log_dir,
+        log_mode=log_mode,
+        log_crop_size=log_crop_size,
+        log_max_width=log_max_width,
+        log_format=log_format,
+        log_quality=log_quality,
+        log_png_level=log_png_level,
+        log_queue=log_queue,
+        log_max_files=log_max_files,
+        log_max_mb=log_max_mb,
+        capture_backend=capture_backend,
+        capture_mode=capture_mode,
+        click_backend=click_backend,
+        replay_source=replay_source,
+        replay_paced=replay_paced,
+        replay_fps=replay_fps,
+        replay_loop=replay_loop,
+        replay_expected=replay_expected,
+        replay_tolerance=replay_tolerance,
+        record_dir=record_dir,
+        record_memory_mb=record_memory_mb,
+        record_max_mb=record_max_mb,
+        template_cache=template_cache,
+        template_memory_mb=template_memory_mb,
+        targets_poll_interval=targets_poll_interval,
+        hit_order=hit_order,
+        target_stats=target_stats,
+        cold_every=cold_every,
+        cold_after=cold_after,
+        match_engine=match_engine,
+        correlation=correlation,
+        fft_cache_mb=fft_cache_mb,
+        search_mode=search_mode,
+        pyramid_levels=pyramid_levels,
+        pyramid_candidates=pyramid_candidates,
+        feature_count=feature_count,
+        match_workers=match_workers,
+        pipeline=pipeline,
+        pipeline_matchers=pipeline_matchers,
+        locality=locality,
+        locality_history=locality_history,
+        locality_padding=locality_padding,
+        locality_full_scan_every=locality_full_scan_every,
+        dpi_scales=dpi_scales,
+        dpi_scale_band=dpi_scale_band,
+        dpi_full_scan_every=dpi_full_scan_every,
+        prefilter=prefilter,
+        prefilter_tile=prefilter_tile,
+        change_detection=change_detection,
+        change_tile_size=change_tile_size,
+        stats_interval=stats_interval,
+        metrics=metrics,
+        metrics_file=metrics_file,
+        metrics_interval=metrics_interval,
+        metrics_port=metrics_port,
     )
@@ -0,0 +1,81 @@
+"""Per-target and per-location click cooldowns.
+
+A target that was just clicked is left out of scans until its cooldown
+ends, while every other target keeps being searched. A location cooldown
+also stops the same spot from being clicked again through a different
+template (e.g. two images of the same button).
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class CooldownStats:
+    clicks: int = 0
+    skipped_targets: int = 0
+    skipped_locations: int = 0
+    multi_click_frames: int = 0
+    # further hits of a frame that were gone (or moved) on a re-captured frame
+    stale_hits: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"clicks={self.clicks} skipped_targets={self.skipped_targets} "
+            f"skipped_locations={self.skipped_locations} multi_click_frames={self.multi_click_frames} "
+            f"stale_hits={self.stale_hits}"
+        )
+
+
+class CooldownTracker:
+    def __init__(self, target_cooldown: float = 2.0, location_cooldown: float = 2.0, radius: int = 24):
+        self.target_cooldown = max(0.0, float(target_cooldown))
+        self.location_cooldown = max(0.0, float(location_cooldown))
+        self.radius = max(0, int(radius))
+        self.stats = CooldownStats()
+        # path -> time its cooldown ends
+        self._targets: dict[str, float] = {}
+        # (x, y, ends) in screen coordinates
+        self._locations: list[tuple[int, int, float]] = []
+
+    def release(self, now: float | None = None) -> int:
+        """Drop expired cooldowns; return how many targets became clickable again."""
+
+        now = time.monotonic() if now is None else now
+        released = 0
+        if self._targets:
+            active = {p: end for p, end in self._targets.items() if end > now}
+            released = len(self._targets) - len(active)
+            self._targets = active
+        if self._locations:
+            self._locations = [loc for loc in self._locations if loc[2] > now]
+        return released
+
+    def ready(self, targets: list[tuple[str, str]], now: float | None = None) -> list[tuple[str, str]]:
+        """`targets` without those still cooling down (same order)."""
+
+        if not self._targets:
+            return targets
+        now = time.monotonic() if now is None else now
+        ready = [t for t in targets if self._targets.get(t[1], 0.0) <= now]
+        self.stats.skipped_targets += len(targets) - len(ready)
+        return ready
+
+    def location_cooling(self, point: tuple[int, int], now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        r2 = self.radius * self.radius
+        for x, y, end in self._locations:
+            if end > now and (point[0] - x) ** 2 + (point[1] - y) ** 2 <= r2:
+                self.stats.skipped_locations += 1
+                return True
+        return False
+
+    def note_click(self, path: str, point: tuple[int, int], now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.stats.clicks += 1
+        if self.target_cooldown > 0:
+            self._targets[path] = now + self.target_cooldown
+        if self.location_cooldown > 0:
+            self._locations.append((int(point[0]), int(point[1]), now + self.location_cooldown))
@@ -36,3 +36,29 @@ def set_windows_dpi_awareness_early() -> None:
         ctypes.windll.user32.SetProcessDPIAware()
     except Exception:
         pass
+
+
+def monitor_dpi_scale(geometry) -> float:
+    """DPI scale (effective DPI / 96) of the monitor covering `geometry`'s center; 1.0 if unknown."""
+
+    if sys.platform != "win32":
+        return 1.0
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        MONITOR_DEFAULTTONEAREST = 2
+        MDT_EFFECTIVE_DPI = 0
+        user32 = ctypes.windll.user32
+        user32.MonitorFromPoint.restype = ctypes.c_void_p
+        center = wintypes.POINT(geometry.left + geometry.width // 2, geometry.top + geometry.height // 2)
+        hmonitor = user32.MonitorFromPoint(center, MONITOR_DEFAULTTONEAREST)
+        dpi_x, dpi_y = ctypes.c_uint(), ctypes.c_uint()
+        if ctypes.windll.shcore.GetDpiForMonitor(
+            ctypes.c_void_p(hmonitor), MDT_EFFECTIVE_DPI, ctypes.byref(dpi_x), ctypes.byref(dpi_y)
+        ):
+            return 1.0
+        return dpi_x.value / 96.0
+    except Exception:
+        return 1.0
@@ -0,0 +1,98 @@
+"""DPI-derived scale selection.
+
+A target image was captured on a monitor with some DPI scale (its reference).
+On a monitor with DPI scale `d` it then appears at `d / reference`, so one
+scale (plus an optional relative band around it) replaces the whole
+`AUTO_CLICKER_SCALES` list. The reference comes from the target's profile
+(`dpi_scale`) or is learned from the first hit on a frame of known DPI. Every
+`full_scan_every`-th search still tries the configured list (plus the
+expected scale), so a wrongly learned reference is corrected.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ScaleStats:
+    searches: int = 0
+    narrowed: int = 0
+    # monitor DPI scale -> matched scale -> hits
+    matched: dict[float, dict[float, int]] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        parts = []
+        for dpi, by_scale in sorted(self.matched.items()):
+            scales = ", ".join(f"{s:g}x{n}" for s, n in sorted(by_scale.items()))
+            parts.append(f"{dpi:.0%}: {scales}")
+        matched = "; ".join(parts) or "-"
+        return f"searches={self.searches} narrowed={self.narrowed} matched=[{matched}]"
+
+
+class DpiScaleModel:
+    def __init__(self, band: float = 0.0, full_scan_every: int = 20):
+        self.band = max(0.0, float(band))
+        self.full_scan_every = max(0, int(full_scan_every))
+        self.stats: dict[str, ScaleStats] = {}
+        # path -> DPI scale the image was captured at
+        self._reference: dict[str, float] = {}
+        self._explicit: set[str] = set()
+
+    def _stats(self, key: str) -> ScaleStats:
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = ScaleStats()
+        return stats
+
+    def set_reference(self, key: str, dpi_scale: float | None) -> None:
+        """Pin (or with None, unpin) the DPI scale `key` was captured at."""
+
+        if dpi_scale is None:
+            if key in self._explicit:
+                self._explicit.discard(key)
+                self._reference.pop(key, None)
+            return
+        self._explicit.add(key)
+        self._reference[key] = float(dpi_scale)
+
+    def reference(self, key: str) -> float | None:
+        return self._reference.get(key)
+
+    def forget(self, key: str) -> None:
+        """Drop what was learned about `key` (a pinned reference is kept)."""
+
+        if key not in self._explicit:
+            self._reference.pop(key, None)
+        self.stats.pop(key, None)
+
+    def expected(self, key: str, dpi_scale: float) -> float | None:
+        ref = self._reference.get(key)
+        if ref is None:
+            return None
+        return round(dpi_scale / ref, 3)
+
+    def scales(self, key: str, dpi_scale: float | None, configured: list[float]) -> list[float]:
+        """Scales to try for one search of `key` in a frame of `dpi_scale`, best guess first."""
+
+        stats = self._stats(key)
+        stats.searches += 1
+        expected = self.expected(key, dpi_scale) if dpi_scale is not None else None
+        if expected is None:
+            return configured
+        narrowed = [expected]
+        if self.band > 0:
+            narrowed += [round(expected * (1.0 - self.band), 3), round(expected * (1.0 + self.band), 3)]
+        if self.full_scan_every and stats.searches % self.full_scan_every == 0:
+            return narrowed + [s for s in configured if s not in narrowed]
+        stats.narrowed += 1
+        return narrowed
+
+    def record_hit(self, key: str, dpi_scale: float | None, scale: float) -> None:
+        if dpi_scale is None:
+            return
+        by_scale = self._stats(key).matched.setdefault(dpi_scale, {})
+        by_scale[scale] = by_scale.get(scale, 0) + 1
+        # A learned reference follows the latest hit; a pinned one never moves.
+        if key not in self._explicit and scale > 0:
+            self._reference[key] = dpi_scale / scale
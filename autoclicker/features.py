@@ -0,0 +1,216 @@
+"""Keypoint (ORB) search: find a target at any scale in one pass.
+
+Each target's ORB keypoints and descriptors are computed once, on the
+original image (they are kept in the template store with its variants). ORB
+keypoints are also computed for the frame, once per frame and shared by every
+target. A target's descriptors are matched against the frame's (nearest
+neighbour with a ratio test), and a similarity transform is fitted to the
+matches with RANSAC. That gives the target's scale and position without
+correlating a single scale.
+
+The estimate is then confirmed with one template correlation at the
+estimated scale (snapped to `SCALE_STEP`, then one step either side), in a
+window just larger than the target. The result therefore has the same
+confidence semantics as the scale loop, but any scale between `MIN_SCALE`
+and `MAX_SCALE` is found, not only the configured ones.
+
+Plain, flat templates have too few keypoints to match. Those are searched
+with the scale loop instead, which is counted as a fallback in the stats.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .regions import Rect
+
+# ORB patch size and border. The default of 31 leaves no room for keypoints on button-sized templates.
+PATCH_SIZE = 15
+FAST_THRESHOLD = 20
+# Templates with fewer keypoints are searched with the scale loop.
+MIN_KEYPOINTS = 8
+# Nearest-neighbour ratio test, and RANSAC inliers needed to trust a transform.
+RATIO = 0.8
+MIN_INLIERS = 5
+REPROJECTION_ERROR = 3.0
+# Estimated scales are snapped to this step (variants are built and cached per step).
+SCALE_STEP = 0.05
+MIN_SCALE, MAX_SCALE = 0.25, 4.0
+# Variants kept per target at scales outside its configured list; the oldest are dropped beyond this.
+MAX_EXTRA_VARIANTS = 8
+
+
+@dataclass(frozen=True, eq=False)
+class TemplateFeatures:
+    """ORB keypoints of a target's original image, in its pixel coordinates."""
+
+    points: np.ndarray  # (N, 2) float32
+    descriptors: np.ndarray  # (N, 32) uint8
+    width: int
+    height: int
+
+    @property
+    def usable(self) -> bool:
+        return len(self.points) >= MIN_KEYPOINTS
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.points.nbytes + self.descriptors.nbytes)
+
+
+@dataclass(frozen=True)
+class Estimate:
+    # Center in frame pixels, scale relative to the original image.
+    x: float
+    y: float
+    scale: float
+    inliers: int
+
+
+def _orb(max_features: int):
+    return cv2.ORB_create(
+        nfeatures=max_features, edgeThreshold=PATCH_SIZE, patchSize=PATCH_SIZE, fastThreshold=FAST_THRESHOLD
+    )
+
+
+def template_features(gray: np.ndarray) -> TemplateFeatures:
+    """Keypoints of a gray template, including those near its edges."""
+
+    h, w = gray.shape[:2]
+    pad = PATCH_SIZE + 1
+    # Replicated borders give edge keypoints a patch to describe; the mask keeps them on the template.
+    padded = cv2.copyMakeBorder(gray, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+    mask = np.zeros(padded.shape, dtype=np.uint8)
+    mask[pad : pad + h, pad : pad + w] = 255
+    keypoints, descriptors = _orb(2000).detectAndCompute(padded, mask)
+    if descriptors is None:
+        return TemplateFeatures(np.zeros((0, 2), np.float32), np.zeros((0, 32), np.uint8), w, h)
+    points = np.array([kp.pt for kp in keypoints], dtype=np.float32) - pad
+    return TemplateFeatures(points, descriptors, w, h)
+
+
+def snapped_scales(scale: float) -> list[float]:
+    """Scales to confirm an estimate at: the nearest step first, then its neighbours."""
+
+    steps = int(round(scale / SCALE_STEP))
+    result = []
+    for k in (steps, steps + 1, steps - 1) if scale >= steps * SCALE_STEP else (steps, steps - 1, steps + 1):
+        value = round(k * SCALE_STEP, 4)
+        if MIN_SCALE <= value <= MAX_SCALE:
+            result.append(value)
+    return result
+
+
+@dataclass
+class FeatureStats:
+    searches: int = 0
+    estimated: int = 0
+    confirmed: int = 0
+    fallbacks: int = 0
+    # keypoints found in frames
+    keypoints: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"searches={self.searches} estimated={self.estimated} confirmed={self.confirmed} "
+            f"fallbacks={self.fallbacks} frame_keypoints={self.keypoints}"
+        )
+
+
+class FeatureSearch:
+    """Template and per-frame keypoints, and the transform estimate between them."""
+
+    def __init__(self, max_features: int = 20000):
+        self.max_features = max(500, int(max_features))
+        self.stats = FeatureStats()
+        self._lock = threading.Lock()
+        self._templates: dict[str, TemplateFeatures] = {}
+
+    def add(self, key: str, features: TemplateFeatures) -> None:
+        """Install features computed elsewhere (e.g. by the template store)."""
+
+        self._templates[key] = features
+
+    def template(self, key: str, gray: np.ndarray) -> TemplateFeatures:
+        """The features of `key`, computed from its original `gray` image the first time."""
+
+        try:
+            return self._templates[key]
+        except KeyError:
+            pass
+        features = self._templates[key] = template_features(gray)
+        return features
+
+    def known(self, key: str) -> TemplateFeatures | None:
+        return self._templates.get(key)
+
+    def forget(self, key: str) -> None:
+        self._templates.pop(key, None)
+
+    def note_search(self, estimated: bool, confirmed: bool) -> None:
+        with self._lock:
+            self.stats.searches += 1
+            self.stats.estimated += int(estimated)
+            self.stats.confirmed += int(confirmed)
+
+    def note_fallback(self) -> None:
+        with self._lock:
+            self.stats.searches += 1
+            self.stats.fallbacks += 1
+
+    def frame(self, haystack, rect: Rect) -> tuple[np.ndarray, np.ndarray | None]:
+        """(points, descriptors) of `rect` of the frame (cached per frame)."""
+
+        cache = haystack.tile_cache
+        key = ("orb", rect, self.max_features)
+        found = cache.get(key)
+        if found is not None:
+            return found
+
+        # Detect on a slightly larger area, so keypoints at the rect's edge get a full patch.
+        area = rect.pad(PATCH_SIZE + 1, PATCH_SIZE + 1).clip(haystack.width, haystack.height)
+        gray = haystack.view(True, area)
+        keypoints, descriptors = _orb(self.max_features).detectAndCompute(gray, None)
+        points = np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2) + (area.left, area.top)
+        found = cache[key] = (points, descriptors)
+        with self._lock:
+            self.stats.keypoints += len(points)
+        return found
+
+    def estimate(self, features: TemplateFeatures, haystack, rect: Rect) -> Estimate | None:
+        """Where (and how large) the template appears in `rect`, if its keypoints say so."""
+
+        points, descriptors = self.frame(haystack, rect)
+        if descriptors is None or len(points) < 2:
+            return None
+        pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(features.descriptors, descriptors, k=2)
+        good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < RATIO * p[1].distance]
+        if len(good) < MIN_INLIERS:
+            return None
+
+        src = features.points[[m.queryIdx for m in good]]
+        dst = points[[m.trainIdx for m in good]]
+        transform, inliers = cv2.estimateAffinePartial2D(
+            src, dst, method=cv2.RANSAC, ransacReprojThreshold=REPROJECTION_ERROR
+        )
+        if transform is None or int(inliers.sum()) < MIN_INLIERS:
+            return None
+        scale = float(np.hypot(transform[0, 0], transform[1, 0]))
+        if not MIN_SCALE <= scale <= MAX_SCALE:
+            return None
+        cx, cy = transform @ np.array([features.width / 2.0, features.height / 2.0, 1.0])
+        return Estimate(float(cx), float(cy), scale, int(inliers.sum()))
+
+    def confirm_window(self, estimate: Estimate, width: int, height: int, haystack) -> Rect:
+        """The area a `width` x `height` match around `estimate` must lie in."""
+
+        margin = max(8, int(0.15 * max(width, height)))
+        left = int(round(estimate.x - width / 2.0)) - margin
+        top = int(round(estimate.y - height / 2.0)) - margin
+        return Rect(left, top, left + width + 2 * margin, top + height + 2 * margin).clip(
+            haystack.width, haystack.height
+        )
@@ -0,0 +1,208 @@
+"""Frequency-domain TM_CCOEFF_NORMED for large templates.
+
+`cv2.matchTemplate` works on one (haystack, template) pair at a time: it
+correlates (spatially, or with blockwise DFTs for larger templates) and
+builds integral images of the haystack for the normalization on every call.
+Its cost grows with the template, so a large target such as a whole dialog
+is expensive.
+
+Correlation in the frequency domain costs the same for any template size.
+The haystack's spectrum (one float32 DFT per channel, zero-padded to a fast
+DFT size) is computed once per frame and region and cached on the frame, so
+every template searched in that region reuses it. Each template then costs a
+forward DFT per channel, a spectrum product, one inverse DFT (the channel
+products are summed first) and the integral images for its normalization,
+which are computed per call and not kept. Cached spectra are bounded by a
+byte budget per frame; `auto` never picks a path whose spectrum would not
+fit in it.
+
+The normalization is OpenCV's, including its treatment of flat windows
+(response 0) and flat templates (response 1), so a confidence means the same
+on both paths. The two differ only by float rounding (`bench fft` checks
+this). `prefer_fft` is the cost model that picks a path for each template and
+region size.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Templates from this area (px) up are faster in the frequency domain even when the spectrum is
+# built for them alone, on haystacks up to `REFERENCE_AREA`; on larger ones the bound grows with
+# the haystack (measured with `bench fft`, spectrum included).
+MIN_TEMPLATE_AREA_GRAY = 60_000
+MIN_TEMPLATE_AREA_COLOR = 10_000
+REFERENCE_AREA = 1920 * 1080
+
+
+@dataclass
+class CorrelationStats:
+    spatial: int = 0
+    fft: int = 0
+    # haystack spectra computed (the rest of the FFT searches reused one)
+    spectra: int = 0
+
+    def summary(self) -> str:
+        return f"spatial={self.spatial} fft={self.fft} spectra={self.spectra}"
+
+
+def prefer_fft(hay_width: int, hay_height: int, width: int, height: int, channels: int) -> bool:
+    """Whether a `width` x `height` template is cheaper to correlate in the frequency domain."""
+
+    bound = MIN_TEMPLATE_AREA_GRAY if channels == 1 else MIN_TEMPLATE_AREA_COLOR
+    return width * height >= bound * max(1.0, hay_width * hay_height / REFERENCE_AREA)
+
+
+def spectrum_bytes(hay_width: int, hay_height: int, channels: int) -> int:
+    """Size of the cached spectrum of a `hay_width` x `hay_height` region."""
+
+    return 4 * cv2.getOptimalDFTSize(hay_width) * cv2.getOptimalDFTSize(hay_height) * channels
+
+
+@dataclass(frozen=True, eq=False)
+class HaystackSpectrum:
+    """DFTs of one (region of a) frame, per channel."""
+
+    spectra: tuple[np.ndarray, ...]  # packed real DFTs (float32, `cv2.dft` layout)
+    # The region itself (a view of the prepared frame, not a copy), for the normalization.
+    image: np.ndarray
+    width: int
+    height: int
+
+    @property
+    def dft_size(self) -> tuple[int, int]:
+        return self.spectra[0].shape[1], self.spectra[0].shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self.spectra)
+
+
+def _channels(image: np.ndarray) -> list[np.ndarray]:
+    return cv2.split(image) if image.ndim == 3 else [image]
+
+
+def haystack_spectrum(hay: np.ndarray) -> HaystackSpectrum:
+    h, w = hay.shape[:2]
+    dft_h, dft_w = cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w)
+    spectra = []
+    for channel in _channels(hay):
+        # Circular correlation at this size is exact for every valid offset of any smaller template.
+        padded = np.zeros((dft_h, dft_w), np.float32)
+        padded[:h, :w] = channel
+        spectra.append(cv2.dft(padded))
+    return HaystackSpectrum(tuple(spectra), hay, w, h)
+
+
+def _window_sums(integral: np.ndarray, width: int, height: int, out_w: int, out_h: int) -> np.ndarray:
+    rows = cv2.subtract(integral[height : height + out_h], integral[:out_h])
+    return cv2.subtract(rows[:, width : width + out_w], rows[:, :out_w])
+
+
+def ccoeff_normed(spectrum: HaystackSpectrum, needle: np.ndarray) -> np.ndarray:
+    """`cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED)` from the haystack's spectrum."""
+
+    th, tw = needle.shape[:2]
+    out_h, out_w = spectrum.height - th + 1, spectrum.width - tw + 1
+    dft_w, dft_h = spectrum.dft_size
+
+    product = None
+    norm2 = 0.0
+    for channel, hay_spectrum in zip(_channels(needle), spectrum.spectra):
+        centered = channel.astype(np.float64)
+        centered -= centered.mean()
+        norm2 += float(np.dot(centered.ravel(), centered.ravel()))
+        padded = np.zeros((dft_h, dft_w), np.float32)
+        padded[:th, :tw] = centered
+        part = cv2.mulSpectrums(hay_spectrum, cv2.dft(padded), 0, conjB=True)
+        product = part if product is None else cv2.add(product, part)
+    if norm2 < np.finfo(np.float64).eps:
+        # A flat template matches everywhere, as in OpenCV.
+        return np.ones((out_h, out_w), np.float32)
+
+    flags = cv2.DFT_INVERSE | cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT
+    numerator = cv2.dft(product, flags=flags)[:out_h, :out_w]
+
+    # Window variance times the template's norm, summed over channels (float64: it cancels badly).
+    # Channel by channel, so only one channel's integral images exist at a time.
+    variance = None
+    for channel in _channels(spectrum.image):
+        sums, squares = cv2.integral2(channel, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        s = _window_sums(sums, tw, th, out_w, out_h)
+        part = cv2.subtract(_window_sums(squares, tw, th, out_w, out_h), cv2.multiply(s, s, scale=1.0 / (tw * th)))
+        variance = part if variance is None else cv2.add(variance, part)
+    denominator = cv2.sqrt(cv2.max(variance, 0.0).astype(np.float32))
+    denominator *= np.float32(np.sqrt(norm2))
+
+    # OpenCV's rule: |num| < t gives num / t, up to 1.125 t it is +-1, and beyond (or t = 0) it is 0.
+    result = cv2.divide(numerator, denominator)
+    result[~(np.abs(result) < 1.125)] = 0.0  # also 0 / 0
+    np.clip(result, -1.0, 1.0, out=result)
+    return result
+
+
+class FrequencyCorrelator:
+    """Picks the spatial or frequency path per call and caches haystack spectra on the frame.
+
+    At most `max_cache_bytes` of spectra (0 = unbounded) are kept per frame;
+    the oldest are dropped first.
+    """
+
+    def __init__(self, mode: str = "auto", max_cache_bytes: int = 0):
+        if mode not in ("auto", "spatial", "fft"):
+            raise ValueError(f"Unknown correlation mode: {mode!r}")
+        self.mode = mode
+        self.max_cache_bytes = max(0, int(max_cache_bytes))
+        self.stats = CorrelationStats()
+        self._lock = threading.Lock()
+
+    def use_fft(self, hay: np.ndarray, needle: np.ndarray) -> bool:
+        if self.mode != "auto":
+            return self.mode == "fft"
+        h, w = hay.shape[:2]
+        th, tw = needle.shape[:2]
+        channels = 1 if needle.ndim == 2 else needle.shape[2]
+        if self.max_cache_bytes and spectrum_bytes(w, h, channels) > self.max_cache_bytes:
+            # Uncached, every template would pay for the spectrum again.
+            return False
+        return prefer_fft(w, h, tw, th, channels)
+
+    def response(self, hay: np.ndarray, needle: np.ndarray, cache: dict | None = None, key: tuple | None = None):
+        """TM_CCOEFF_NORMED of `needle` over `hay`.
+
+        `cache` (the frame's tile cache) keeps the spectrum of `hay` under
+        `key` for the other templates searched in it.
+        """
+
+        if not self.use_fft(hay, needle):
+            with self._lock:
+                self.stats.spatial += 1
+            return cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED)
+
+        spectrum = cache.get(key) if cache is not None else None
+        computed = spectrum is None
+        if computed:
+            spectrum = haystack_spectrum(hay)
+        with self._lock:
+            if computed and cache is not None:
+                self._keep(cache, key, spectrum)
+            self.stats.fft += 1
+            self.stats.spectra += int(computed)
+        return ccoeff_normed(spectrum, needle)
+
+    def _keep(self, cache: dict, key: tuple, spectrum: HaystackSpectrum) -> None:
+        if self.max_cache_bytes and spectrum.nbytes > self.max_cache_bytes:
+            return
+        # key -> bytes of the spectra this correlator cached on the frame, oldest first
+        held: dict[tuple, int] = cache.setdefault(("fft-held",), {})
+        total = sum(held.values())
+        while held and self.max_cache_bytes and total + spectrum.nbytes > self.max_cache_bytes:
+            oldest = next(iter(held))
+            total -= held.pop(oldest)
+            cache.pop(oldest, None)
+        cache[key] = spectrum
+        held[key] = spectrum.nbytes
@@ -0,0 +1,65 @@
+"""Every match of a template, not just the first.
+
+Peaks are local maxima of one `matchTemplate` response map above the
+confidence threshold. Hits from all scales (and overlapping search regions)
+are merged with greedy non-maximum suppression, and the survivors are
+returned in reading order (top to bottom, then left to right).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .regions import Rect
+
+# Overlap (intersection over union) above which two hits are the same button.
+NMS_IOU = 0.3
+
+
+@dataclass(frozen=True)
+class Match:
+    score: float
+    scale: float
+    rect: Rect
+
+    @property
+    def center(self) -> tuple[int, int]:
+        # Same rounding as `locate_center`: left + width // 2.
+        return self.rect.left + self.rect.width // 2, self.rect.top + self.rect.height // 2
+
+
+def response_peaks(result: np.ndarray, confidence: float, needle_w: int, needle_h: int) -> list[tuple[float, int, int]]:
+    """(score, x, y) of local maxima strictly above `confidence` in a response map."""
+
+    mask = result > float(confidence)
+    if not mask.any():
+        return []
+    # A point is a peak if it is the maximum of a needle-sized neighborhood around it.
+    kw, kh = max(1, needle_w // 2) | 1, max(1, needle_h // 2) | 1
+    dilated = cv2.dilate(result, np.ones((kh, kw), np.uint8))
+    ys, xs = np.nonzero(mask & (result >= dilated))
+    return [(float(result[y, x]), int(x), int(y)) for y, x in zip(ys, xs)]
+
+
+def _iou(a: Rect, b: Rect) -> float:
+    iw = min(a.right, b.right) - max(a.left, b.left)
+    ih = min(a.bottom, b.bottom) - max(a.top, b.top)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(a.area + b.area - inter)
+
+
+def non_max_suppression(matches: list[Match], iou: float = NMS_IOU) -> list[Match]:
+    """Keep the best-scoring match of every overlapping group; reading order."""
+
+    kept: list[Match] = []
+    # Ties are broken by position so the result does not depend on input order.
+    for m in sorted(matches, key=lambda m: (-m.score, m.rect.top, m.rect.left, m.scale)):
+        if all(_iou(m.rect, k.rect) <= iou for k in kept):
+            kept.append(m)
+    kept.sort(key=lambda m: (m.rect.top, m.rect.left))
+    return kept
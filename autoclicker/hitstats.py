@@ -0,0 +1,212 @@
+"""Per-target hit statistics that order the scan and pace rarely seen targets.
+
+Every search of a target is recorded: whether it found the target (kept as a
+hit rate, weighted towards the last `RATE_WINDOW` searches), how long it took
+(a weighted average as well) and when the target was last found. The
+statistics are saved to a small JSON file, keyed by image name, so they
+survive restarts.
+
+Ordering: the scan stops at the first hit, so within each profile priority
+(higher priorities still come first, whatever their statistics) targets are
+tried by hit rate per millisecond of search. The button clicked a hundred
+times a day is tried first and cheap targets go before expensive ones that
+are rarely found. Targets searched fewer than `MIN_SEARCHES` times go first,
+in directory order, until their cost is known.
+
+Sampling (opt-in): a target that has not been found for `cold_after` seconds
+and takes at least `COLD_MIN_MS` per search is only searched every
+`cold_every`-th scan. Targets with a positive profile priority are never
+sampled. A cold target that sat out a changed frame gets one full-frame search
+on its next turn (even if that frame is unchanged), so change detection never
+hides a change from it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from .paths import data_path
+
+# Hit rate and search time are averaged over roughly this many searches.
+RATE_WINDOW = 100
+# Searches before a target's statistics decide its place.
+MIN_SEARCHES = 5
+# Cheaper targets are never sampled: skipping them saves nothing.
+COLD_MIN_MS = 5.0
+# Seconds between saves of the statistics file.
+SAVE_INTERVAL = 30.0
+
+
+@dataclass
+class TargetRecord:
+    searches: int = 0
+    hits: int = 0
+    hit_rate: float = 0.0
+    match_ms: float = 0.0
+    # Wall-clock time (time.time()) of the last hit; 0 if never found.
+    last_seen: float = 0.0
+
+    def note(self, hit: bool, ms: float) -> None:
+        self.searches += 1
+        self.hits += int(hit)
+        # Averages over the first searches until the window is full, then exponentially weighted.
+        alpha = 1.0 / min(self.searches, RATE_WINDOW)
+        self.hit_rate += alpha * (float(hit) - self.hit_rate)
+        self.match_ms += alpha * (ms - self.match_ms)
+        if hit:
+            self.last_seen = time.time()
+
+    @property
+    def score(self) -> float:
+        """Hits per millisecond of searching."""
+
+        return self.hit_rate / max(self.match_ms, 0.1)
+
+
+@dataclass
+class HitStatsSummary:
+    sampled: int = 0
+    deferred: int = 0
+    caught_up: int = 0
+    saves: int = 0
+
+
+class TargetHitStats:
+    """Hit statistics of every target, and the scan order and pacing derived from them."""
+
+    def __init__(self, path: str = "", cold_every: int = 0, cold_after: float = 600.0):
+        self.path = path
+        self.cold_every = max(0, int(cold_every))
+        self.cold_after = max(0.0, float(cold_after))
+        self.records: dict[str, TargetRecord] = {}
+        self.stats = HitStatsSummary()
+        self._scans: dict[str, int] = {}
+        # stream -> targets that sat out a changed frame of it
+        self._missed: dict[str, set[str]] = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring target statistics in {self.path}: {e}")
+            return
+        fields = set(TargetRecord.__dataclass_fields__)
+        for name, values in data.get("targets", {}).items() if isinstance(data, dict) else ():
+            if isinstance(values, dict):
+                try:
+                    self.records[name] = TargetRecord(**{k: v for k, v in values.items() if k in fields})
+                except TypeError:
+                    continue
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"targets": {name: asdict(r) for name, r in sorted(self.records.items())}}, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Warning: could not save target statistics to {self.path}: {e}")
+            return
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.stats.saves += 1
+
+    def record(self, name: str) -> TargetRecord:
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = TargetRecord()
+        return record
+
+    def note_search(self, name: str, hit: bool, seconds: float) -> None:
+        self.record(name).note(hit, seconds * 1000.0)
+        self._dirty = True
+        if self.path and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def order(self, targets: list[tuple[str, str]], priority: Callable[[str], int]) -> list[tuple[str, str]]:
+        """`targets` by priority, then by hits per millisecond (stable)."""
+
+        def key(target: tuple[str, str]):
+            record = self.records.get(target[0])
+            if record is None or record.searches < MIN_SEARCHES:
+                return (-priority(target[1]), 0, 0.0, 0.0)
+            return (-priority(target[1]), 1, -record.score, record.match_ms)
+
+        return sorted(targets, key=key)
+
+    def is_cold(self, name: str, now: float | None = None) -> bool:
+        record = self.records.get(name)
+        if record is None or record.searches < MIN_SEARCHES or record.match_ms < COLD_MIN_MS:
+            return False
+        now = time.time() if now is None else now
+        return now - record.last_seen >= self.cold_after
+
+    def sample(
+        self,
+        targets: list[tuple[str, str]],
+        changed: bool,
+        priority: Callable[[str], int],
+        stream: str = "",
+    ) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+        """Split `targets` for one scan of `stream` into (searched as usual, searched on the whole frame).
+
+        Cold targets are left out except on their turn; one that missed a
+        changed frame since its last search is returned in the second list.
+        """
+
+        if not self.cold_every:
+            return targets, []
+        scan = self._scans.get(stream, 0)
+        self._scans[stream] = scan + 1
+        missed = self._missed.setdefault(stream, set())
+        now = time.time()
+        searched: list[tuple[str, str]] = []
+        catch_up: list[tuple[str, str]] = []
+        for target in targets:
+            name = target[0]
+            if priority(target[1]) > 0 or not self.is_cold(name, now):
+                searched.append(target)
+                missed.discard(name)
+                continue
+            self.stats.sampled += 1
+            # Spread cold targets over the scans instead of searching them all on the same one.
+            if (scan + zlib.crc32(name.encode("utf-8"))) % self.cold_every:
+                self.stats.deferred += 1
+                if changed:
+                    missed.add(name)
+            elif name in missed:
+                missed.discard(name)
+                self.stats.caught_up += 1
+                catch_up.append(target)
+            else:
+                searched.append(target)
+        return searched, catch_up
+
+    def summary(self, limit: int = 3) -> str:
+        ranked = sorted(self.records.items(), key=lambda item: -item[1].score)[:limit]
+        top = ", ".join(f"{name} {r.hit_rate:.0%} {r.match_ms:.1f}ms" for name, r in ranked)
+        cold = sum(1 for name in self.records if self.is_cold(name))
+        return (
+            f"targets={len(self.records)} cold={cold} sampled={self.stats.sampled} deferred={self.stats.deferred} "
+            f"caught_up={self.stats.caught_up} saves={self.stats.saves}; top: {top or '-'}"
+        )
+
+
+def hit_stats_from_config(config) -> TargetHitStats:
+    # A replayed recording says nothing about the live screen; its statistics are not saved.
+    path = data_path(config.target_stats) if config.target_stats and config.capture_backend != "replay" else ""
+    return TargetHitStats(path, cold_every=config.cold_every, cold_after=config.cold_after)
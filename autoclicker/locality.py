@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+
+from .regions import Rect
+
+
+@dataclass
+class LocalityStats:
+    searches: int = 0
+    fast_hits: int = 0
+    fast_misses: int = 0
+    full_scans: int = 0
+
+    @property
+    def fast_hit_ratio(self) -> float:
+        tried = self.fast_hits + self.fast_misses
+        return self.fast_hits / tried if tried else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"searches={self.searches} fast_hits={self.fast_hits} "
+            f"fast_misses={self.fast_misses} ({self.fast_hit_ratio:.0%} fast) full_scans={self.full_scans}"
+        )
+
+
+@dataclass(frozen=True)
+class RecentHit:
+    rect: Rect
+    scale: float
+
+
+class HitHistory:
+    """Per-target memory of where (and at which scale) a target was last found.
+
+    The matcher searches `padding`-expanded windows around these rectangles
+    before falling back to a full search. Every `full_scan_every`-th search of a
+    target skips the fast path, so a target that moved is still picked up.
+    """
+
+    def __init__(self, size: int = 4, padding: int = 48, full_scan_every: int = 10):
+        self.size = max(1, int(size))
+        self.padding = max(0, int(padding))
+        self.full_scan_every = max(0, int(full_scan_every))
+        self.stats: dict[str, LocalityStats] = {}
+        self._hits: dict[str, deque[RecentHit]] = {}
+
+    def _stats(self, key: str) -> LocalityStats:
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = LocalityStats()
+        return stats
+
+    def begin(self, key: str) -> list[RecentHit]:
+        """Count a search of `key`; return the hits to try first (most recent first).
+
+        Returns an empty list when there is no history or a full scan is due.
+        """
+
+        stats = self._stats(key)
+        stats.searches += 1
+        hits = self._hits.get(key)
+        if not hits:
+            return []
+        if self.full_scan_every and stats.searches % self.full_scan_every == 0:
+            return []
+        return list(hits)
+
+    def window(self, hit: RecentHit, width: int, height: int) -> Rect:
+        return hit.rect.pad(self.padding, self.padding).clip(width, height)
+
+    def record_fast(self, key: str, hit: bool) -> None:
+        stats = self._stats(key)
+        if hit:
+            stats.fast_hits += 1
+        else:
+            stats.fast_misses += 1
+
+    def record_full_scan(self, key: str) -> None:
+        self._stats(key).full_scans += 1
+
+    def remember(self, key: str, rect: Rect, scale: float) -> None:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque(maxlen=self.size)
+
+        # Re-finding a known spot moves it to the front instead of duplicating it.
+        for old in list(hits):
+            if old.scale == scale and old.rect.intersects(rect):
+                hits.remove(old)
+        hits.appendleft(RecentHit(rect=rect, scale=scale))
+
+    def forget(self, key: str) -> None:
+        self._hits.pop(key, None)
+        self.stats.pop(key, None)
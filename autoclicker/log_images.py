@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import os
+import re
+import threading
 import time
+from collections import deque
 from dataclasses import dataclass
 
+import numpy as np
 from PIL import Image, ImageDraw
 
-from .capture import VirtualDesktopGeometry
+from .capture import VirtualDesktopGeometry, bgra_to_pil
+
+# Extension per encoder; `png` is the historical default.
+FORMATS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+# Names `save_annotated_click_screenshot` gives its files; retention never touches anything else.
+_LOG_NAME = re.compile(r"\d{8}-\d{6}-\d{3}_.+(" + "|".join(re.escape(ext) for ext in FORMATS.values()) + ")")
 
 
 @dataclass(frozen=True)
@@ -14,6 +23,20 @@ class ClickLogInfo:
     target_name: str
     click_point_screen: tuple[int, int]
     found_scale: float | None
+    # When the click happened; file names use it, so queued writes keep the click time.
+    clicked_at: float | None = None
+
+
+@dataclass(frozen=True)
+class ClickLogOptions:
+    """What to save: `full` frame, a `crop` around the click, or a `downscale`d frame."""
+
+    mode: str = "full"
+    crop_size: int = 400
+    max_width: int = 1920
+    format: str = "png"
+    quality: int = 85
+    png_compress_level: int = 1
 
 
 def _safe_filename_part(s: str) -> str:
@@ -32,26 +55,38 @@ def save_annotated_click_screenshot(
     geometry: VirtualDesktopGeometry,
     info: ClickLogInfo,
     log_dir: str,
+    options: ClickLogOptions | None = None,
+    origin: tuple[int, int] = (0, 0),
+    factor: float = 1.0,
 ) -> str:
+    """Annotate and save `screenshot_img`.
+
+    `origin` and `factor` describe how the image maps onto the captured frame
+    (a crop's top-left, a downscale factor), so the crosshair lands on the
+    click point either way.
+    """
+
+    options = options or ClickLogOptions()
     os.makedirs(log_dir, exist_ok=True)
 
-    ts = time.strftime("%Y%m%d-%H%M%S")
-    ms = int((time.time() % 1) * 1000)
+    clicked_at = info.clicked_at if info.clicked_at is not None else time.time()
+    ts = time.strftime("%Y%m%d-%H%M%S", time.localtime(clicked_at))
+    ms = int((clicked_at % 1) * 1000)
 
     target = _safe_filename_part(info.target_name)
     scale_part = ""
     if info.found_scale is not None and info.found_scale != 1.0:
         scale_part = f"_s{info.found_scale:.3f}".replace(".", "p")
 
-    filename = f"{ts}-{ms:03d}_{target}{scale_part}.png"
+    filename = f"{ts}-{ms:03d}_{target}{scale_part}{FORMATS.get(options.format, '.png')}"
     out_path = os.path.abspath(os.path.join(log_dir, filename))
 
     img = screenshot_img.copy()
     draw = ImageDraw.Draw(img)
 
     screen_x, screen_y = info.click_point_screen
-    img_x = int(screen_x - geometry.left)
-    img_y = int(screen_y - geometry.top)
+    img_x = int((screen_x - geometry.left - origin[0]) * factor)
+    img_y = int((screen_y - geometry.top - origin[1]) * factor)
 
     w, h = img.size
 
@@ -87,5 +122,165 @@ def save_annotated_click_screenshot(
     )
     draw.text(text_pos, label, fill=(255, 255, 255))
 
-    img.save(out_path)
+    if options.format == "jpeg":
+        img.save(out_path, "JPEG", quality=options.quality)
+    elif options.format == "webp":
+        img.save(out_path, "WEBP", quality=options.quality, method=0)
+    else:
+        img.save(out_path, "PNG", compress_level=options.png_compress_level)
     return out_path
+
+
+def frame_for_log(
+    pixels: np.ndarray, geometry: VirtualDesktopGeometry, info: ClickLogInfo, options: ClickLogOptions
+) -> tuple[Image.Image, tuple[int, int], float]:
+    """Cut the part of a BGRA frame that gets logged; return (image, origin, factor)."""
+
+    h, w = pixels.shape[:2]
+    if options.mode == "crop":
+        half = max(16, options.crop_size // 2)
+        cx = int(info.click_point_screen[0] - geometry.left)
+        cy = int(info.click_point_screen[1] - geometry.top)
+        left = max(0, min(w - 1, cx - half))
+        top = max(0, min(h - 1, cy - half))
+        crop = pixels[top : min(h, cy + half), left : min(w, cx + half)]
+        if crop.size:
+            return bgra_to_pil(crop), (left, top), 1.0
+        # Click outside the frame: fall through to a full frame so the border marks it.
+
+    if options.mode == "downscale" and options.max_width > 0 and w > options.max_width:
+        import cv2
+
+        factor = options.max_width / w
+        small = cv2.resize(pixels, (options.max_width, max(1, int(h * factor))), interpolation=cv2.INTER_AREA)
+        return bgra_to_pil(small), (0, 0), factor
+
+    return bgra_to_pil(pixels), (0, 0), 1.0
+
+
+@dataclass
+class ClickLogStats:
+    queued: int = 0
+    written: int = 0
+    dropped: int = 0
+    failed: int = 0
+    pruned: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"queued={self.queued} written={self.written} dropped={self.dropped} "
+            f"failed={self.failed} pruned={self.pruned}"
+        )
+
+
+class ClickLogWriter:
+    """Writes click logs on a background thread, off the click path.
+
+    `submit` only enqueues a reference to the frame: capture backends hand out
+    a fresh array per frame and never modify it afterwards, so no copy is
+    needed. The queue holds at most `queue_size` frames; when it is full the
+    oldest pending log is dropped. After each write the log directory is
+    pruned (oldest first) to `max_files` files and `max_bytes` bytes; 0 means
+    no limit. Only files named like click logs are counted or deleted.
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        options: ClickLogOptions | None = None,
+        queue_size: int = 8,
+        max_files: int = 0,
+        max_bytes: int = 0,
+        metrics=None,
+    ):
+        self.log_dir = log_dir
+        self.options = options or ClickLogOptions()
+        self.max_files = max(0, int(max_files))
+        self.max_bytes = max(0, int(max_bytes))
+        self.metrics = metrics
+        self.stats = ClickLogStats()
+        self._queue: deque = deque(maxlen=max(1, int(queue_size)))
+        self._cond = threading.Condition()
+        self._closing = False
+        self._files: deque[tuple[str, int]] | None = None
+        self._thread = threading.Thread(target=self._run, name="autoclicker-click-log", daemon=True)
+        self._thread.start()
+
+    def submit(self, pixels: np.ndarray, geometry: VirtualDesktopGeometry, info: ClickLogInfo) -> None:
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.stats.dropped += 1
+            self._queue.append((pixels, geometry, info))
+            self.stats.queued += 1
+            self._cond.notify()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Finish pending writes (up to `timeout` seconds), then stop."""
+
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                pixels, geometry, info = self._queue.popleft()
+
+            start = time.perf_counter()
+            try:
+                img, origin, factor = frame_for_log(pixels, geometry, info, self.options)
+                del pixels
+                saved = save_annotated_click_screenshot(
+                    screenshot_img=img,
+                    geometry=geometry,
+                    info=info,
+                    log_dir=self.log_dir,
+                    options=self.options,
+                    origin=origin,
+                    factor=factor,
+                )
+            except Exception as e:
+                self.stats.failed += 1
+                print(f"Warning: failed to save click log: {type(e).__name__}: {e}")
+                continue
+
+            self.stats.written += 1
+            if self.metrics is not None:
+                self.metrics.stage("log_write", time.perf_counter() - start)
+            print(f"Saved click log: {saved}")
+            self._retain(saved)
+
+    def _retain(self, saved: str) -> None:
+        if not self.max_files and not self.max_bytes:
+            return
+        if self._files is None:
+            # First write: pick up logs from earlier runs, oldest first.
+            entries = []
+            for entry in os.scandir(self.log_dir):
+                if entry.is_file() and _LOG_NAME.fullmatch(entry.name):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, os.path.abspath(entry.path), st.st_size))
+            entries.sort()
+            self._files = deque((path, size) for _, path, size in entries)
+        else:
+            try:
+                self._files.append((saved, os.path.getsize(saved)))
+            except OSError:
+                pass
+
+        total = sum(size for _, size in self._files)
+        while self._files and (
+            (self.max_files and len(self._files) > self.max_files) or (self.max_bytes and total > self.max_bytes)
+        ):
+            path, size = self._files.popleft()
+            total -= size
+            try:
+                os.remove(path)
+                self.stats.pruned += 1
+            except OSError:
+                pass
@@ -1,8 +1,29 @@
 from __future__ import annotations
 
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import cv2
+import numpy as np
 from PIL import Image
 import pyscreeze
 
+from .capture import VirtualDesktopGeometry, list_monitors, pil_to_bgra
+from .config import AppConfig
+from .dpiscale import DpiScaleModel
+from .features import MAX_EXTRA_VARIANTS, FeatureSearch, TemplateFeatures, snapped_scales
+from .fftmatch import FrequencyCorrelator
+from .locality import HitHistory
+from .metrics import Metrics
+from .prefilter import ColorPrefilter, ColorSignature
+from .profiles import TargetProfile
+from .regions import Rect, merge_rects
+
 
 def locate_center(needle, haystack_img, confidence: float, grayscale: bool):
     """Return center (x, y) in haystack image coordinates or None."""
@@ -55,27 +76,948 @@ def resize_needle(needle_img: Image.Image, scale: float) -> Image.Image:
     return needle_img.resize((new_width, new_height), resample=resample)
 
 
+class PreparedHaystack:
+    """One frame, converted to the matcher's formats at most once.
+
+    Wraps the BGRA array from capture (or a PIL image). The BGR and gray variants
+    are built on first use and then shared by every (target, scale) search of
+    that frame. Small regions are converted on their own instead of forcing a
+    full-frame conversion.
+
+    `geometry` places the frame on the virtual desktop. For a single monitor's
+    frame it is that monitor and `desktop` the whole virtual desktop. Target
+    profiles use these and `monitors` (screen coordinates, looked up when not
+    given) to resolve their search regions. `dpi_scale` is the DPI scale of the
+    monitor(s) the frame shows, when they all share one.
+    """
+
+    # Regions larger than this fraction of the frame trigger a full conversion.
+    FULL_CONVERT_RATIO = 0.5
+
+    def __init__(
+        self,
+        haystack,
+        metrics: Metrics | None = None,
+        geometry: VirtualDesktopGeometry | None = None,
+        monitors: tuple[VirtualDesktopGeometry, ...] | None = None,
+        desktop: VirtualDesktopGeometry | None = None,
+        dpi_scale: float | None = None,
+    ):
+        if isinstance(haystack, np.ndarray):
+            self.pixels = haystack
+        else:
+            self.pixels = pil_to_bgra(haystack)
+        self.height, self.width = self.pixels.shape[:2]
+        self.metrics = metrics
+        self.geometry = geometry or VirtualDesktopGeometry(0, 0, self.width, self.height)
+        self.monitors = monitors
+        self.desktop = desktop or self.geometry
+        self.dpi_scale = dpi_scale
+        self._full: dict[bool, np.ndarray] = {}
+        self._levels: dict[tuple[bool, int], np.ndarray] = {}
+        # Per-frame results shared by every target: color presence per tile
+        # (see `prefilter.py`), frame keypoints (see `features.py`) and
+        # haystack spectra (see `fftmatch.py`).
+        self.tile_cache: dict[tuple, object] = {}
+
+    @classmethod
+    def wrap(cls, haystack) -> PreparedHaystack:
+        return haystack if isinstance(haystack, cls) else cls(haystack)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def _convert(self, pixels: np.ndarray, grayscale: bool) -> np.ndarray:
+        if pixels.ndim == 2:
+            return pixels
+        if pixels.shape[2] == 4:
+            code = cv2.COLOR_BGRA2GRAY if grayscale else cv2.COLOR_BGRA2BGR
+        else:
+            if not grayscale:
+                return pixels
+            code = cv2.COLOR_BGR2GRAY
+        if self.metrics is None:
+            return cv2.cvtColor(pixels, code)
+        start = time.perf_counter()
+        converted = cv2.cvtColor(pixels, code)
+        self.metrics.stage("convert", time.perf_counter() - start)
+        return converted
+
+    def full(self, grayscale: bool) -> np.ndarray:
+        if grayscale not in self._full:
+            self._full[grayscale] = self._convert(self.pixels, grayscale)
+        return self._full[grayscale]
+
+    def view(self, grayscale: bool, rect: Rect | None = None) -> np.ndarray:
+        """Return the (BGR or gray) haystack, optionally cropped to `rect`."""
+
+        if rect is None:
+            return self.full(grayscale)
+
+        if grayscale in self._full or rect.area >= self.FULL_CONVERT_RATIO * self.width * self.height:
+            return self.full(grayscale)[rect.top : rect.bottom, rect.left : rect.right]
+
+        return self._convert(self.pixels[rect.top : rect.bottom, rect.left : rect.right], grayscale)
+
+    def level(self, grayscale: bool, level: int) -> np.ndarray:
+        """Return the frame downsampled `level` times by `cv2.pyrDown` (cached)."""
+
+        if level <= 0:
+            return self.full(grayscale)
+        key = (grayscale, level)
+        if key not in self._levels:
+            self._levels[key] = cv2.pyrDown(self.level(grayscale, level - 1))
+        return self._levels[key]
+
+
+@dataclass(frozen=True, eq=False)
+class TemplateVariant:
+    """A needle at one scale, pre-converted for every engine.
+
+    The arrays may be read-only views into the compiled template store.
+    """
+
+    scale: float
+    bgr: np.ndarray
+    gray: np.ndarray
+    _levels: dict[tuple[bool, int], np.ndarray] = field(default_factory=dict, repr=False)
+
+    @cached_property
+    def image(self) -> Image.Image:
+        # Only the pyscreeze engine needs PIL; this is exactly the RGB image `bgr` came from.
+        return Image.fromarray(np.ascontiguousarray(self.bgr[:, :, ::-1]), "RGB")
+
+    @property
+    def width(self) -> int:
+        return int(self.bgr.shape[1])
+
+    @property
+    def height(self) -> int:
+        return int(self.bgr.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        # Store-backed arrays are file pages, but they still count towards the budget.
+        return int(self.bgr.nbytes + self.gray.nbytes + sum(a.nbytes for a in list(self._levels.values())))
+
+    def array(self, grayscale: bool) -> np.ndarray:
+        return self.gray if grayscale else self.bgr
+
+    def level(self, grayscale: bool, level: int) -> np.ndarray:
+        """Needle downsampled the same way as `PreparedHaystack.level` (cached)."""
+
+        if level <= 0:
+            return self.array(grayscale)
+        key = (grayscale, level)
+        if key not in self._levels:
+            self._levels[key] = cv2.pyrDown(self.level(grayscale, level - 1))
+        return self._levels[key]
+
+
+def make_variant(needle_img: Image.Image, scale: float) -> TemplateVariant:
+    img = resize_needle(needle_img, scale).convert("RGB")
+    # Same conversion pyscreeze applies to PIL needles (alpha is dropped).
+    bgr = np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return TemplateVariant(scale=scale, bgr=bgr, gray=gray)
+
+
+class MatchEngine:
+    """Finds one template variant inside a (cropped) prepared haystack."""
+
+    name = "base"
+
+    def find(
+        self,
+        variant: TemplateVariant,
+        haystack: PreparedHaystack,
+        rect: Rect | None,
+        confidence: float,
+        grayscale: bool,
+    ) -> tuple[int, int] | None:
+        raise NotImplementedError
+
+    def find_all(self, variant, haystack, rect, confidence, grayscale) -> list:
+        """Every match above `confidence` as `findall.Match` (unsuppressed).
+
+        Engines without a response map report at most the first match, with
+        `confidence` as its score.
+        """
+
+        from .findall import Match
+
+        found = self.find(variant, haystack, rect, confidence, grayscale)
+        if not found:
+            return []
+        left, top = int(found[0]) - variant.width // 2, int(found[1]) - variant.height // 2
+        return [Match(float(confidence), variant.scale, Rect(left, top, left + variant.width, top + variant.height))]
+
+
+class OpenCVMatchEngine(MatchEngine):
+    """`cv2.matchTemplate` on the prepared haystack.
+
+    Mirrors pyscreeze's semantics so results are identical: TM_CCOEFF_NORMED,
+    the first location in row-major order strictly above `confidence`, and the
+    center computed as left + width // 2.
+
+    With `correlation="auto"`, large templates are correlated in the frequency
+    domain against a spectrum of the haystack cached per frame (see
+    `fftmatch.py`); "spatial" and "fft" force one path. At most
+    `fft_cache_bytes` of spectra (0 = unbounded) are cached per frame.
+    """
+
+    name = "opencv"
+
+    def __init__(self, correlation: str = "auto", fft_cache_bytes: int = 0):
+        self.correlator = FrequencyCorrelator(correlation, max_cache_bytes=fft_cache_bytes)
+
+    def _response(self, hay, needle, haystack, rect, grayscale):
+        return self.correlator.response(hay, needle, haystack.tile_cache, ("fft", grayscale, rect))
+
+    def find(self, variant, haystack, rect, confidence, grayscale):
+        hay = haystack.view(grayscale, rect)
+        needle = variant.array(grayscale)
+        if hay.shape[0] < needle.shape[0] or hay.shape[1] < needle.shape[1]:
+            return None
+
+        result = self._response(hay, needle, haystack, rect, grayscale)
+        mask = result > float(confidence)
+        idx = int(mask.argmax())
+        if not mask.flat[idx]:
+            return None
+
+        y, x = divmod(idx, result.shape[1])
+        ox, oy = (rect.left, rect.top) if rect is not None else (0, 0)
+        return (ox + x + variant.width // 2, oy + y + variant.height // 2)
+
+    def find_all(self, variant, haystack, rect, confidence, grayscale):
+        from .findall import Match, response_peaks
+
+        hay = haystack.view(grayscale, rect)
+        needle = variant.array(grayscale)
+        if hay.shape[0] < needle.shape[0] or hay.shape[1] < needle.shape[1]:
+            return []
+
+        result = self._response(hay, needle, haystack, rect, grayscale)
+        ox, oy = (rect.left, rect.top) if rect is not None else (0, 0)
+        w, h = variant.width, variant.height
+        return [
+            Match(score, variant.scale, Rect(ox + x, oy + y, ox + x + w, oy + y + h))
+            for score, x, y in response_peaks(result, confidence, w, h)
+        ]
+
+
+class PyscreezeMatchEngine(MatchEngine):
+    """Fallback that defers to pyscreeze (slower: converts the needle on every call)."""
+
+    name = "pyscreeze"
+
+    def find(self, variant, haystack, rect, confidence, grayscale):
+        hay = haystack.view(grayscale, rect)
+        if hay.shape[0] < variant.height or hay.shape[1] < variant.width:
+            return None
+
+        try:
+            found = locate_center(variant.image, hay, confidence=confidence, grayscale=grayscale)
+        except pyscreeze.ImageNotFoundException:
+            return None
+        if not found:
+            return None
+
+        ox, oy = (rect.left, rect.top) if rect is not None else (0, 0)
+        return (int(found[0]) + ox, int(found[1]) + oy)
+
+    def find_all(self, variant, haystack, rect, confidence, grayscale):
+        from .findall import Match
+
+        hay = haystack.view(grayscale, rect)
+        if hay.shape[0] < variant.height or hay.shape[1] < variant.width:
+            return []
+
+        ox, oy = (rect.left, rect.top) if rect is not None else (0, 0)
+        boxes = pyscreeze.locateAll(variant.image, hay, confidence=confidence, grayscale=grayscale)
+        # pyscreeze reports no scores.
+        matches = []
+        for box in boxes:
+            left, top, width, height = (int(v) for v in box)
+            matches.append(Match(float(confidence), variant.scale, Rect(ox + left, oy + top, ox + left + width, oy + top + height)))
+        return matches
+
+
+_ENGINES: dict[str, type[MatchEngine]] = {
+    OpenCVMatchEngine.name: OpenCVMatchEngine,
+    PyscreezeMatchEngine.name: PyscreezeMatchEngine,
+}
+
+
+def create_match_engine(name: str, correlation: str = "auto", fft_cache_bytes: int = 0) -> MatchEngine:
+    if name == OpenCVMatchEngine.name:
+        return OpenCVMatchEngine(correlation, fft_cache_bytes)
+    try:
+        return _ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown match engine: {name!r}") from None
+
+
 class MultiScaleTemplateMatcher:
-    def __init__(self, confidence: float, grayscale: bool, scales: list[float]):
+    """Tries every configured scale of a needle against a haystack.
+
+    `search="scales"` runs the engine at full resolution for each scale in turn.
+    `search="pyramid"` finds candidates for all scales on a downsampled
+    haystack first and verifies only the best `pyramid_candidates` of them at
+    full resolution (see `pyramid.py`). `search="features"` estimates the
+    target's scale and position from ORB keypoints and confirms them with one
+    correlation at that scale (see `features.py`). A profile can choose the
+    search per target.
+
+    With a `locality` history, windows around a target's recent hits are
+    searched before any of the above (see `locality.py`).
+
+    Loaded variants are kept in an LRU cache. With `max_cache_bytes` > 0, the
+    least recently used targets are dropped once the cache grows past it; they
+    are simply reloaded from disk when searched again.
+
+    Targets with a profile (see `profiles.py`) are searched by a tuned copy of
+    the matcher with the profile's confidence, scales and color mode; it shares
+    the engine, cache and hit history. A profile region bounds every search of
+    that target.
+
+    With a `dpi_model`, frames of known DPI are searched at the one scale
+    expected for that DPI (see `dpiscale.py`) instead of every configured scale.
+
+    With `use_prefilter` (or a profile that asks for it), full-resolution
+    searches are limited to the areas that hold the target's dominant colors
+    (see `prefilter.py`).
+    """
+
+    def __init__(
+        self,
+        confidence: float,
+        grayscale: bool,
+        scales: list[float],
+        engine: str | MatchEngine = "opencv",
+        search: str = "scales",
+        pyramid_levels: int = 0,
+        pyramid_candidates: int = 3,
+        locality: HitHistory | None = None,
+        max_cache_bytes: int = 0,
+        metrics: Metrics | None = None,
+        dpi_model: DpiScaleModel | None = None,
+        prefilter: ColorPrefilter | None = None,
+        use_prefilter: bool = False,
+        features: FeatureSearch | None = None,
+    ):
         self.confidence = confidence
         self.grayscale = grayscale
         self.scales = scales
-        self._cache: dict[object, object] = {}
+        self.engine = engine if isinstance(engine, MatchEngine) else create_match_engine(engine)
+        self.search = search
+        self.pyramid_levels = pyramid_levels
+        self.pyramid_candidates = pyramid_candidates
+        self.locality = locality
+        self.dpi_model = dpi_model
+        # Shared by every target; `use_prefilter` decides who uses it.
+        self.prefilter = prefilter if prefilter is not None else ColorPrefilter()
+        self.use_prefilter = use_prefilter
+        # Template and frame keypoints for `search="features"`, shared by every target.
+        self.features = features if features is not None else FeatureSearch()
+        # Per (target, scale) match timings, when instrumentation is on.
+        self.metrics = metrics
+        self.max_cache_bytes = max(0, int(max_cache_bytes))
+        self.cache_evictions = 0
+        # Guards `_cache`: the target index and match workers use it from other threads.
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict[str, dict[float, TemplateVariant]] = OrderedDict()
+        self.profiles: dict[str, TargetProfile] = {}
+        # path -> tuned matcher; shared with the tuned copies themselves.
+        self._tuned: dict[str, MultiScaleTemplateMatcher] = {}
+        self._tunings: dict[tuple, MultiScaleTemplateMatcher] = {}
+        self._root = self
+
+    @property
+    def cache_bytes(self) -> int:
+        with self._cache_lock:
+            entries = [list(variants.values()) for variants in self._cache.values()]
+        return sum(v.nbytes for variants in entries for v in variants)
+
+    @property
+    def cached_paths(self) -> list[str]:
+        with self._cache_lock:
+            return list(self._cache)
+
+    def _install(self, needle_path: str, variants: dict[float, TemplateVariant]) -> None:
+        with self._cache_lock:
+            self._cache[needle_path] = variants
+            self._cache.move_to_end(needle_path)
+            if not self.max_cache_bytes:
+                return
+            total = sum(v.nbytes for entry in self._cache.values() for v in entry.values())
+            # Never drop the entry that is being installed, even if it alone is over budget.
+            while total > self.max_cache_bytes and len(self._cache) > 1:
+                _, dropped = self._cache.popitem(last=False)
+                total -= sum(v.nbytes for v in dropped.values())
+                self._root.cache_evictions += 1
+
+    def for_target(self, needle_path: str) -> MultiScaleTemplateMatcher:
+        """The matcher that searches `needle_path`: a tuned copy if its profile needs one."""
+
+        return self._tuned.get(needle_path, self)
+
+    def set_profile(self, needle_path: str, profile: TargetProfile | None) -> None:
+        """Apply (or with None, remove) the profile of a target.
+
+        Cached variants are dropped when the profile changes the target's scales.
+        """
+
+        before = self.for_target(needle_path).scales
+        if self.dpi_model is not None:
+            self.dpi_model.set_reference(needle_path, profile.dpi_scale if profile is not None else None)
+        if profile is None or profile.is_default():
+            self.profiles.pop(needle_path, None)
+            self._tuned.pop(needle_path, None)
+        else:
+            self.profiles[needle_path] = profile
+            tuned = self._tuning(
+                self.confidence if profile.confidence is None else profile.confidence,
+                self.grayscale if profile.grayscale is None else profile.grayscale,
+                self.scales if profile.scales is None else list(profile.scales),
+                self.use_prefilter if profile.prefilter is None else profile.prefilter,
+                self.search if profile.search is None else profile.search,
+            )
+            if tuned is self:
+                self._tuned.pop(needle_path, None)
+            else:
+                self._tuned[needle_path] = tuned
+        if self.for_target(needle_path).scales != before:
+            with self._cache_lock:
+                self._cache.pop(needle_path, None)
+
+    def _tuning(
+        self, confidence: float, grayscale: bool, scales: list[float], use_prefilter: bool, search: str
+    ) -> MultiScaleTemplateMatcher:
+        root = self._root
+        key = (confidence, grayscale, scales, use_prefilter, search)
+        if key == (root.confidence, root.grayscale, root.scales, root.use_prefilter, root.search):
+            return root
+        key = (confidence, grayscale, tuple(scales), use_prefilter, search)
+        tuned = root._tunings.get(key)
+        if tuned is None:
+            # A shallow copy shares the engine, cache, lock, locality, prefilter, features and profile tables.
+            tuned = copy.copy(root)
+            tuned.confidence, tuned.grayscale, tuned.scales = confidence, grayscale, scales
+            tuned.use_prefilter, tuned.search = use_prefilter, search
+            root._tunings[key] = tuned
+        return tuned
+
+    def region_bounds(self, needle_path: str, haystack: PreparedHaystack) -> Rect | None:
+        """The profile region of `needle_path` in frame pixels, or None if unrestricted."""
+
+        profile = self.profiles.get(needle_path)
+        if profile is None or profile.region is None:
+            return None
+        region = profile.region
+        monitors = ()
+        if region.relative_to == "monitor":
+            monitors = haystack.monitors if haystack.monitors is not None else list_monitors(haystack.geometry)
+        return region.resolve(haystack.geometry, monitors, haystack.desktop).clip(haystack.width, haystack.height)
+
+    def add_variants(self, needle_path: str, variants: dict[float, TemplateVariant]) -> None:
+        """Install pre-built variants (e.g. from the template store) for `needle_path`."""
+
+        tuned = self.for_target(needle_path)
+        if tuned is not self:
+            return tuned.add_variants(needle_path, variants)
+        missing = [s for s in self.scales if s not in variants]
+        if missing:
+            raise ValueError(f"variants for {needle_path!r} lack scales {missing}")
+        self._install(needle_path, variants)
+
+    def add_features(self, needle_path: str, features: TemplateFeatures) -> None:
+        """Install pre-computed keypoints (e.g. from the template store) for `needle_path`."""
+
+        self.features.add(needle_path, features)
+
+    def evict(self, needle_path: str) -> None:
+        """Forget a target entirely: every scaled variant and its hit history."""
 
-    def locate_center(self, needle_path: str, haystack_img):
-        if needle_path not in self._cache:
-            self._cache[needle_path] = Image.open(needle_path)
+        with self._cache_lock:
+            self._cache.pop(needle_path, None)
+        if self.locality is not None:
+            self.locality.forget(needle_path)
+        if self.dpi_model is not None:
+            self.dpi_model.forget(needle_path)
+        self.prefilter.forget(needle_path)
+        self.features.forget(needle_path)
 
-        base = self._cache[needle_path]
+    def load(self, needle_path: str) -> dict[float, TemplateVariant]:
+        """Load a needle and pre-convert it at every configured scale."""
 
-        for scale in self.scales:
-            key = (needle_path, scale)
-            if key not in self._cache:
-                self._cache[key] = resize_needle(base, scale)
+        tuned = self.for_target(needle_path)
+        if tuned is not self:
+            return tuned.load(needle_path)
+        with self._cache_lock:
+            variants = self._cache.get(needle_path)
+            if variants is not None:
+                self._cache.move_to_end(needle_path)
+                return variants
 
-            needle_img = self._cache[key]
-            found = locate_center(needle_img, haystack_img, confidence=self.confidence, grayscale=self.grayscale)
+        with Image.open(needle_path) as base:
+            base.load()
+            variants = {scale: make_variant(base, scale) for scale in self.scales}
+        self._install(needle_path, variants)
+        return variants
+
+    def search_scales(self, needle_path: str, haystack: PreparedHaystack) -> list[float]:
+        """Scales to try for one search of `needle_path` in `haystack`, in order."""
+
+        if self.dpi_model is None:
+            return self.scales
+        return self.dpi_model.scales(needle_path, haystack.dpi_scale, self.scales)
+
+    def _with_scales(
+        self,
+        needle_path: str,
+        variants: dict[float, TemplateVariant],
+        scales: list[float],
+    ) -> dict[float, TemplateVariant]:
+        """`variants` plus any of `scales` not built yet.
+
+        Extended variants are installed as a new cache entry, so they count
+        against `max_cache_bytes` like the configured scales. Of the scales
+        outside the configured list (DPI and keypoint estimates), at most
+        `MAX_EXTRA_VARIANTS` are kept, dropping the oldest.
+        """
+
+        if all(s in variants for s in scales):
+            return variants
+        with self._cache_lock:
+            cached = self._cache.get(needle_path)
+        if cached is not None and cached is not variants:
+            # Another search may have added scales since `variants` was loaded.
+            variants = {**cached, **variants}
+        missing = [s for s in scales if s not in variants]
+        if missing:
+            with Image.open(needle_path) as base:
+                base.load()
+                variants = {**variants, **{scale: make_variant(base, scale) for scale in missing}}
+        extra = [s for s in variants if s not in self.scales and s not in scales]
+        excess = len(extra) + sum(1 for s in scales if s not in self.scales) - MAX_EXTRA_VARIANTS
+        for scale in extra[: max(0, excess)]:
+            del variants[scale]
+        self._install(needle_path, variants)
+        return variants
+
+    def _signature(self, needle_path: str, variants: dict[float, TemplateVariant]) -> ColorSignature | None:
+        if not self.use_prefilter:
+            return None
+        # The scale closest to the original image has the least resampled colors.
+        variant = min(variants.values(), key=lambda v: abs(v.scale - 1.0))
+        return self.prefilter.signature(needle_path, variant.bgr)
+
+    def _record_hit(self, needle_path: str, haystack: PreparedHaystack, scale: float) -> None:
+        if self.dpi_model is not None:
+            self.dpi_model.record_hit(needle_path, haystack.dpi_scale, scale)
+
+    def locate_center(self, needle_path: str, haystack_img, regions: list[Rect] | None = None):
+        """Find `needle_path` in the haystack; return ((x, y), scale) or (None, None).
+
+        `haystack_img` may be a PreparedHaystack (preferred: share one per frame),
+        a BGRA array, or a PIL image. With `regions`, only those haystack areas
+        (e.g. the dirty tiles from change detection) are searched, each padded by
+        the needle size so that matches overlapping a region's border are found.
+        """
+
+        tuned = self.for_target(needle_path)
+        if tuned is not self:
+            return tuned.locate_center(needle_path, haystack_img, regions)
+        haystack = PreparedHaystack.wrap(haystack_img)
+        bounds = self.region_bounds(needle_path, haystack)
+        variants = self.load(needle_path)
+
+        if self.locality is None:
+            found, scale = self._locate(needle_path, variants, haystack, regions, bounds)
+            if found:
+                self._record_hit(needle_path, haystack, scale)
+            return found, scale
+
+        found, scale = self._locate_near_recent(needle_path, variants, haystack, regions, bounds)
+        if not found:
+            self.locality.record_full_scan(needle_path)
+            found, scale = self._locate(needle_path, variants, haystack, regions, bounds)
+        if found:
+            self._record_hit(needle_path, haystack, scale)
+            # The scale may be one `_locate` added (a DPI or keypoint estimate).
+            variant = self._with_scales(needle_path, variants, [scale])[scale]
+            left = int(found[0]) - variant.width // 2
+            top = int(found[1]) - variant.height // 2
+            self.locality.remember(needle_path, Rect(left, top, left + variant.width, top + variant.height), scale)
+        return found, scale
+
+    def _locate_near_recent(
+        self,
+        needle_path: str,
+        variants: dict[float, TemplateVariant],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+    ):
+        recent = self.locality.begin(needle_path)
+        if not recent:
+            return None, None
+
+        start = time.perf_counter() if self.metrics is not None else 0.0
+        try:
+            return self._search_recent(needle_path, recent, variants, haystack, regions, bounds)
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe("target", f"{os.path.basename(needle_path)}@near", time.perf_counter() - start)
+
+    def _search_recent(
+        self,
+        needle_path: str,
+        recent: list,
+        variants: dict[float, TemplateVariant],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+    ):
+        for hit in recent:
+            variant = variants.get(hit.scale)
+            if variant is None:
+                continue
+            window = self.locality.window(hit, haystack.width, haystack.height)
+            if bounds is not None:
+                window = window.intersection(bounds)
+                if window.width < variant.width or window.height < variant.height:
+                    continue
+            # Unchanged areas cannot hold a new match.
+            if regions is not None and not any(window.intersects(r) for r in regions):
+                continue
+            found = self.engine.find(variant, haystack, window, self.confidence, self.grayscale)
+            if found:
+                self.locality.record_fast(needle_path, True)
+                return found, hit.scale
+
+        self.locality.record_fast(needle_path, False)
+        return None, None
+
+    def _locate(
+        self,
+        needle_path: str,
+        variants: dict[float, TemplateVariant],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+    ):
+        scales = self.search_scales(needle_path, haystack)
+        variants = self._with_scales(needle_path, variants, scales)
+        signature = self._signature(needle_path, variants)
+        if self.search == "features":
+            start = time.perf_counter() if self.metrics is not None else 0.0
+            result = self._locate_features(needle_path, variants, scales, haystack, regions, bounds, signature)
+            if self.metrics is not None:
+                self.metrics.observe("target", f"{os.path.basename(needle_path)}@features", time.perf_counter() - start)
+            if result is not None:
+                return result
+        elif self.search == "pyramid":
+            start = time.perf_counter() if self.metrics is not None else 0.0
+            result = self._locate_pyramid([variants[s] for s in scales], haystack, regions, bounds, signature)
+            if self.metrics is not None:
+                self.metrics.observe("target", f"{os.path.basename(needle_path)}@pyramid", time.perf_counter() - start)
+            return result
+
+        for scale in scales:
+            found = self._timed_locate_variant(needle_path, variants[scale], haystack, regions, bounds, signature)
             if found:
                 return found, scale
 
         return None, None
+
+    def _timed_locate_variant(
+        self,
+        needle_path: str,
+        variant: TemplateVariant,
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ):
+        if self.metrics is None:
+            return self._locate_variant(variant, haystack, regions, bounds, signature)
+        start = time.perf_counter()
+        found = self._locate_variant(variant, haystack, regions, bounds, signature)
+        self.metrics.observe("target", f"{os.path.basename(needle_path)}@{variant.scale:g}", time.perf_counter() - start)
+        return found
+
+    def locate_all(
+        self, needle_path: str, haystack_img, regions: list[Rect] | None = None, scales: list[float] | None = None
+    ) -> list:
+        """Every match of `needle_path` at any scale, as `findall.Match`.
+
+        Overlapping hits (across scales and search regions) are merged with
+        non-maximum suppression; the result is in reading order. With
+        `scales`, only those scales are searched.
+        """
+
+        from .findall import non_max_suppression
+
+        tuned = self.for_target(needle_path)
+        if tuned is not self:
+            return tuned.locate_all(needle_path, haystack_img, regions, scales)
+        haystack = PreparedHaystack.wrap(haystack_img)
+        bounds = self.region_bounds(needle_path, haystack)
+        fixed = scales is not None
+        scales = list(scales) if fixed else self.search_scales(needle_path, haystack)
+        variants = self._with_scales(needle_path, self.load(needle_path), scales)
+        signature = self._signature(needle_path, variants)
+        if self.search == "features" and not fixed:
+            estimated = self._feature_scales(needle_path, variants, scales, haystack, regions, bounds, signature)
+            if estimated is not None:
+                # Every instance is searched for, but only at the scales the keypoints point to.
+                scales = estimated
+                variants = self._with_scales(needle_path, variants, scales)
+        matches = []
+        for scale in scales:
+            variant = variants[scale]
+            start = time.perf_counter() if self.metrics is not None else 0.0
+            rects = self._search_rects(variant.width, variant.height, haystack, regions, bounds=bounds, signature=signature)
+            for rect in rects:
+                matches.extend(self.engine.find_all(variant, haystack, rect, self.confidence, self.grayscale))
+            if self.metrics is not None:
+                self.metrics.observe("target", f"{os.path.basename(needle_path)}@{scale:g}", time.perf_counter() - start)
+        matches = non_max_suppression(matches)
+        for match in matches:
+            self._record_hit(needle_path, haystack, match.scale)
+        return matches
+
+    def locate_at_scale(self, needle_path: str, haystack_img, scale: float, regions: list[Rect] | None = None):
+        """Full-resolution search for one scale only (no locality); return (x, y) or None.
+
+        This is one (target, scale) unit of work for `ParallelMatcher`; `scale`
+        is one of `search_scales(...)` of `for_target(needle_path)`.
+        """
+
+        tuned = self.for_target(needle_path)
+        if tuned is not self:
+            return tuned.locate_at_scale(needle_path, haystack_img, scale, regions)
+        haystack = PreparedHaystack.wrap(haystack_img)
+        variants = self._with_scales(needle_path, self.load(needle_path), [scale])
+        found = self._timed_locate_variant(
+            needle_path,
+            variants[scale],
+            haystack,
+            regions,
+            self.region_bounds(needle_path, haystack),
+            self._signature(needle_path, variants),
+        )
+        if found:
+            self._record_hit(needle_path, haystack, scale)
+        return found
+
+    def _locate_variant(
+        self,
+        variant: TemplateVariant,
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ):
+        rects = self._search_rects(variant.width, variant.height, haystack, regions, bounds=bounds, signature=signature)
+        for rect in rects:
+            found = self.engine.find(variant, haystack, rect, self.confidence, self.grayscale)
+            if found:
+                return found
+        return None
+
+    def _locate_pyramid(
+        self,
+        variants: list[TemplateVariant],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ):
+        from .pyramid import pyramid_locate
+
+        # Pad for the largest scale; the smallest decides whether a region fits at all.
+        rects = self._search_rects(
+            max(v.width for v in variants),
+            max(v.height for v in variants),
+            haystack,
+            regions,
+            min_size=(min(v.width for v in variants), min(v.height for v in variants)),
+            bounds=bounds,
+            signature=signature,
+        )
+        for rect in rects:
+            found, scale = pyramid_locate(
+                self.engine,
+                variants,
+                haystack,
+                rect,
+                self.confidence,
+                self.grayscale,
+                self.pyramid_levels,
+                self.pyramid_candidates,
+            )
+            if found:
+                return found, scale
+
+        return None, None
+
+    def _template_features(self, needle_path: str, variants: dict[float, TemplateVariant]) -> TemplateFeatures:
+        features = self.features.known(needle_path)
+        if features is not None:
+            return features
+        variant = variants.get(1.0)
+        if variant is None:
+            with Image.open(needle_path) as base:
+                base.load()
+                variant = make_variant(base, 1.0)
+        return self.features.template(needle_path, variant.gray)
+
+    def _feature_rects(
+        self,
+        variants: list[TemplateVariant],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None,
+        signature: ColorSignature | None,
+    ) -> list[Rect]:
+        # The scale is not known yet; pad for the largest configured one, like the pyramid search.
+        rects = self._search_rects(
+            max(v.width for v in variants),
+            max(v.height for v in variants),
+            haystack,
+            regions,
+            min_size=(min(v.width for v in variants), min(v.height for v in variants)),
+            bounds=bounds,
+            signature=signature,
+        )
+        return [r or Rect(0, 0, haystack.width, haystack.height) for r in rects]
+
+    def _locate_features(
+        self,
+        needle_path: str,
+        variants: dict[float, TemplateVariant],
+        scales: list[float],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ):
+        """Keypoint estimate plus one confirming correlation; None if the template has too few keypoints."""
+
+        features = self._template_features(needle_path, variants)
+        if not features.usable:
+            self.features.note_fallback()
+            return None
+
+        estimated = confirmed = False
+        found, scale = None, None
+        for rect in self._feature_rects([variants[s] for s in scales], haystack, regions, bounds, signature):
+            estimate = self.features.estimate(features, haystack, rect)
+            if estimate is None:
+                continue
+            estimated = True
+            candidates = snapped_scales(estimate.scale)
+            variants = self._with_scales(needle_path, variants, candidates)
+            for candidate in candidates:
+                variant = variants[candidate]
+                window = self.features.confirm_window(estimate, variant.width, variant.height, haystack)
+                window = window.intersection(rect)
+                if window.width < variant.width or window.height < variant.height:
+                    continue
+                found = self.engine.find(variant, haystack, window, self.confidence, self.grayscale)
+                if found:
+                    confirmed = True
+                    found, scale = found, candidate
+                    break
+            if found:
+                break
+        self.features.note_search(estimated, confirmed)
+        return found, scale
+
+    def _feature_scales(
+        self,
+        needle_path: str,
+        variants: dict[float, TemplateVariant],
+        scales: list[float],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ) -> list[float] | None:
+        """Scales the keypoints place the target at, or None if the template has too few keypoints."""
+
+        features = self._template_features(needle_path, variants)
+        if not features.usable:
+            self.features.note_fallback()
+            return None
+        found: list[float] = []
+        for rect in self._feature_rects([variants[s] for s in scales], haystack, regions, bounds, signature):
+            estimate = self.features.estimate(features, haystack, rect)
+            if estimate is not None:
+                found.extend(s for s in snapped_scales(estimate.scale) if s not in found)
+        self.features.note_search(bool(found), False)
+        return found
+
+    def _search_rects(
+        self,
+        width: int,
+        height: int,
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None,
+        min_size: tuple[int, int] | None = None,
+        bounds: Rect | None = None,
+        signature: ColorSignature | None = None,
+    ):
+        if regions is None and bounds is None and signature is None:
+            return [None]
+
+        min_w, min_h = min_size or (width, height)
+        if regions is None:
+            rects = [bounds]
+        else:
+            padded = [r.pad(width - 1, height - 1).clip(haystack.width, haystack.height) for r in regions]
+            rects = merge_rects(padded)
+            if bounds is not None:
+                # Dirty areas are padded to catch overlapping matches; the profile region is not.
+                rects = [r.intersection(bounds) for r in rects]
+        if signature is not None:
+            rects = self.prefilter.narrow(signature, haystack, rects, width, height)
+        return [r for r in rects if r.width >= min_w and r.height >= min_h]
+
+
+def matcher_from_config(config: AppConfig, metrics: Metrics | None = None) -> MultiScaleTemplateMatcher:
+    return MultiScaleTemplateMatcher(
+        confidence=config.confidence,
+        grayscale=config.grayscale,
+        scales=config.scales,
+        engine=create_match_engine(
+            config.match_engine, config.correlation, int(config.fft_cache_mb * 1024 * 1024)
+        ),
+        search=config.search_mode,
+        pyramid_levels=config.pyramid_levels,
+        pyramid_candidates=config.pyramid_candidates,
+        locality=(
+            HitHistory(
+                size=config.locality_history,
+                padding=config.locality_padding,
+                full_scan_every=config.locality_full_scan_every,
+            )
+            if config.locality
+            else None
+        ),
+        max_cache_bytes=int(config.template_memory_mb * 1024 * 1024),
+        metrics=metrics,
+        dpi_model=(
+            DpiScaleModel(band=config.dpi_scale_band, full_scan_every=config.dpi_full_scan_every)
+            if config.dpi_scales
+            else None
+        ),
+        prefilter=ColorPrefilter(tile_size=config.prefilter_tile),
+        use_prefilter=config.prefilter,
+        features=FeatureSearch(max_features=config.feature_count),
+    )
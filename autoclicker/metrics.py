@@ -0,0 +1,188 @@
+"""Hot-path instrumentation: counters and rolling latency histograms.
+
+Callers hold `Metrics | None` and time stages with plain `perf_counter` calls
+guarded by `if metrics is not None`, so with metrics off the cost is one
+attribute check per stage. `MetricsExporter` periodically writes a JSON
+snapshot and/or serves a plain-text view on a local HTTP port.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class Histogram:
+    """Latency samples over a rolling window, plus lifetime count and sum."""
+
+    def __init__(self, window: int = 1024):
+        self.samples: deque[float] = deque(maxlen=max(1, int(window)))
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> dict[str, float]:
+        window = np.fromiter(list(self.samples), dtype=np.float64) * 1000.0
+        if window.size == 0:
+            return {"count": self.count, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+        p50, p95, p99 = np.percentile(window, [50, 95, 99])
+        return {
+            "count": self.count,
+            "mean_ms": self.total * 1000.0 / self.count,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+        }
+
+
+class Metrics:
+    """Named counters and histograms. Histograms are grouped, e.g. ("stage", "capture").
+
+    Safe to update from match worker threads: appends to a deque and dict
+    inserts are atomic in CPython, and a lost increment only skews a count.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.started = time.time()
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, dict[str, Histogram]] = {}
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, group: str, name: str, seconds: float) -> None:
+        hists = self.histograms.get(group)
+        if hists is None:
+            hists = self.histograms.setdefault(group, {})
+        hist = hists.get(name)
+        if hist is None:
+            hist = hists.setdefault(name, Histogram(self.window))
+        hist.observe(seconds)
+
+    def stage(self, name: str, seconds: float) -> None:
+        self.observe("stage", name, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.started,
+            "counters": dict(self.counters),
+            "histograms": {
+                group: {name: hist.summary() for name, hist in list(hists.items())}
+                for group, hists in list(self.histograms.items())
+            },
+        }
+
+    def render_text(self) -> str:
+        """Prometheus-style text: one `name{labels} value` line per figure."""
+
+        snap = self.snapshot()
+        lines = [f"autoclicker_uptime_seconds {snap['uptime_s']:.3f}"]
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"autoclicker_{name}_total {value}")
+        for group, hists in sorted(snap["histograms"].items()):
+            for name, summary in sorted(hists.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'autoclicker_{group}_count{{{group}="{label}"}} {summary["count"]}')
+                for q in ("p50", "p95", "p99"):
+                    lines.append(f'autoclicker_{group}_ms{{{group}="{label}",quantile="{q}"}} {summary[q + "_ms"]:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        counters = " ".join(f"{k}={v}" for k, v in sorted(self.counters.items()))
+        parts = []
+        for name, hist in list(self.histograms.get("stage", {}).items()):
+            s = hist.summary()
+            parts.append(f"{name}={s['p50_ms']:.1f}/{s['p95_ms']:.1f}ms")
+        return f"{counters} | p50/p95 {' '.join(parts)}"
+
+
+class MetricsExporter:
+    """Writes `Metrics.snapshot()` to `path` every `interval` seconds and/or
+    serves it on http://127.0.0.1:`port`/metrics (text) and /metrics.json."""
+
+    def __init__(self, metrics: Metrics, path: str = "", interval: float = 10.0, port: int = 0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = max(0.5, float(interval))
+        self.port = int(port)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._server = None
+
+    def start(self) -> None:
+        if self.path:
+            self._thread = threading.Thread(target=self._write_loop, name="autoclicker-metrics", daemon=True)
+            self._thread.start()
+        if self.port > 0:
+            try:
+                self._start_server()
+            except OSError as e:
+                print(f"Warning: metrics endpoint unavailable on port {self.port}: {type(e).__name__}: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.path:
+            self.write()
+
+    def write(self) -> None:
+        tmp = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.metrics.snapshot(), f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Warning: could not write metrics to {self.path}: {type(e).__name__}: {e}")
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def _start_server(self) -> None:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(metrics.snapshot(), indent=2).encode("utf-8")
+                    ctype = "application/json"
+                elif self.path in ("/", "/metrics"):
+                    body = metrics.render_text().encode("utf-8")
+                    ctype = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        # Local only: the endpoint exposes target names.
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="autoclicker-metrics-http", daemon=True).start()
@@ -0,0 +1,82 @@
+"""Per-monitor scanning.
+
+In `monitors` capture mode every monitor is grabbed and searched on its own.
+A monitor is only captured while at least one target can appear on it (a
+target without a profile region can appear anywhere), and each monitor keeps
+its own change detector and scan pacing, so activity on one monitor does not
+make an idle one scan faster. Hits are converted to screen coordinates as in
+desktop mode, and clicks are still mapped against the whole virtual desktop.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .capture import MonitorInfo, VirtualDesktopGeometry
+from .changes import FrameChangeDetector
+from .match import MultiScaleTemplateMatcher
+from .regions import Rect
+from .scheduler import AdaptiveScheduler
+
+# Seconds between checks of the monitor layout.
+LAYOUT_POLL = 5.0
+
+
+@dataclass
+class MonitorStats:
+    scans: int = 0
+    idle: int = 0
+    hits: int = 0
+
+    def summary(self) -> str:
+        return f"scans={self.scans} idle={self.idle} hits={self.hits}"
+
+
+class MonitorScan:
+    """Scan state of one monitor: what to search there and when it is due next."""
+
+    def __init__(
+        self,
+        info: MonitorInfo,
+        change_detector: FrameChangeDetector | None = None,
+        scheduler: AdaptiveScheduler | None = None,
+    ):
+        self.info = info
+        self.change_detector = change_detector
+        self.scheduler = scheduler
+        self.next_due = 0.0
+        self.stats = MonitorStats()
+        self._source: list[tuple[str, str]] | None = None
+        self._targets: list[tuple[str, str]] = []
+
+    @property
+    def label(self) -> str:
+        g = self.info.geometry
+        return f"{self.info.index} {g.width}x{g.height}@({g.left},{g.top}) {self.info.dpi_scale:.0%}"
+
+    def targets_for(
+        self,
+        targets: list[tuple[str, str]],
+        matcher: MultiScaleTemplateMatcher,
+        monitors: tuple[VirtualDesktopGeometry, ...],
+        desktop: VirtualDesktopGeometry,
+    ) -> list[tuple[str, str]]:
+        """The targets that can appear on this monitor, in their original order.
+
+        Cached per target list; the target index swaps in a new list on every change.
+        """
+
+        if targets is self._source:
+            return self._targets
+
+        g = self.info.geometry
+        frame = Rect(0, 0, g.width, g.height)
+        relevant = []
+        for name, path in targets:
+            profile = matcher.profiles.get(path)
+            if profile is None or profile.region is None:
+                relevant.append((name, path))
+            elif profile.region.resolve(g, monitors, desktop).intersects(frame):
+                relevant.append((name, path))
+        self._source, self._targets = targets, relevant
+        return relevant
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from .match import MultiScaleTemplateMatcher, PreparedHaystack
+from .regions import Rect
+
+ErrorHandler = Callable[[str, Exception], None]
+# (target name, found, seconds spent searching it)
+SearchHandler = Callable[[str, bool, float], None]
+
+
+@dataclass(frozen=True)
+class TargetHit:
+    index: int
+    name: str
+    path: str
+    found: tuple[int, int]
+    scale: float | None
+
+
+def find_first(
+    matcher: MultiScaleTemplateMatcher,
+    targets: list[tuple[str, str]],
+    haystack: PreparedHaystack,
+    regions: list[Rect] | None = None,
+    on_error: ErrorHandler | None = None,
+    on_search: SearchHandler | None = None,
+) -> TargetHit | None:
+    """Sequential scan: the first target (in list order) that matches wins."""
+
+    for index, (name, path) in enumerate(targets):
+        start = time.perf_counter()
+        try:
+            found, scale = matcher.locate_center(path, haystack, regions=regions)
+        except Exception as e:
+            if on_error is not None:
+                on_error(name, e)
+            continue
+        if on_search is not None:
+            on_search(name, bool(found), time.perf_counter() - start)
+        if found:
+            return TargetHit(index, name, path, (int(found[0]), int(found[1])), scale)
+    return None
+
+
+@dataclass
+class ParallelStats:
+    scans: int = 0
+    jobs: int = 0
+    cancelled: int = 0
+
+    def summary(self) -> str:
+        return f"scans={self.scans} jobs={self.jobs} cancelled={self.cancelled}"
+
+
+class ParallelMatcher:
+    """Spreads one scan over a bounded thread pool.
+
+    `cv2.matchTemplate` releases the GIL, so jobs for different targets run on
+    separate cores against the same read-only haystack. Jobs are (target, scale)
+    pairs with the plain scale loop; with locality, pyramid or feature search,
+    which consider all scales of a target together, a job is one whole target.
+
+    The result equals `find_first`: among all hits, the one with the lowest
+    (target index, scale index) wins. As soon as a hit is known, jobs ranked
+    after it that have not started yet are cancelled, and the scan returns once
+    every job ranked before it has finished.
+
+    `on_search` gets every target ranked up to the hit, with the time its
+    jobs took in total.
+    """
+
+    def __init__(self, matcher: MultiScaleTemplateMatcher, workers: int = 4):
+        self.matcher = matcher
+        self.workers = max(1, int(workers))
+        self.stats = ParallelStats()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="autoclicker-match")
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        return fn(*args), time.perf_counter() - start
+
+    def _per_scale(self, path: str) -> bool:
+        return self.matcher.locality is None and self.matcher.for_target(path).search == "scales"
+
+    def _prepare(self, targets: list[tuple[str, str]], haystack: PreparedHaystack, regions: list[Rect] | None) -> None:
+        # Populate shared caches up front so workers only ever read them.
+        for _, path in targets:
+            self.matcher.load(path)
+        # Targets confined to a profile region only ever convert their own crop.
+        if regions is None and any(self.matcher.region_bounds(path, haystack) is None for _, path in targets):
+            haystack.full(self.matcher.grayscale)
+
+    def locate_first(
+        self,
+        targets: list[tuple[str, str]],
+        haystack: PreparedHaystack,
+        regions: list[Rect] | None = None,
+        on_error: ErrorHandler | None = None,
+        on_search: SearchHandler | None = None,
+    ) -> TargetHit | None:
+        self.stats.scans += 1
+        self._prepare(targets, haystack, regions)
+
+        futures: dict[Future, tuple[int, int]] = {}
+        scales_by_target: dict[int, list[float]] = {}
+        for ti, (name, path) in enumerate(targets):
+            if self._per_scale(path):
+                scales_by_target[ti] = self.matcher.for_target(path).search_scales(path, haystack)
+                for si, scale in enumerate(scales_by_target[ti]):
+                    fut = self._pool.submit(self._timed, self.matcher.locate_at_scale, path, haystack, scale, regions)
+                    futures[fut] = (ti, si)
+            else:
+                fut = self._pool.submit(self._timed, self.matcher.locate_center, path, haystack, regions)
+                futures[fut] = (ti, 0)
+        self.stats.jobs += len(futures)
+
+        best: tuple[tuple[int, int], tuple[int, int], float | None] | None = None
+        spent = [0.0] * len(targets)
+        pending = set(futures)
+        # Jobs ranked after the best hit that are already running are not waited for.
+        while pending and (best is None or any(futures[f] < best[0] for f in pending)):
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                rank = futures[fut]
+                if fut.cancelled():
+                    continue
+                try:
+                    result, seconds = fut.result()
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(targets[rank[0]][0], e)
+                    continue
+                spent[rank[0]] += seconds
+
+                if self._per_scale(targets[rank[0]][1]):
+                    found, scale = result, scales_by_target[rank[0]][rank[1]]
+                else:
+                    found, scale = result
+                if not found or (best is not None and best[0] <= rank):
+                    continue
+
+                best = (rank, (int(found[0]), int(found[1])), scale)
+                # Anything ranked after the current best can no longer win.
+                for other in list(pending):
+                    if futures[other] > rank and other.cancel():
+                        self.stats.cancelled += 1
+                        pending.discard(other)
+
+        if on_search is not None:
+            # Every job ranked before the hit has finished; later targets may not have been searched fully.
+            searched = best[0][0] + 1 if best is not None else len(targets)
+            for ti in range(searched):
+                on_search(targets[ti][0], best is not None and ti == best[0][0], spent[ti])
+        if best is None:
+            return None
+        (ti, _), found, scale = best
+        name, path = targets[ti]
+        return TargetHit(ti, name, path, found, scale)
@@ -26,6 +26,23 @@ def resource_path(relative_path: str) -> str:
     return os.path.join(base_path, relative_path)
 
 
+def data_path(relative_path: str) -> str:
+    """Get absolute path to a file written at runtime and read back on later runs.
+
+    Next to the executable when frozen (never _MEIPASS: that folder is
+    deleted on exit), or in the current folder if the executable's folder is
+    not writable or the app is not frozen.
+    """
+
+    if os.path.isabs(relative_path):
+        return relative_path
+    if getattr(sys, "frozen", False):
+        base_path = os.path.dirname(sys.executable)
+        if os.access(base_path, os.W_OK):
+            return os.path.join(base_path, relative_path)
+    return os.path.join(os.path.abspath("."), relative_path)
+
+
 def list_target_images(targets_dir: str) -> list[tuple[str, str]]:
     image_paths: list[tuple[str, str]] = []
     for filename in os.listdir(targets_dir):
@@ -0,0 +1,427 @@
+"""Pipelined capture -> match -> click across processes.
+
+A capture process writes frames into a small ring of slots in
+`multiprocessing.shared_memory`. Matcher processes take the newest published
+frame as a NumPy view over its slot, so frames are never pickled or copied.
+Results go back to the click loop over a `multiprocessing.Queue`. Capture of
+frame N+1 overlaps matching of frame N, so their latencies no longer add up.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import queue
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .capture import CaptureBackend, VirtualDesktopCapture, VirtualDesktopGeometry
+from .config import AppConfig
+from .parallel import TargetHit
+from .replay import ReplayCaptureBackend, ReplayFinished
+
+# Per-slot header: seq, captured_at, left, top, width, height.
+_HEADER = 6
+
+
+@dataclass
+class FrameLease:
+    """A published frame, pinned until `SharedFrameRing.release` is called."""
+
+    slot: int
+    seq: int
+    captured_at: float
+    geometry: VirtualDesktopGeometry
+    pixels: np.ndarray
+
+
+class SharedFrameRing:
+    """Fixed slots of BGRA frames in shared memory plus a lock-protected index.
+
+    The writer only fills slots that are neither the newest frame nor pinned by
+    a reader, so readers never see a slot change under them. If every slot is
+    busy the frame is dropped and counted. Instances are picklable and
+    re-attach to the same shared memory in child processes.
+    """
+
+    def __init__(self, slot_bytes: int, slots: int = 2, ctx=None):
+        ctx = ctx or mp.get_context("spawn")
+        self.slot_bytes = int(slot_bytes)
+        self.slots = max(2, int(slots))
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._owner = True
+        self._lock = ctx.Lock()
+        self._pins = ctx.Array("i", self.slots, lock=False)
+        self._headers = ctx.Array("d", self.slots * _HEADER, lock=False)
+        # latest[0] = newest slot (-1: none yet), latest[1] = its seq
+        self._latest = ctx.Array("q", [-1, 0], lock=False)
+        # Highest seq any reader has acquired.
+        self._taken = ctx.Value("q", 0, lock=False)
+        self.dropped_no_slot = ctx.Value("q", 0, lock=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        state["_owner"] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+
+    def close(self) -> None:
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def _slot_view(self, slot: int, height: int, width: int) -> np.ndarray:
+        n = height * width * 4
+        offset = slot * self.slot_bytes
+        return np.ndarray((height, width, 4), dtype=np.uint8, buffer=self._shm.buf[offset : offset + n])
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._latest[1])
+
+    @property
+    def taken_seq(self) -> int:
+        return int(self._taken.value)
+
+    def publish(self, pixels: np.ndarray, geometry: VirtualDesktopGeometry, captured_at: float) -> bool:
+        height, width = pixels.shape[:2]
+        if height * width * 4 > self.slot_bytes:
+            self.dropped_no_slot.value += 1
+            return False
+
+        with self._lock:
+            newest = self._latest[0]
+            slot = next((i for i in range(self.slots) if i != newest and self._pins[i] == 0), None)
+        if slot is None:
+            self.dropped_no_slot.value += 1
+            return False
+
+        # Readers only ever pin the newest slot, so this one is ours until published.
+        self._slot_view(slot, height, width)[:] = pixels
+
+        with self._lock:
+            seq = self._latest[1] + 1
+            base = slot * _HEADER
+            self._headers[base : base + _HEADER] = [
+                seq,
+                captured_at,
+                geometry.left,
+                geometry.top,
+                width,
+                height,
+            ]
+            self._latest[0] = slot
+            self._latest[1] = seq
+        return True
+
+    def acquire_latest(self, after_seq: int) -> FrameLease | None:
+        """Pin and return the newest frame if it is newer than `after_seq` and no reader has taken it yet.
+
+        Each frame goes to one reader only, so several matchers never search the same frame.
+        """
+
+        with self._lock:
+            slot = self._latest[0]
+            if slot < 0 or self._latest[1] <= max(after_seq, self._taken.value):
+                return None
+            self._pins[slot] += 1
+            seq, captured_at, left, top, width, height = self._headers[slot * _HEADER : (slot + 1) * _HEADER]
+            self._taken.value = int(seq)
+
+        geom = VirtualDesktopGeometry(left=int(left), top=int(top), width=int(width), height=int(height))
+        pixels = self._slot_view(slot, int(height), int(width))
+        return FrameLease(slot=slot, seq=int(seq), captured_at=captured_at, geometry=geom, pixels=pixels)
+
+    def release(self, lease: FrameLease) -> None:
+        lease.pixels = None
+        with self._lock:
+            self._pins[lease.slot] -= 1
+
+
+@dataclass(frozen=True)
+class PipelineResult:
+    seq: int
+    captured_at: float
+    matched_at: float
+    geometry: VirtualDesktopGeometry
+    hit: TargetHit | None
+    skipped: bool
+    # (target name, found, seconds) per target searched, for the parent's hit statistics
+    searches: tuple[tuple[str, bool, float], ...] = ()
+
+
+class PipelineError(RuntimeError):
+    """A matcher process failed; raised by `CaptureMatchPipeline.next_result`."""
+
+
+def _capture_main(
+    ring: SharedFrameRing, backend: str | CaptureBackend, interval: float, stop, captured, finished
+) -> None:
+    try:
+        _capture_loop(ring, backend, interval, stop, captured, finished)
+    except KeyboardInterrupt:
+        # Ctrl+C reaches every process in the console; the parent handles shutdown.
+        pass
+
+
+def _capture_loop(
+    ring: SharedFrameRing, backend: str | CaptureBackend, interval: float, stop, captured, finished
+) -> None:
+    # Unpaced replay hands every frame to a matcher instead of replacing frames nobody took yet.
+    lossless = isinstance(backend, ReplayCaptureBackend) and not backend.paced
+    with VirtualDesktopCapture(backend) as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                capture = session.screenshot()
+            except ReplayFinished:
+                while ring.taken_seq < ring.latest_seq and not stop.is_set():
+                    stop.wait(0.002)
+                finished.set()
+                return
+            except Exception as e:
+                print(f"Pipeline capture error: {type(e).__name__}: {e}")
+                time.sleep(max(interval, 0.1))
+                continue
+            captured.value += 1
+            ring.publish(capture.pixels, capture.geometry, start)
+            if lossless:
+                while ring.taken_seq < ring.latest_seq and not stop.is_set():
+                    stop.wait(0.002)
+                continue
+
+            sleep_for = interval - (time.perf_counter() - start)
+            if sleep_for > 0:
+                stop.wait(sleep_for)
+
+
+def _match_main(ring: SharedFrameRing, config: AppConfig, targets, results, stop, click_epoch) -> None:
+    try:
+        _match_loop(ring, config, targets, results, stop, click_epoch)
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        # Otherwise the click loop would wait for results that never come.
+        name = mp.current_process().name
+        results.put(PipelineError(f"{name} stopped:\n{traceback.format_exc()}"))
+
+
+def _match_loop(ring: SharedFrameRing, config: AppConfig, targets, results, stop, click_epoch) -> None:
+    from .changes import FrameChangeDetector
+    from .match import PreparedHaystack, matcher_from_config
+    from .parallel import find_first
+    from .profiles import ProfileError, load_profile
+
+    matcher = matcher_from_config(config)
+    per_target = {}
+    for _, path in targets:
+        try:
+            matcher.set_profile(path, load_profile(path))
+        except ProfileError:
+            # Changed since the parent checked it; search with the global settings.
+            continue
+        tuned = matcher.for_target(path)
+        if tuned is not matcher:
+            per_target[path] = (tuned.scales, tuned.grayscale)
+    if config.template_cache:
+        from .paths import data_path
+        from .template_store import TemplateStore
+
+        try:
+            # Written by the parent just before start, so this only maps it.
+            store = TemplateStore(data_path(config.template_cache))
+            for path, by_scale in store.load(targets, config.scales, config.grayscale, per_target).items():
+                matcher.add_variants(path, by_scale)
+            for path, features in store.features.items():
+                matcher.add_features(path, features)
+        except Exception:
+            pass
+    detector = FrameChangeDetector(tile_size=config.change_tile_size) if config.change_detection else None
+    seen_epoch = click_epoch.value
+    last_seq = 0
+
+    while not stop.is_set():
+        lease = ring.acquire_latest(last_seq)
+        if lease is None:
+            time.sleep(0.002)
+            continue
+
+        try:
+            last_seq = lease.seq
+            if detector is not None and click_epoch.value != seen_epoch:
+                # A click happened; rescan fully, as the single-process loop does.
+                seen_epoch = click_epoch.value
+                detector.reset()
+
+            regions = None
+            skipped = False
+            if detector is not None:
+                change = detector.update(lease.pixels)
+                skipped = not change.changed
+                if change.changed and not change.full:
+                    regions = change.dirty
+
+            hit = None
+            searches: list[tuple[str, bool, float]] = []
+            if not skipped:
+                haystack = PreparedHaystack(lease.pixels, geometry=lease.geometry)
+                hit = find_first(
+                    matcher, targets, haystack, regions, on_search=lambda *search: searches.append(search)
+                )
+        finally:
+            ring.release(lease)
+
+        results.put(
+            PipelineResult(
+                lease.seq, lease.captured_at, time.perf_counter(), lease.geometry, hit, skipped, tuple(searches)
+            )
+        )
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    return float(np.percentile(np.fromiter(values, dtype=np.float64), q))
+
+
+@dataclass
+class PipelineStats:
+    results: int = 0
+    skipped: int = 0
+    hits: int = 0
+    clicks: int = 0
+
+    def __post_init__(self):
+        self.match_latency_ms: deque[float] = deque(maxlen=1000)
+        self.click_latency_ms: deque[float] = deque(maxlen=1000)
+
+
+class CaptureMatchPipeline:
+    """Runs capture and matching in child processes; results arrive via `next_result`.
+
+    Frame-to-result latency is measured for every frame; frame-to-click latency
+    for frames that led to a click (see `note_click`). Frames are dropped when
+    the ring has no free slot, or when a newer frame was published before any
+    matcher took the previous one.
+    """
+
+    def __init__(
+        self,
+        config: AppConfig,
+        targets: list[tuple[str, str]],
+        matchers: int = 1,
+        backend: str | CaptureBackend | None = None,
+        slot_bytes: int = 0,
+    ):
+        self.config = config
+        self.targets = list(targets)
+        self.matchers = max(1, int(matchers))
+        # A backend instance must be picklable; it is re-created in the capture process.
+        self.backend = backend if backend is not None else config.capture_backend
+        self.stats = PipelineStats()
+        self._ctx = mp.get_context("spawn")
+        if slot_bytes <= 0:
+            slot_bytes = self._probe_frame_bytes()
+        # One slot pinned per matcher, one holding the newest frame, one being written.
+        self.ring = SharedFrameRing(slot_bytes, slots=self.matchers + 2, ctx=self._ctx)
+        self._stop = self._ctx.Event()
+        self._captured = self._ctx.Value("q", 0, lock=False)
+        # Set by the capture process when a replay runs out of frames.
+        self._capture_finished = self._ctx.Event()
+        self._click_epoch = self._ctx.Value("q", 0, lock=False)
+        self._results = self._ctx.Queue()
+        self._procs: list = []
+
+    def _probe_frame_bytes(self) -> int:
+        with VirtualDesktopCapture(self.backend) as session:
+            geom = session.screenshot().geometry
+        # Headroom for a monitor being attached while running.
+        return int(geom.width * geom.height * 4 * 1.5)
+
+    def start(self) -> None:
+        self._procs.append(
+            self._ctx.Process(
+                target=_capture_main,
+                args=(
+                    self.ring,
+                    self.backend,
+                    self.config.scan_interval,
+                    self._stop,
+                    self._captured,
+                    self._capture_finished,
+                ),
+                name="autoclicker-capture",
+                daemon=True,
+            )
+        )
+        for i in range(self.matchers):
+            self._procs.append(
+                self._ctx.Process(
+                    target=_match_main,
+                    args=(self.ring, self.config, self.targets, self._results, self._stop, self._click_epoch),
+                    name=f"autoclicker-match-{i}",
+                    daemon=True,
+                )
+            )
+        for proc in self._procs:
+            proc.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        for proc in self._procs:
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs.clear()
+        self._results.cancel_join_thread()
+        self.ring.close()
+
+    def next_result(self, timeout: float = 1.0) -> PipelineResult | None:
+        try:
+            result = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if isinstance(result, PipelineError):
+            raise result
+
+        self.stats.results += 1
+        self.stats.skipped += int(result.skipped)
+        self.stats.hits += int(result.hit is not None)
+        self.stats.match_latency_ms.append((result.matched_at - result.captured_at) * 1000.0)
+        return result
+
+    def note_click(self, result: PipelineResult) -> None:
+        self.stats.clicks += 1
+        self.stats.click_latency_ms.append((time.perf_counter() - result.captured_at) * 1000.0)
+        self._click_epoch.value += 1
+
+    @property
+    def capture_finished(self) -> bool:
+        """The capture process ran out of frames (a replay) and its last frame was taken."""
+
+        return self._capture_finished.is_set()
+
+    @property
+    def dropped_frames(self) -> int:
+        # No free slot, or superseded by a newer frame before any matcher took it.
+        superseded = self.ring.latest_seq - self.stats.results - self.matchers
+        return int(self.ring.dropped_no_slot.value) + max(0, superseded)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"captured={self._captured.value} results={s.results} skipped={s.skipped} hits={s.hits} "
+            f"clicks={s.clicks} dropped={self.dropped_frames} (no_slot={self.ring.dropped_no_slot.value}) "
+            f"frame->result p50={_percentile(s.match_latency_ms, 50):.1f}ms "
+            f"p95={_percentile(s.match_latency_ms, 95):.1f}ms "
+            f"frame->click p50={_percentile(s.click_latency_ms, 50):.1f}ms "
+            f"p95={_percentile(s.click_latency_ms, 95):.1f}ms"
+        )
@@ -0,0 +1,208 @@
+"""Color prefilter: skip areas that cannot hold a target.
+
+When a template is first searched, its dominant colors are recorded: the
+quantized colors that cover at least `MIN_SHARE` of its pixels, each as a
+tolerant BGR box around the pixels that fall in it. A match has to contain
+pixels of every dominant color, so before any correlation runs the frame (or
+each dirty region) is tiled and only tiles holding one of those colors are
+kept, padded by the needle size. If the color is missing entirely, the whole
+search is rejected without calling `matchTemplate`. Any one color is enough
+to be correct; each target tests the color that was rarest the last time all
+of them were compared (every `RANK_EVERY` searches), so a search costs a
+single color mask.
+
+The test is on absolute colors, so it only suits targets that are drawn in
+their own colors (not dimmed, recolored or themed). That is why it is opt-in,
+globally or per target profile. The tile presence grids are cached on the
+frame and shared by every target and scale that searches it.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .regions import Rect, merge_rects, tile_runs
+
+# A quantized color (32 levels per channel) must cover this share of the template.
+MIN_SHARE = 0.1
+MAX_COLORS = 3
+# Added to each side of a color box, per channel.
+TOLERANCE = 16
+# Kept tiles above this share of the searched area are not worth narrowing to.
+MAX_KEPT_RATIO = 0.5
+# Searches of a target between comparisons of all its colors.
+RANK_EVERY = 10
+
+
+@dataclass(frozen=True)
+class ColorSignature:
+    # (low, high) inclusive BGR bounds per dominant color
+    colors: tuple[tuple[tuple[int, int, int], tuple[int, int, int]], ...]
+
+
+def signature_of(bgr: np.ndarray) -> ColorSignature | None:
+    """Dominant colors of a BGR template, or None if no color dominates."""
+
+    pixels = bgr.reshape(-1, 3)
+    codes = (pixels[:, 0] >> 5).astype(np.int32) * 64 + (pixels[:, 1] >> 5) * 8 + (pixels[:, 2] >> 5)
+    counts = np.bincount(codes, minlength=512)
+    colors = []
+    for code in np.argsort(counts)[::-1][:MAX_COLORS]:
+        if counts[code] < MIN_SHARE * len(pixels):
+            break
+        members = pixels[codes == code]
+        low = np.maximum(members.min(axis=0).astype(np.int32) - TOLERANCE, 0)
+        high = np.minimum(members.max(axis=0).astype(np.int32) + TOLERANCE, 255)
+        colors.append((tuple(int(v) for v in low), tuple(int(v) for v in high)))
+    return ColorSignature(tuple(colors)) if colors else None
+
+
+@dataclass
+class PrefilterStats:
+    searches: int = 0
+    rejected: int = 0
+    narrowed: int = 0
+    area: int = 0
+    kept_area: int = 0
+
+    @property
+    def reject_ratio(self) -> float:
+        return self.rejected / self.searches if self.searches else 0.0
+
+    @property
+    def kept_ratio(self) -> float:
+        """Fraction of the area that would have been searched that still is."""
+
+        return self.kept_area / self.area if self.area else 1.0
+
+    def summary(self) -> str:
+        return (
+            f"searches={self.searches} rejected={self.rejected} ({self.reject_ratio:.0%}) "
+            f"narrowed={self.narrowed} searched_area={self.kept_ratio:.0%}"
+        )
+
+
+class ColorPrefilter:
+    def __init__(self, tile_size: int = 32):
+        self.tile_size = max(8, int(tile_size))
+        self.stats = PrefilterStats()
+        self._lock = threading.Lock()
+        # path -> signature (None: nothing to filter on)
+        self._signatures: dict[str, ColorSignature | None] = {}
+        # signature -> (index of the color to test, searches since colors were ranked)
+        self._choice: dict[ColorSignature, tuple[int, int]] = {}
+
+    def signature(self, key: str, bgr: np.ndarray) -> ColorSignature | None:
+        """The signature of `key`, computed from `bgr` the first time."""
+
+        try:
+            return self._signatures[key]
+        except KeyError:
+            pass
+        signature = self._signatures[key] = signature_of(bgr)
+        return signature
+
+    def forget(self, key: str) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is not None:
+            self._choice.pop(signature, None)
+
+    def _colors(self, signature: ColorSignature) -> list[int]:
+        """Indexes of the colors to test in this search."""
+
+        index, searches = self._choice.get(signature, (0, RANK_EVERY))
+        if searches >= RANK_EVERY or len(signature.colors) == 1:
+            return list(range(len(signature.colors)))
+        self._choice[signature] = (index, searches + 1)
+        return [index]
+
+    def _tiles(self, haystack, rect: Rect, color) -> np.ndarray:
+        """Which tiles of `rect` (tiled from its corner) hold a pixel of `color` (cached per frame)."""
+
+        cache = haystack.tile_cache
+        key = (rect, color, self.tile_size)
+        tiles = cache.get(key)
+        if tiles is not None:
+            return tiles
+
+        pixels = haystack.pixels[rect.top : rect.bottom, rect.left : rect.right]
+        low, high = color
+        if pixels.shape[2] == 4:
+            low, high = low + (0,), high + (255,)
+        mask = cv2.inRange(pixels, np.array(low, dtype=np.float64), np.array(high, dtype=np.float64))
+        ts = self.tile_size
+        th, tw = -(-rect.height // ts), -(-rect.width // ts)
+        mask = cv2.copyMakeBorder(
+            mask, 0, th * ts - rect.height, 0, tw * ts - rect.width, cv2.BORDER_CONSTANT, value=0
+        )
+        # Max-pool rows, then columns.
+        tiles = mask.reshape(th, ts, tw * ts).max(axis=1).reshape(th, tw, ts).max(axis=2) > 0
+        cache[key] = tiles
+        return tiles
+
+    def narrow(
+        self,
+        signature: ColorSignature,
+        haystack,
+        rects: list[Rect | None],
+        width: int,
+        height: int,
+    ) -> list[Rect]:
+        """The parts of `rects` where a `width` x `height` match can hold every dominant color.
+
+        `None` in `rects` stands for the whole frame. An empty result rejects the search.
+        """
+
+        pixels = haystack.pixels
+        if pixels.ndim != 3:
+            return [r or Rect(0, 0, haystack.width, haystack.height) for r in rects]
+
+        ts = self.tile_size
+        colors = self._colors(signature)
+        counts = [0] * len(colors)
+        result: list[Rect] = []
+        area = kept = 0
+        narrowed = False
+        for rect in rects:
+            rect = rect or Rect(0, 0, haystack.width, haystack.height)
+            if rect.is_empty():
+                continue
+            area += rect.area
+            grids = [self._tiles(haystack, rect, signature.colors[i]) for i in colors]
+            sums = [int(g.sum()) for g in grids]
+            counts = [c + n for c, n in zip(counts, sums)]
+            # Every match window holds a pixel of each color, so the rarest one is enough.
+            tiles = grids[sums.index(min(sums))]
+            if not tiles.any():
+                continue
+            # A match overlapping a kept tile starts at most one needle size before it.
+            kx, ky = -(-(width - 1) // ts), -(-(height - 1) // ts)
+            spread = cv2.dilate(tiles.astype(np.uint8), np.ones((2 * ky + 1, 2 * kx + 1), np.uint8)) > 0
+            if spread.sum() > MAX_KEPT_RATIO * spread.size:
+                result.append(rect)
+                kept += rect.area
+                continue
+            narrowed = True
+            runs = [
+                Rect(rect.left + r.left, rect.top + r.top, rect.left + r.right, rect.top + r.bottom)
+                for r in merge_rects(tile_runs(spread, ts, rect.width, rect.height), gap=1)
+            ]
+            result.extend(runs)
+            kept += sum(r.area for r in runs)
+
+        if len(colors) > 1:
+            self._choice[signature] = (colors[counts.index(min(counts))], 0)
+
+        with self._lock:
+            self.stats.searches += 1
+            self.stats.area += area
+            self.stats.kept_area += kept
+            if not result:
+                self.stats.rejected += 1
+            elif narrowed:
+                self.stats.narrowed += 1
+        return result
@@ -0,0 +1,227 @@
+"""Per-target match profiles.
+
+A target image may have a JSON sidecar with the same name, e.g.
+`targets/allow.json` next to `targets/allow.png`:
+
+    {
+      "region": {"relative_to": "monitor", "monitor": 2, "units": "fraction",
+                 "left": 0.5, "top": 0.75, "right": 1.0, "bottom": 1.0},
+      "confidence": 0.85,
+      "scales": [1.0, 1.25],
+      "grayscale": false,
+      "priority": 10,
+      "dpi_scale": 1.5,
+      "prefilter": true,
+      "search": "features"
+    }
+
+Every key is optional; missing ones keep the global settings. With a region,
+only that part of the frame is searched (the whole button must lie inside it),
+so the target costs a fraction of a full-desktop search. Targets with a higher
+priority are searched first and therefore win when several are visible.
+`dpi_scale` is the DPI scale of the monitor the image was captured on (1.0
+at 96 DPI); see `dpiscale.py`. `prefilter` turns the color prefilter on or off
+for this target (see `prefilter.py`). `search` picks the search for this
+target: `scales`, `pyramid` or `features` (see `features.py`).
+
+Region coordinates are relative to the captured virtual desktop (`desktop`,
+the default), to OS screen coordinates (`screen`; monitors left of or above
+the primary one are negative) or to one monitor (`monitor`, numbered from 1).
+`units` is `px` (default) or `fraction` of the desktop or monitor. The far
+edge is given either as `right`/`bottom` or as `width`/`height`.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+
+from .capture import VirtualDesktopGeometry
+from .regions import Rect
+
+
+class ProfileError(ValueError):
+    pass
+
+
+RELATIVE_TO = ("desktop", "screen", "monitor")
+SEARCH_MODES = ("scales", "pyramid", "features")
+UNITS = ("px", "fraction")
+
+
+@dataclass(frozen=True)
+class TargetRegion:
+    left: float
+    top: float
+    right: float
+    bottom: float
+    relative_to: str = "desktop"
+    monitor: int = 1
+    units: str = "px"
+
+    def resolve(
+        self,
+        frame: VirtualDesktopGeometry,
+        monitors: tuple[VirtualDesktopGeometry, ...] = (),
+        desktop: VirtualDesktopGeometry | None = None,
+    ) -> Rect:
+        """The region in pixels of a frame showing `frame` (not clipped to it).
+
+        `desktop` is the whole virtual desktop when the frame is only one monitor.
+        A monitor that is not (or no longer) connected resolves to an empty rect.
+        """
+
+        desktop = desktop or frame
+        if self.relative_to == "monitor":
+            if not 1 <= self.monitor <= len(monitors):
+                return Rect(0, 0, 0, 0)
+            ref = monitors[self.monitor - 1]
+        else:
+            ref = desktop
+        if self.relative_to == "screen":
+            ox, oy = -frame.left, -frame.top
+        else:
+            ox, oy = ref.left - frame.left, ref.top - frame.top
+
+        sx, sy = (ref.width, ref.height) if self.units == "fraction" else (1, 1)
+        return Rect(
+            ox + int(round(self.left * sx)),
+            oy + int(round(self.top * sy)),
+            ox + int(round(self.right * sx)),
+            oy + int(round(self.bottom * sy)),
+        )
+
+
+@dataclass(frozen=True)
+class TargetProfile:
+    region: TargetRegion | None = None
+    confidence: float | None = None
+    scales: tuple[float, ...] | None = None
+    grayscale: bool | None = None
+    priority: int = 0
+    dpi_scale: float | None = None
+    prefilter: bool | None = None
+    search: str | None = None
+
+    def is_default(self) -> bool:
+        return self == TargetProfile()
+
+
+def sidecar_path(image_path: str) -> str:
+    return os.path.splitext(image_path)[0] + ".json"
+
+
+def _number(data: dict, key: str, where: str) -> float:
+    value = data[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ProfileError(f"{where}: {key!r} must be a number, got {value!r}")
+    return float(value)
+
+
+def parse_region(data) -> TargetRegion:
+    if not isinstance(data, dict):
+        raise ProfileError(f"region must be an object, got {data!r}")
+
+    relative_to = data.get("relative_to", "desktop")
+    if relative_to not in RELATIVE_TO:
+        raise ProfileError(f"region: relative_to must be one of {', '.join(RELATIVE_TO)}; got {relative_to!r}")
+    units = data.get("units", "px")
+    if units not in UNITS:
+        raise ProfileError(f"region: units must be one of {', '.join(UNITS)}; got {units!r}")
+    if units == "fraction" and relative_to == "screen":
+        raise ProfileError("region: fractions are relative to the desktop or a monitor, not to screen coordinates")
+
+    monitor = data.get("monitor", 1)
+    if isinstance(monitor, bool) or not isinstance(monitor, int) or monitor < 1:
+        raise ProfileError(f"region: monitor must be a number from 1, got {monitor!r}")
+
+    try:
+        left = _number(data, "left", "region")
+        top = _number(data, "top", "region")
+        right = _number(data, "right", "region") if "right" in data else left + _number(data, "width", "region")
+        bottom = _number(data, "bottom", "region") if "bottom" in data else top + _number(data, "height", "region")
+    except KeyError as e:
+        raise ProfileError(f"region: missing {e.args[0]!r}") from None
+    if right <= left or bottom <= top:
+        raise ProfileError("region: must have a positive width and height")
+
+    return TargetRegion(left, top, right, bottom, relative_to=relative_to, monitor=monitor, units=units)
+
+
+def parse_profile(data) -> TargetProfile:
+    if not isinstance(data, dict):
+        raise ProfileError(f"profile must be a JSON object, got {type(data).__name__}")
+    unknown = set(data) - {"region", "confidence", "scales", "grayscale", "priority", "dpi_scale", "prefilter", "search"}
+    if unknown:
+        raise ProfileError(f"unknown keys: {', '.join(sorted(unknown))}")
+
+    region = parse_region(data["region"]) if data.get("region") is not None else None
+
+    confidence = None
+    if data.get("confidence") is not None:
+        confidence = _number(data, "confidence", "profile")
+        if not 0.0 < confidence <= 1.0:
+            raise ProfileError(f"confidence must be in (0, 1], got {confidence}")
+
+    scales = None
+    if data.get("scales") is not None:
+        raw = data["scales"]
+        if not isinstance(raw, list) or not raw:
+            raise ProfileError(f"scales must be a non-empty list, got {raw!r}")
+        scales = tuple(_number({"scale": s}, "scale", "scales") for s in raw)
+        if any(s <= 0 for s in scales):
+            raise ProfileError(f"scales must be positive, got {raw!r}")
+
+    grayscale = data.get("grayscale")
+    if grayscale is not None and not isinstance(grayscale, bool):
+        raise ProfileError(f"grayscale must be true or false, got {grayscale!r}")
+
+    priority = data.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ProfileError(f"priority must be an integer, got {priority!r}")
+
+    dpi_scale = None
+    if data.get("dpi_scale") is not None:
+        dpi_scale = _number(data, "dpi_scale", "profile")
+        if dpi_scale <= 0:
+            raise ProfileError(f"dpi_scale must be positive, got {dpi_scale}")
+
+    prefilter = data.get("prefilter")
+    if prefilter is not None and not isinstance(prefilter, bool):
+        raise ProfileError(f"prefilter must be true or false, got {prefilter!r}")
+
+    search = data.get("search")
+    if search is not None and search not in SEARCH_MODES:
+        raise ProfileError(f"search must be one of {', '.join(SEARCH_MODES)}; got {search!r}")
+
+    return TargetProfile(
+        region=region,
+        confidence=confidence,
+        scales=scales,
+        grayscale=grayscale,
+        priority=priority,
+        dpi_scale=dpi_scale,
+        prefilter=prefilter,
+        search=search,
+    )
+
+
+def load_profile(image_path: str) -> TargetProfile | None:
+    """The sidecar profile of `image_path`, or None if it has none.
+
+    Raises `ProfileError` for an unreadable or invalid sidecar.
+    """
+
+    path = sidecar_path(image_path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise ProfileError(f"{os.path.basename(path)}: {e}") from None
+    try:
+        return parse_profile(data)
+    except ProfileError as e:
+        raise ProfileError(f"{os.path.basename(path)}: {e}") from None
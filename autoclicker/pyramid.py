@@ -0,0 +1,135 @@
+"""Coarse-to-fine (image pyramid) search across scales.
+
+Every scale is first correlated at a reduced resolution, where matching is
+roughly 4**levels times cheaper. Only the best few candidates across all
+scales are then verified at full resolution, inside windows just larger than
+the needle.
+
+How far a needle is reduced depends on its size: with automatic levels
+(`levels` <= 0) every variant goes as deep as it can while staying at least
+`AUTO_LEVEL_SIZE` pixels on its short side, so large dialogs are searched at
+a fraction of the cost and small icons do not dissolve into a few pixels.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .match import MatchEngine, PreparedHaystack, TemplateVariant
+from .regions import Rect
+
+# Needles are never downsampled below this size; smaller ones use fewer levels.
+MIN_LEVEL_SIZE = 8
+# Automatic levels: smallest short side of a reduced needle, and the deepest level.
+AUTO_LEVEL_SIZE = 16
+MAX_AUTO_LEVELS = 4
+
+
+@dataclass(frozen=True)
+class Candidate:
+    score: float
+    scale: float
+    level: int
+    # Top-left estimate in full-resolution haystack pixels.
+    x: int
+    y: int
+
+
+def usable_level(variant: TemplateVariant, levels: int) -> int:
+    if levels <= 0:
+        level, min_size = MAX_AUTO_LEVELS, AUTO_LEVEL_SIZE
+    else:
+        level, min_size = int(levels), MIN_LEVEL_SIZE
+    while level > 0 and min(variant.width, variant.height) >> level < min_size:
+        level -= 1
+    return level
+
+
+def _top_peaks(result: np.ndarray, count: int, suppress_w: int, suppress_h: int) -> list[tuple[float, int, int]]:
+    # Greedy peak picking: take the maximum, blank its neighborhood, repeat.
+    result = result.copy()
+    peaks: list[tuple[float, int, int]] = []
+    for _ in range(count):
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        if not np.isfinite(score) or score <= -1.0:
+            break
+        peaks.append((float(score), int(x), int(y)))
+        result[
+            max(0, y - suppress_h) : y + suppress_h + 1,
+            max(0, x - suppress_w) : x + suppress_w + 1,
+        ] = -1.0
+    return peaks
+
+
+def coarse_candidates(
+    variants: list[TemplateVariant],
+    haystack: PreparedHaystack,
+    rect: Rect | None,
+    grayscale: bool,
+    levels: int,
+    candidates: int,
+) -> list[Candidate]:
+    """Best `candidates` coarse hits over all variants, highest score first."""
+
+    found: list[Candidate] = []
+    for variant in variants:
+        level = usable_level(variant, levels)
+        factor = 1 << level
+        hay = haystack.level(grayscale, level)
+        ox = oy = 0
+        if rect is not None:
+            ox, oy = rect.left // factor, rect.top // factor
+            hay = hay[oy : -(-rect.bottom // factor), ox : -(-rect.right // factor)]
+
+        needle = variant.level(grayscale, level)
+        if hay.shape[0] < needle.shape[0] or hay.shape[1] < needle.shape[1]:
+            continue
+
+        result = cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED)
+        sw, sh = max(1, needle.shape[1] // 2), max(1, needle.shape[0] // 2)
+        for score, x, y in _top_peaks(result, candidates, sw, sh):
+            found.append(Candidate(score, variant.scale, level, (x + ox) * factor, (y + oy) * factor))
+
+    found.sort(key=lambda c: c.score, reverse=True)
+    return found[:candidates]
+
+
+def pyramid_locate(
+    engine: MatchEngine,
+    variants: list[TemplateVariant],
+    haystack: PreparedHaystack,
+    rect: Rect | None,
+    confidence: float,
+    grayscale: bool,
+    levels: int,
+    candidates: int,
+) -> tuple[tuple[int, int] | None, float | None]:
+    """Coarse search over all scales, then verify candidates at full resolution."""
+
+    by_scale = {v.scale: v for v in variants}
+    bounds = rect or Rect(0, 0, haystack.width, haystack.height)
+
+    for cand in coarse_candidates(variants, haystack, rect, grayscale, levels, candidates):
+        variant = by_scale[cand.scale]
+        # pyrDown rounding moves a peak by up to one coarse pixel in each direction.
+        pad = (1 << cand.level) + 1
+        window = Rect(
+            cand.x - pad,
+            cand.y - pad,
+            cand.x + variant.width + pad,
+            cand.y + variant.height + pad,
+        )
+        window = Rect(
+            max(window.left, bounds.left),
+            max(window.top, bounds.top),
+            min(window.right, bounds.right),
+            min(window.bottom, bounds.bottom),
+        )
+        found = engine.find(variant, haystack, window, confidence, grayscale)
+        if found:
+            return found, cand.scale
+
+    return None, None
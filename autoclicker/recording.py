@@ -0,0 +1,331 @@
+"""Compact frame recordings.
+
+A recording is a directory of segment files (`*.frames`). Each segment is a
+header followed by records:
+
+- a frame: capture time, frame and desktop geometry, and either a keyframe
+  (the whole BGRA frame, zlib-compressed) or a delta holding only the
+  `TILE`-sized tiles that differ from the previous frame of the same
+  geometry (a bitmap of changed tiles plus their pixels, zlib-compressed);
+- a click: time, screen point and target name, so a replay can check that
+  the same clicks happen again.
+
+Every segment starts over with keyframes, so segments can be pruned oldest
+first and the rest still decodes. `FrameRecorder` writes recordings on a
+background thread within a memory budget (frames waiting to be written) and
+a disk budget (all segments in the directory).
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from .capture import CaptureResult, VirtualDesktopGeometry
+
+MAGIC = b"ACFRAMES1\n"
+EXTENSION = ".frames"
+TILE = 64
+# Deltas touching more than this share of the tiles are written as keyframes.
+MAX_DELTA_RATIO = 0.5
+
+_FRAME = struct.Struct("<4sd8iBI")
+_CLICK = struct.Struct("<4sd2iI")
+_KEY, _DELTA = 0, 1
+
+
+class RecordingError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class RecordedFrame:
+    at: float
+    capture: CaptureResult
+
+
+@dataclass(frozen=True)
+class RecordedTargetClick:
+    at: float
+    x: int
+    y: int
+    target: str
+
+
+def _changed_tiles(pixels: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    """Which `TILE` x `TILE` tiles differ (a BGRA pixel compared as one uint32)."""
+
+    h, w = pixels.shape[:2]
+    th, tw = -(-h // TILE), -(-w // TILE)
+    a = np.ascontiguousarray(pixels).view(np.uint32)[..., 0]
+    b = np.ascontiguousarray(prev).view(np.uint32)[..., 0]
+    diff = cv2.copyMakeBorder((a != b).view(np.uint8), 0, th * TILE - h, 0, tw * TILE - w, cv2.BORDER_CONSTANT, value=0)
+    # Max-pool rows, then columns.
+    return diff.reshape(th, TILE, tw * TILE).max(axis=1).reshape(th, tw, TILE).max(axis=2) > 0
+
+
+def _tile_slices(ty: int, tx: int):
+    return slice(ty * TILE, (ty + 1) * TILE), slice(tx * TILE, (tx + 1) * TILE)
+
+
+def encode_frame(pixels: np.ndarray, prev: np.ndarray | None, level: int = 1) -> tuple[int, bytes]:
+    """(kind, payload) of `pixels`, as a delta against `prev` when that is smaller."""
+
+    if prev is not None and prev.shape == pixels.shape:
+        changed = _changed_tiles(pixels, prev)
+        if changed.sum() <= MAX_DELTA_RATIO * changed.size:
+            parts = [np.packbits(changed).tobytes()]
+            for ty, tx in zip(*np.nonzero(changed)):
+                rows, cols = _tile_slices(int(ty), int(tx))
+                parts.append(np.ascontiguousarray(pixels[rows, cols]).tobytes())
+            return _DELTA, zlib.compress(b"".join(parts), level)
+    return _KEY, zlib.compress(np.ascontiguousarray(pixels).tobytes(), level)
+
+
+def decode_frame(kind: int, payload: bytes, height: int, width: int, prev: np.ndarray | None) -> np.ndarray:
+    data = zlib.decompress(payload)
+    if kind == _KEY:
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4).copy()
+    if prev is None or prev.shape != (height, width, 4):
+        raise RecordingError("delta frame without the frame it is based on")
+
+    th, tw = -(-height // TILE), -(-width // TILE)
+    mask_bytes = (th * tw + 7) // 8
+    changed = np.unpackbits(np.frombuffer(data[:mask_bytes], dtype=np.uint8), count=th * tw).reshape(th, tw)
+    pixels = prev.copy()
+    offset = mask_bytes
+    for ty, tx in zip(*np.nonzero(changed)):
+        rows, cols = _tile_slices(int(ty), int(tx))
+        tile = pixels[rows, cols]
+        size = tile.size
+        tile[...] = np.frombuffer(data, dtype=np.uint8, count=size, offset=offset).reshape(tile.shape)
+        offset += size
+    return pixels
+
+
+def recording_files(path: str) -> list[str]:
+    """The segment files of a recording (a directory or a single file), oldest first."""
+
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith(EXTENSION)
+        )
+    return [path]
+
+
+def read_recording(path: str, frames: bool = True):
+    """Yield every `RecordedFrame` and `RecordedTargetClick` of a recording, in order.
+
+    With `frames=False` frames are skipped without decoding them, and only clicks are yielded.
+    """
+
+    for segment in recording_files(path):
+        prev: dict[tuple, np.ndarray] = {}
+        with open(segment, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise RecordingError(f"{segment}: not a frame recording")
+            while True:
+                tag = f.read(4)
+                if not tag:
+                    break
+                if tag == b"FRM1":
+                    head = f.read(_FRAME.size - 4)
+                    if len(head) < _FRAME.size - 4:
+                        break  # cut off by a crash; everything before it is fine
+                    _, at, gl, gt, gw, gh, dl, dt, dw, dh, kind, length = _FRAME.unpack(tag + head)
+                    if not frames:
+                        f.seek(length, os.SEEK_CUR)
+                        continue
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        break
+                    geometry = VirtualDesktopGeometry(gl, gt, gw, gh)
+                    desktop = VirtualDesktopGeometry(dl, dt, dw, dh)
+                    key = (geometry, desktop)
+                    pixels = decode_frame(kind, payload, gh, gw, prev.get(key))
+                    prev[key] = pixels
+                    capture = CaptureResult(pixels=pixels, geometry=geometry, desktop=None if desktop == geometry else desktop)
+                    yield RecordedFrame(at, capture)
+                elif tag == b"CLK1":
+                    head = f.read(_CLICK.size - 4)
+                    if len(head) < _CLICK.size - 4:
+                        break
+                    _, at, x, y, length = _CLICK.unpack(tag + head)
+                    name = f.read(length)
+                    yield RecordedTargetClick(at, x, y, name.decode("utf-8", "replace"))
+                else:
+                    raise RecordingError(f"{segment}: corrupt record")
+
+
+@dataclass
+class RecorderStats:
+    frames: int = 0
+    keyframes: int = 0
+    clicks: int = 0
+    dropped: int = 0
+    failed: int = 0
+    written_bytes: int = 0
+    segments: int = 0
+    pruned: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"frames={self.frames} keyframes={self.keyframes} clicks={self.clicks} dropped={self.dropped} "
+            f"failed={self.failed} written={self.written_bytes / (1024 * 1024):.1f} MB "
+            f"segments={self.segments} pruned={self.pruned}"
+        )
+
+
+class FrameRecorder:
+    """Records frames (and clicks) into `out_dir` on a background thread.
+
+    `submit` only enqueues a reference to the frame, like the click log
+    writer. Frames waiting to be written may hold at most `max_memory_bytes`;
+    past that new frames are dropped. Segments are closed at
+    `segment_bytes` (default: an eighth of the disk budget) and the oldest
+    ones, from earlier runs too, are removed once the directory holds more
+    than `max_disk_bytes`. 0 means no limit.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        segment_bytes: int = 0,
+    ):
+        self.out_dir = out_dir
+        self.max_memory_bytes = max(0, int(max_memory_bytes))
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        if segment_bytes <= 0:
+            segment_bytes = self.max_disk_bytes // 8 if self.max_disk_bytes else 256 * 1024 * 1024
+        self.segment_bytes = max(1024 * 1024, int(segment_bytes))
+        self.stats = RecorderStats()
+        self._queue: deque = deque()
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._file = None
+        self._file_bytes = 0
+        self._prev: dict[tuple, np.ndarray] = {}
+        self._segments: deque[tuple[str, int]] | None = None
+        self._thread = threading.Thread(target=self._run, name="autoclicker-recorder", daemon=True)
+        self._thread.start()
+
+    def submit(self, capture: CaptureResult) -> None:
+        size = int(capture.pixels.nbytes)
+        with self._cond:
+            if self.max_memory_bytes and self._pending_bytes + size > self.max_memory_bytes:
+                self.stats.dropped += 1
+                return
+            self._pending_bytes += size
+            self._queue.append((time.time(), capture))
+            self._cond.notify()
+
+    def note_click(self, point: tuple[int, int], target: str) -> None:
+        with self._cond:
+            self._queue.append((time.time(), RecordedTargetClick(0.0, int(point[0]), int(point[1]), target)))
+            self._cond.notify()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write what is pending (up to `timeout` seconds), then stop."""
+
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._closing:
+                        self._cond.wait()
+                    if not self._queue:
+                        return
+                    at, item = self._queue.popleft()
+                try:
+                    if isinstance(item, RecordedTargetClick):
+                        self._write_click(at, item)
+                    else:
+                        self._write_frame(at, item)
+                except Exception as e:
+                    self.stats.failed += 1
+                    print(f"Warning: failed to record frame: {type(e).__name__}: {e}")
+                finally:
+                    if not isinstance(item, RecordedTargetClick):
+                        with self._cond:
+                            self._pending_bytes -= int(item.pixels.nbytes)
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _segment(self):
+        if self._file is not None and self._file_bytes < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+            self._retain()
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.out_dir, f"frames-{stamp}-{self.stats.segments:04d}{EXTENSION}")
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file_bytes = len(MAGIC)
+        self._path = path
+        # Segments decode on their own, so each starts with keyframes.
+        self._prev = {}
+        self.stats.segments += 1
+        return self._file
+
+    def _write(self, data: bytes) -> None:
+        f = self._segment()
+        f.write(data)
+        f.flush()
+        self._file_bytes += len(data)
+        self.stats.written_bytes += len(data)
+
+    def _write_frame(self, at: float, capture: CaptureResult) -> None:
+        self._segment()
+        g, d = capture.geometry, capture.desktop_geometry
+        key = (g, d)
+        kind, payload = encode_frame(capture.pixels, self._prev.get(key))
+        self._prev[key] = capture.pixels
+        head = _FRAME.pack(b"FRM1", at, g.left, g.top, g.width, g.height, d.left, d.top, d.width, d.height, kind, len(payload))
+        self._write(head + payload)
+        self.stats.frames += 1
+        if kind == _KEY:
+            self.stats.keyframes += 1
+
+    def _write_click(self, at: float, click: RecordedTargetClick) -> None:
+        name = click.target.encode("utf-8")
+        self._write(_CLICK.pack(b"CLK1", at, click.x, click.y, len(name)) + name)
+        self.stats.clicks += 1
+
+    def _retain(self) -> None:
+        if not self.max_disk_bytes:
+            return
+        if self._segments is None:
+            # First rotation: pick up segments from earlier runs, oldest first.
+            self._segments = deque((p, os.path.getsize(p)) for p in recording_files(self.out_dir) if p != self._path)
+        self._segments.append((self._path, os.path.getsize(self._path)))
+
+        # Leave room for the segment being started.
+        total = sum(size for _, size in self._segments) + self.segment_bytes
+        while self._segments and total > self.max_disk_bytes:
+            path, size = self._segments.popleft()
+            total -= size
+            try:
+                os.remove(path)
+                self.stats.pruned += 1
+            except OSError:
+                pass
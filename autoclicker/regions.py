@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Rect:
+    """Axis-aligned rectangle in haystack pixels; `right`/`bottom` are exclusive."""
+
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def width(self) -> int:
+        return self.right - self.left
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+    @property
+    def area(self) -> int:
+        return max(0, self.width) * max(0, self.height)
+
+    def is_empty(self) -> bool:
+        return self.width <= 0 or self.height <= 0
+
+    def pad(self, dx: int, dy: int) -> Rect:
+        return Rect(self.left - dx, self.top - dy, self.right + dx, self.bottom + dy)
+
+    def clip(self, width: int, height: int) -> Rect:
+        return Rect(max(0, self.left), max(0, self.top), min(width, self.right), min(height, self.bottom))
+
+    def intersects(self, other: Rect) -> bool:
+        return self.left < other.right and other.left < self.right and self.top < other.bottom and other.top < self.bottom
+
+    def intersection(self, other: Rect) -> Rect:
+        """Overlap of both rectangles; empty (see `is_empty`) when they do not meet."""
+
+        return Rect(
+            max(self.left, other.left),
+            max(self.top, other.top),
+            min(self.right, other.right),
+            min(self.bottom, other.bottom),
+        )
+
+    def union(self, other: Rect) -> Rect:
+        return Rect(
+            min(self.left, other.left),
+            min(self.top, other.top),
+            max(self.right, other.right),
+            max(self.bottom, other.bottom),
+        )
+
+
+def merge_rects(rects: list[Rect], gap: int = 0) -> list[Rect]:
+    """Union overlapping rectangles until none overlap. Order follows first appearance.
+
+    With `gap > 0`, rectangles closer than `gap` pixels (e.g. edge-adjacent tiles)
+    are joined as well.
+    """
+
+    merged: list[Rect] = []
+    for rect in rects:
+        if rect.is_empty():
+            continue
+        merged.append(rect)
+
+    changed = True
+    while changed:
+        changed = False
+        result: list[Rect] = []
+        for rect in merged:
+            for i, other in enumerate(result):
+                if rect.pad(gap, gap).intersects(other):
+                    result[i] = other.union(rect)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+
+    return merged
+
+
+def tile_runs(tiles: np.ndarray, tile_size: int, width: int, height: int) -> list[Rect]:
+    """Horizontal runs of set tiles per tile row, in pixels clipped to `width` x `height`."""
+
+    rects: list[Rect] = []
+    for ty, row in enumerate(tiles):
+        xs = np.flatnonzero(row)
+        if xs.size == 0:
+            continue
+        breaks = np.flatnonzero(np.diff(xs) > 1)
+        starts = np.concatenate(([xs[0]], xs[breaks + 1]))
+        ends = np.concatenate((xs[breaks], [xs[-1]]))
+        for sx, ex in zip(starts, ends):
+            rects.append(
+                Rect(
+                    int(sx) * tile_size,
+                    ty * tile_size,
+                    min(width, (int(ex) + 1) * tile_size),
+                    min(height, (ty + 1) * tile_size),
+                )
+            )
+    return rects
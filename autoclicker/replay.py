@@ -0,0 +1,267 @@
+"""Replay capture backend: run the app on recorded frames instead of the screen.
+
+The source is one of:
+
+- a frame recording (a `.frames` file or a directory of them, see
+  `recording.py`), which also carries the clicks made while recording;
+- a directory of PNG screenshots, played in name order at `fps`;
+- a video file (anything OpenCV can open), at the video's own frame rate.
+
+Paced replay follows the recorded timing: each grab returns the newest frame
+that is due, so frames the app is too slow for are skipped, as they would
+be on a real screen. Unpaced replay returns the next frame on every grab, for
+measuring throughput. After the last frame, grabs raise `ReplayFinished`
+(unless looping), which ends the app's run with a report.
+
+Expected clicks are the clicks in the recording, or an `expected_clicks.json`
+(a list of `{"x": ..., "y": ...}` in screen coordinates) in the source
+directory or at an explicit path.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from .capture import CaptureBackend, CaptureResult, VirtualDesktopGeometry
+from .recording import EXTENSION, RecordedFrame, RecordedTargetClick, read_recording
+
+EXPECTED_NAME = "expected_clicks.json"
+# Longer pauses in a recording (e.g. between runs) are shortened to this in paced replay.
+MAX_GAP = 5.0
+
+
+class ReplayFinished(Exception):
+    """The replay source has no more frames."""
+
+
+@dataclass
+class ReplayStats:
+    frames: int = 0
+    grabs: int = 0
+    skipped: int = 0
+    loops: int = 0
+    started: float = 0.0
+    finished: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+        rate = self.grabs / elapsed if elapsed > 0 else 0.0
+        return (
+            f"frames={self.frames} grabs={self.grabs} skipped={self.skipped} loops={self.loops} "
+            f"elapsed={elapsed:.2f}s ({rate:.1f} grabs/s)"
+        )
+
+
+@dataclass(frozen=True)
+class ExpectedClick:
+    x: int
+    y: int
+    target: str = ""
+
+
+def load_expected_clicks(path: str) -> list[ExpectedClick]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of clicks")
+    try:
+        return [ExpectedClick(int(c["x"]), int(c["y"]), str(c.get("target", ""))) for c in data]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{path}: invalid click: {e}") from None
+
+
+def _png_frames(directory: str, fps: float):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(".png"))
+    import cv2
+
+    for i, name in enumerate(names):
+        bgr = cv2.imread(os.path.join(directory, name), cv2.IMREAD_COLOR)
+        if bgr is None:
+            print(f"Warning: could not read replay frame {name}")
+            continue
+        pixels = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+        h, w = pixels.shape[:2]
+        yield i / fps, CaptureResult(pixels=pixels, geometry=VirtualDesktopGeometry(0, 0, w, h))
+
+
+def _video_frames(path: str, fps: float):
+    import cv2
+
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        raise ValueError(f"Cannot open replay video: {path}")
+    fps = video.get(cv2.CAP_PROP_FPS) or fps
+    try:
+        i = 0
+        while True:
+            ok, bgr = video.read()
+            if not ok:
+                return
+            pixels = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+            h, w = pixels.shape[:2]
+            yield i / fps, CaptureResult(pixels=pixels, geometry=VirtualDesktopGeometry(0, 0, w, h))
+            i += 1
+    finally:
+        video.release()
+
+
+def _is_recording(source: str) -> bool:
+    if os.path.isdir(source):
+        return any(n.endswith(EXTENSION) for n in os.listdir(source))
+    return source.endswith(EXTENSION)
+
+
+class ReplayCaptureBackend(CaptureBackend):
+    """Frames from a recording, PNG directory or video (see the module docstring)."""
+
+    name = "replay"
+
+    def __init__(
+        self,
+        source: str,
+        paced: bool = True,
+        fps: float = 2.0,
+        loop: bool = False,
+        expected: str = "",
+    ):
+        self.source = source
+        self.paced = paced
+        self.fps = fps if fps > 0 else 2.0
+        self.loop = loop
+        self.expected_path = expected
+        self.stats = ReplayStats()
+        self._reset()
+
+    def __getstate__(self):
+        # Sent to the pipeline's capture process unopened; it re-reads the source there.
+        state = self.__dict__.copy()
+        state.update(_frames=None, _current=None, _next=None, _served=False)
+        return state
+
+    def _reset(self) -> None:
+        self._frames = None
+        # (virtual time, capture) of the frame last returned and of the one after it
+        self._current: tuple[float, CaptureResult] | None = None
+        self._next: tuple[float, CaptureResult] | None = None
+        self._served = False
+        self._clock = 0.0
+
+    def open(self) -> None:
+        if self._frames is not None:
+            return
+        if not self.source or not os.path.exists(self.source):
+            raise ValueError(f"Replay source not found: {self.source!r}")
+        self._frames = self._timed(self._source_frames())
+        self.stats.started = self.stats.started or time.perf_counter()
+
+    def close(self) -> None:
+        if self._frames is not None:
+            self._frames.close()
+        self._reset()
+
+    def expected_clicks(self) -> list[ExpectedClick] | None:
+        """The clicks one pass over the source should make, or None if nothing says."""
+
+        path = self.expected_path or os.path.join(self.source, EXPECTED_NAME)
+        if self.expected_path or os.path.isfile(path):
+            return load_expected_clicks(path)
+        if _is_recording(self.source):
+            return [
+                ExpectedClick(item.x, item.y, item.target)
+                for item in read_recording(self.source, frames=False)
+                if isinstance(item, RecordedTargetClick)
+            ]
+        return None
+
+    def _source_frames(self):
+        if _is_recording(self.source):
+            for item in read_recording(self.source):
+                if isinstance(item, RecordedFrame):
+                    yield item.at, item.capture
+        elif os.path.isdir(self.source):
+            yield from _png_frames(self.source, self.fps)
+        else:
+            yield from _video_frames(self.source, self.fps)
+
+    def _timed(self, frames):
+        """Frames with their time from the start of the replay, long pauses shortened."""
+
+        virtual = 0.0
+        last = None
+        for at, capture in frames:
+            if last is not None:
+                virtual += min(max(0.0, at - last), MAX_GAP)
+            last = at
+            self.stats.frames += 1
+            yield virtual, capture
+
+    def _advance(self) -> tuple[float, CaptureResult] | None:
+        frame, self._next = self._next, None
+        if frame is None:
+            frame = next(self._frames, None)
+        return frame
+
+    def _peek(self) -> tuple[float, CaptureResult] | None:
+        if self._next is None:
+            self._next = next(self._frames, None)
+        return self._next
+
+    def _restart(self) -> None:
+        if not self.loop:
+            self.stats.finished = time.perf_counter()
+            raise ReplayFinished(f"replay of {self.source} finished")
+        self.close()
+        self.stats.loops += 1
+        self.open()
+
+    def grab(self) -> CaptureResult:
+        self.open()
+        self.stats.grabs += 1
+        return self._grab_paced() if self.paced else self._grab_unpaced()
+
+    def _grab_unpaced(self) -> CaptureResult:
+        frame = self._advance()
+        if frame is None:
+            self._restart()
+            frame = self._advance()
+            if frame is None:
+                raise ReplayFinished(f"replay source {self.source} has no frames")
+        return frame[1]
+
+    def _grab_paced(self) -> CaptureResult:
+        now = time.monotonic()
+        if self._current is None:
+            self._current = self._advance()
+            if self._current is None:
+                raise ReplayFinished(f"replay source {self.source} has no frames")
+            self._clock = now - self._current[0]
+            self._served = False
+        # Move on to the newest frame that is due by now.
+        while True:
+            upcoming = self._peek()
+            if upcoming is None:
+                if self._served:
+                    self._restart()
+                    return self._grab_paced()
+                break
+            if upcoming[0] > now - self._clock:
+                break
+            if not self._served:
+                self.stats.skipped += 1
+            self._current = self._advance()
+            self._served = False
+        self._served = True
+        return self._current[1]
+
+
+def replay_backend_from_config(config) -> ReplayCaptureBackend:
+    return ReplayCaptureBackend(
+        config.replay_source,
+        paced=config.replay_paced,
+        fps=config.replay_fps,
+        loop=config.replay_loop,
+        expected=config.replay_expected,
+    )
@@ -0,0 +1,92 @@
+"""Adaptive scan pacing.
+
+Instead of sleeping a fixed `scan_interval`, the delay before the next scan
+grows geometrically while frames are unchanged and nothing matches, and
+drops straight back to `min_interval` after a hit or a detected change. A CPU
+budget (a fraction of one core) stretches idle delays: with an average scan
+costing `c` CPU seconds, idle scans are spaced `c / budget` apart, but never
+more than `max_interval`. The scan right after a hit or a change is never
+delayed by the budget, so reaction time does not suffer for it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass
+class SchedulerStats:
+    scans: int = 0
+    fast: int = 0
+    backoffs: int = 0
+    budget_limited: int = 0
+    interval: float = 0.0
+    cpu_per_scan: float = 0.0
+    cpu_ratio: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"interval={self.interval * 1000.0:.0f}ms scans={self.scans} fast={self.fast} "
+            f"backoffs={self.backoffs} budget_limited={self.budget_limited} "
+            f"cpu/scan={self.cpu_per_scan * 1000.0:.1f}ms cpu={self.cpu_ratio:.1%} of a core"
+        )
+
+
+class AdaptiveScheduler:
+    # Weight of the newest scan in the running average of scan cost.
+    SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+        backoff: float = 1.5,
+        cpu_budget: float = 0.05,
+    ):
+        self.min_interval = max(0.0, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.cpu_budget = max(0.0, float(cpu_budget))
+        self.interval = self.min_interval
+        self.stats = SchedulerStats(interval=self.interval)
+        self._cpu_avg: float | None = None
+        self._cpu_total = 0.0
+        self._wall_total = 0.0
+
+    def next_delay(self, wall: float, cpu: float, hit: bool, changed: bool | None) -> float:
+        """Seconds to wait before the next scan.
+
+        `wall` and `cpu` are what the scan just took; `changed` is the change
+        detector's verdict (None without change detection).
+        """
+
+        s = self.stats
+        s.scans += 1
+        fast = bool(hit or changed)
+        if fast:
+            self.interval = self.min_interval
+            s.fast += 1
+        else:
+            grown = min(self.max_interval, max(self.interval, 0.01) * self.backoff)
+            if grown > self.interval:
+                s.backoffs += 1
+            self.interval = grown
+
+        if self._cpu_avg is None:
+            self._cpu_avg = cpu
+        else:
+            self._cpu_avg += self.SMOOTHING * (cpu - self._cpu_avg)
+
+        delay = max(0.0, self.interval - wall)
+        if self.cpu_budget > 0 and not fast:
+            floor = min(self._cpu_avg / self.cpu_budget, self.max_interval) - wall
+            if floor > delay:
+                delay = floor
+                s.budget_limited += 1
+
+        self._cpu_total += cpu
+        self._wall_total += wall + delay
+        s.interval = self.interval
+        s.cpu_per_scan = self._cpu_avg
+        s.cpu_ratio = self._cpu_total / self._wall_total if self._wall_total > 0 else 0.0
+        return delay
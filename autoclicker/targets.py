@@ -0,0 +1,261 @@
+"""Hot-reloadable index of the images in `targets/`.
+
+The directory is polled on a background thread. Each poll only touches what
+changed: new images are loaded, images whose content hash changed are rebuilt,
+and deleted images are evicted from the matcher together with every scaled
+variant and their hit history. The scan loop reads `TargetIndex.targets`,
+which is swapped in one assignment, so it never waits for decoding.
+
+Every change bumps `generation`. `changed_since` tells the scan loop which
+targets were added or rebuilt since the generation it last saw: those get one
+full-frame search, as the screen may have shown them all along, unchanged.
+
+Profile sidecars (see `profiles.py`) are watched the same way. The target list
+is ordered by profile priority, highest first; a target whose profile is
+invalid is left out until its sidecar is fixed.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+from .match import MultiScaleTemplateMatcher, TemplateVariant, make_variant
+from .paths import list_target_images
+from .profiles import ProfileError, load_profile, sidecar_path
+from .template_store import TemplateStore, content_hash
+
+
+@dataclass(frozen=True)
+class _FileState:
+    mtime_ns: int
+    size: int
+    digest: str
+    # 0 when the target has no profile sidecar.
+    profile_mtime_ns: int = 0
+    priority: int = 0
+    broken: bool = False
+
+
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+@dataclass
+class IndexStats:
+    polls: int = 0
+    added: int = 0
+    rebuilt: int = 0
+    removed: int = 0
+    failed: int = 0
+    last_apply_ms: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"polls={self.polls} added={self.added} rebuilt={self.rebuilt} removed={self.removed} "
+            f"failed={self.failed} last_apply={self.last_apply_ms:.1f}ms"
+        )
+
+
+class TargetIndex:
+    """Keeps the target list and the matcher's template cache in sync with a directory."""
+
+    def __init__(
+        self,
+        targets_dir: str,
+        matcher: MultiScaleTemplateMatcher,
+        store: TemplateStore | None = None,
+        poll_interval: float = 2.0,
+    ):
+        self.targets_dir = targets_dir
+        self.matcher = matcher
+        self.store = store
+        self.poll_interval = max(0.0, float(poll_interval))
+        self.stats = IndexStats()
+        self._targets: list[tuple[str, str]] = []
+        self._files: dict[str, _FileState] = {}
+        self.generation = 0
+        # path -> generation it was last added or rebuilt in
+        self._built_in: dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def targets(self) -> list[tuple[str, str]]:
+        """Current (name, path) list; a new list object after every change."""
+
+        return self._targets
+
+    def changed_since(self, generation: int) -> set[str]:
+        """Paths added or rebuilt after `generation`."""
+
+        return {path for path, built in self._built_in.items() if built > generation}
+
+    def start(self) -> None:
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._poll_loop, name="autoclicker-targets", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.store is not None:
+            self.store.close()
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                added, rebuilt, removed = self.refresh()
+            except Exception as e:
+                print(f"Warning: target index refresh failed: {type(e).__name__}: {e}")
+                continue
+            if added or rebuilt or removed:
+                print(
+                    f"Targets updated: +{len(added)} ~{len(rebuilt)} -{len(removed)} "
+                    f"({len(self._targets)} total): {[os.path.basename(p) for p in added + rebuilt]}"
+                )
+
+    def refresh(self) -> tuple[list[str], list[str], list[str]]:
+        """Apply directory changes once; return (added, rebuilt, removed) paths."""
+
+        self.stats.polls += 1
+        try:
+            listed = list_target_images(self.targets_dir)
+        except OSError:
+            # The directory vanished or is being replaced; keep what we have.
+            return [], [], []
+
+        states: dict[str, _FileState] = {}
+        dirty: list[str] = []
+        for _, path in listed:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            profile_mtime = _mtime_ns(sidecar_path(path))
+            old = self._files.get(path)
+            if old is not None and (old.mtime_ns, old.size, old.profile_mtime_ns) == (
+                st.st_mtime_ns,
+                st.st_size,
+                profile_mtime,
+            ):
+                states[path] = old
+                continue
+            try:
+                digest = content_hash(path)
+            except OSError:
+                continue
+
+            if old is not None and not old.broken and old.profile_mtime_ns == profile_mtime:
+                states[path] = _FileState(st.st_mtime_ns, st.st_size, digest, profile_mtime, old.priority)
+                # A touched file with identical content needs no rebuild.
+                if old.digest != digest:
+                    dirty.append(path)
+                continue
+
+            try:
+                profile = load_profile(path)
+            except ProfileError as e:
+                print(f"Warning: ignoring target {os.path.basename(path)} until its profile is fixed: {e}")
+                self.stats.failed += 1
+                states[path] = _FileState(st.st_mtime_ns, st.st_size, digest, profile_mtime, broken=True)
+                continue
+            # Set before building, so variants are built at the profile's scales.
+            self.matcher.set_profile(path, profile)
+            priority = profile.priority if profile is not None else 0
+            states[path] = _FileState(st.st_mtime_ns, st.st_size, digest, profile_mtime, priority)
+            dirty.append(path)
+
+        active = {p for p, st in states.items() if not st.broken}
+        removed = [p for p, st in self._files.items() if not st.broken and p not in active]
+        if not dirty and not removed and len(active) == len(self._targets):
+            self._files = states
+            return [], [], []
+
+        start = time.perf_counter()
+        built = self._build(dirty, [(n, p) for n, p in listed if p in active])
+        added: list[str] = []
+        rebuilt: list[str] = []
+        for path in dirty:
+            variants = built.get(path)
+            if variants is None:
+                # Probably still being written; retry on the next poll.
+                self.stats.failed += 1
+                states.pop(path, None)
+                active.discard(path)
+                continue
+            if path in self._files and not self._files[path].broken:
+                # New content at the same path: drop old variants and stale hit positions.
+                self.matcher.evict(path)
+                rebuilt.append(path)
+            else:
+                added.append(path)
+            self.matcher.add_variants(path, variants)
+            if self.store is not None and path in self.store.features:
+                self.matcher.add_features(path, self.store.features[path])
+
+        for path in removed:
+            self.matcher.evict(path)
+            self.matcher.set_profile(path, None)
+
+        self._files = states
+        # Stable sort: equal priorities keep the directory order.
+        self._targets = sorted(((n, p) for n, p in listed if p in active), key=lambda t: -states[t[1]].priority)
+        if added or rebuilt or removed:
+            # Swapped before the generation moves on, so a reader never sees the new generation without its paths.
+            built_in = {p: g for p, g in self._built_in.items() if p in active}
+            built_in.update((p, self.generation + 1) for p in added + rebuilt)
+            self._built_in = built_in
+            self.generation += 1
+        self.stats.added += len(added)
+        self.stats.rebuilt += len(rebuilt)
+        self.stats.removed += len(removed)
+        self.stats.last_apply_ms = (time.perf_counter() - start) * 1000.0
+        return added, rebuilt, removed
+
+    def _build(self, paths: list[str], listed: list[tuple[str, str]]) -> dict[str, dict[float, TemplateVariant]]:
+        if not paths:
+            return {}
+        if self.store is not None:
+            try:
+                # Unchanged entries come back as mappings of the existing store file.
+                per_target = {}
+                for _, path in listed:
+                    tuned = self.matcher.for_target(path)
+                    if tuned is not self.matcher:
+                        per_target[path] = (tuned.scales, tuned.grayscale)
+                variants = self.store.load(listed, self.matcher.scales, self.matcher.grayscale, per_target)
+                return {p: variants[p] for p in paths}
+            except Exception:
+                # One unreadable image fails the whole batch; build one by one instead.
+                pass
+
+        built: dict[str, dict[float, TemplateVariant]] = {}
+        for path in paths:
+            try:
+                with Image.open(path) as base:
+                    base.load()
+                    built[path] = {scale: make_variant(base, scale) for scale in self.matcher.for_target(path).scales}
+            except Exception:
+                continue
+        return built
+
+    def summary(self) -> str:
+        cache_mb = self.matcher.cache_bytes / (1024 * 1024)
+        budget = self.matcher.max_cache_bytes / (1024 * 1024)
+        limit = f"{budget:.1f} MB" if budget else "unbounded"
+        return (
+            f"{len(self._targets)} targets, cache {cache_mb:.1f} MB / {limit} "
+            f"({len(self.matcher.cached_paths)} loaded, {self.matcher.cache_evictions} evicted), "
+            f"{self.stats.summary()}"
+        )
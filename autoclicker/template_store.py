@@ -0,0 +1,228 @@
+"""Compiled on-disk template store.
+
+One uncompressed `.npz` holds every target's BGR and gray arrays at every
+configured scale, plus the ORB keypoints of the original image used by
+`features` search. Entries are keyed by the PNG's content hash, the scale list
+and the grayscale flag, so renaming a file costs nothing and only changed
+files are rebuilt. At startup the file is memory-mapped and its arrays are used
+in place (numpy cannot mmap `.npz` members itself, so the zip entries are
+located by hand; this works because `np.savez` stores them uncompressed).
+
+A mapped file cannot be replaced on Windows while variants still use it, so
+updates go to a new generation of the file (`template_cache.1.npz`,
+`template_cache.2.npz`, ...) and older generations are deleted once nothing
+maps them anymore.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import time
+import zipfile
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from .features import TemplateFeatures, template_features
+from .match import TemplateVariant, make_variant
+
+
+def content_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:20]
+
+
+def entry_key(digest: str, scales: list[float], grayscale: bool) -> str:
+    scale_part = "-".join(f"{s:g}" for s in scales).replace(".", "p")
+    return f"{digest}_{scale_part}_{'g' if grayscale else 'c'}"
+
+
+@dataclass
+class StoreStats:
+    cached: int = 0
+    rebuilt: int = 0
+    load_ms: float = 0.0
+
+    def summary(self) -> str:
+        return f"{self.cached} cached, {self.rebuilt} rebuilt, {self.load_ms:.1f} ms"
+
+
+def _member_arrays(path: str, mm: mmap.mmap) -> dict[str, np.ndarray]:
+    """Map every `.npy` member of an uncompressed zip to a read-only array over `mm`."""
+
+    arrays: dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED or not info.filename.endswith(".npy"):
+                continue
+            # Local file header: fixed 30 bytes, then file name and extra field.
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if fortran or dtype.hasobject:
+                continue
+
+            count = int(np.prod(shape)) if shape else 1
+            arr = np.frombuffer(mm, dtype=dtype, count=count, offset=f.tell()).reshape(shape)
+            arrays[info.filename[: -len(".npy")]] = arr
+    return arrays
+
+
+class TemplateStore:
+    """Loads target variants from (and keeps up to date) one compiled `.npz` file.
+
+    `path` names the store; the newest of its generations is the one read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = StoreStats()
+        # Keypoints per target path, from the last `load`.
+        self.features: dict[str, TemplateFeatures] = {}
+        self._mm: mmap.mmap | None = None
+        self._file = None
+
+    def _generations(self) -> list[tuple[int, str]]:
+        """(generation, file) of every generation on disk, oldest first; `path` itself is generation 0."""
+
+        directory, name = os.path.split(os.path.abspath(self.path))
+        root, ext = os.path.splitext(name)
+        pattern = re.compile(re.escape(root) + r"\.(\d+)" + re.escape(ext))
+        found = [(0, self.path)] if os.path.exists(self.path) else []
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            names = []
+        for entry in names:
+            match = pattern.fullmatch(entry)
+            if match:
+                found.append((int(match.group(1)), os.path.join(directory, entry)))
+        return sorted(found)
+
+    def _prune(self, current: str) -> None:
+        for _, path in self._generations():
+            if path == current:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped (Windows) by a live variant or another process; retried on the next load.
+                pass
+
+    def close(self) -> None:
+        # Variants handed out keep the mapping alive; only drop our references.
+        self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self) -> dict[str, np.ndarray]:
+        self.close()
+        generations = self._generations()
+        if not generations:
+            return {}
+        path = generations[-1][1]
+        self._prune(path)
+        try:
+            self._file = open(path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return _member_arrays(path, self._mm)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Unreadable or truncated store: rebuild everything.
+            self.close()
+            return {}
+
+    def load(
+        self,
+        targets: list[tuple[str, str]],
+        scales: list[float],
+        grayscale: bool,
+        per_target: dict[str, tuple[list[float], bool]] | None = None,
+    ) -> dict[str, dict[float, TemplateVariant]]:
+        """Return variants per target path, rebuilding and re-saving stale entries.
+
+        `per_target` overrides (scales, grayscale) for targets with a profile.
+        """
+
+        start = time.perf_counter()
+        self.stats = StoreStats()
+        settings = {path: (per_target or {}).get(path, (scales, grayscale)) for _, path in targets}
+        keys = {path: entry_key(content_hash(path), *settings[path]) for _, path in targets}
+        wanted = set(keys.values())
+
+        arrays = self._open()
+        missing = sorted(k for k in wanted if f"{k}__0_bgr" not in arrays or f"{k}__features_desc" not in arrays)
+
+        # Rewrite when entries are missing, and to prune entries no target uses anymore.
+        if missing or {n.split("__")[0] for n in arrays} != wanted:
+            # Copy the still-valid entries out of the mapping; the new generation holds copies.
+            keep = {name: np.array(arr) for name, arr in arrays.items() if name.split("__")[0] in wanted}
+            arrays = None
+            self.close()
+
+            paths_by_key = {k: p for p, k in keys.items()}
+            for key in missing:
+                with Image.open(paths_by_key[key]) as base:
+                    base.load()
+                    for i, scale in enumerate(settings[paths_by_key[key]][0]):
+                        variant = make_variant(base, scale)
+                        keep[f"{key}__{i}_bgr"] = variant.bgr
+                        keep[f"{key}__{i}_gray"] = variant.gray
+                    features = template_features(make_variant(base, 1.0).gray)
+                    keep[f"{key}__features_points"] = features.points
+                    keep[f"{key}__features_desc"] = features.descriptors
+                    keep[f"{key}__features_size"] = np.array([features.width, features.height], dtype=np.int32)
+            self._save(keep)
+            arrays = self._open()
+            if any(f"{k}__0_bgr" not in arrays or f"{k}__features_desc" not in arrays for k in wanted):
+                # The new generation could not be written (e.g. a read-only folder).
+                arrays = keep
+
+        result: dict[str, dict[float, TemplateVariant]] = {}
+        for path, key in keys.items():
+            result[path] = {
+                scale: TemplateVariant(scale=scale, bgr=arrays[f"{key}__{i}_bgr"], gray=arrays[f"{key}__{i}_gray"])
+                for i, scale in enumerate(settings[path][0])
+            }
+        self.features = {}
+        for path, key in keys.items():
+            width, height = (int(v) for v in arrays[f"{key}__features_size"])
+            self.features[path] = TemplateFeatures(
+                arrays[f"{key}__features_points"], arrays[f"{key}__features_desc"], width, height
+            )
+
+        self.stats.rebuilt = len(missing)
+        self.stats.cached = len(wanted) - len(missing)
+        self.stats.load_ms = (time.perf_counter() - start) * 1000.0
+        return result
+
+    def _save(self, arrays: dict[str, np.ndarray]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        generations = self._generations()
+        # Never overwrite a generation: live variants (or other processes) may still map it.
+        root, ext = os.path.splitext(self.path)
+        path = f"{root}.{generations[-1][0] + 1}{ext}" if generations else self.path
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Warning: could not write template store {path}: {type(e).__name__}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from autoclicker.bench import plant, render_button, synthetic_desktop
+from autoclicker.capture import bgra_to_pil
+from autoclicker.fftmatch import MIN_TEMPLATE_AREA_COLOR, MIN_TEMPLATE_AREA_GRAY
+from autoclicker.match import OpenCVMatchEngine, PreparedHaystack, make_variant
+
+EPSILON = 5e-3
+CONFIDENCE = 0.9
+
+# (width, height, grayscale): templates just below and just above the size from which
+# `auto` correlates in the frequency domain, on a 1080p haystack.
+SIZES = [
+    (299, MIN_TEMPLATE_AREA_GRAY // 300, True),
+    (301, MIN_TEMPLATE_AREA_GRAY // 300, True),
+    (124, MIN_TEMPLATE_AREA_COLOR // 125, False),
+    (126, MIN_TEMPLATE_AREA_COLOR // 125, False),
+]
+
+
+@pytest.mark.parametrize("width,height,grayscale", SIZES)
+def test_fft_matches_spatial_correlation(width, height, grayscale):
+    frame = synthetic_desktop(1920, 1080, seed=width)
+    button = render_button("Continue", width=width, height=height, seed=width)
+    expected = plant(frame, button, 700, 400)
+    decoy = button.copy()
+    decoy[..., :3] //= 2
+    plant(frame, decoy, 100, 600)
+    variant = make_variant(bgra_to_pil(button), 1.0)
+    haystack = PreparedHaystack(frame)
+    spatial, fft, auto = OpenCVMatchEngine("spatial"), OpenCVMatchEngine("fft"), OpenCVMatchEngine("auto")
+
+    hay, needle = haystack.view(grayscale), variant.array(grayscale)
+    bound = MIN_TEMPLATE_AREA_GRAY if grayscale else MIN_TEMPLATE_AREA_COLOR
+    assert auto.correlator.use_fft(hay, needle) == (width * height >= bound)
+
+    found = spatial.find(variant, haystack, None, CONFIDENCE, grayscale)
+    assert found is not None and max(abs(found[0] - expected[0]), abs(found[1] - expected[1])) <= 2
+    # The first location in row-major order above the confidence, on every path.
+    assert fft.find(variant, haystack, None, CONFIDENCE, grayscale) == found
+    assert auto.find(variant, haystack, None, CONFIDENCE, grayscale) == found
+
+    reference = spatial._response(hay, needle, haystack, None, grayscale)
+    response = fft._response(hay, needle, haystack, None, grayscale)
+    assert reference.shape == response.shape
+    assert float(np.abs(reference - response).max()) <= EPSILON
+    x, y = found[0] - width // 2, found[1] - height // 2
+    assert abs(float(response[y, x]) - float(reference[y, x])) <= EPSILON
@@ -0,0 +1,27 @@
+import dataclasses
+
+import pytest
+
+from autoclicker.benchsuite import Scenario, run_accuracy
+
+BASE = Scenario()
+
+
+@pytest.mark.parametrize(
+    "scenario",
+    [
+        BASE,
+        # Small icons get fewer pyramid levels; they must not vanish.
+        dataclasses.replace(BASE, template=(60, 24)),
+        dataclasses.replace(BASE, template=(240, 72)),
+        dataclasses.replace(BASE, scales=(0.8, 1.0, 1.25)),
+        dataclasses.replace(BASE, grayscale=False),
+    ],
+    ids=lambda sc: sc.name,
+)
+def test_pyramid_finds_what_the_scale_loop_finds(scenario):
+    # Every planted button, every decoy and the painted-out frame: within 2 px of the brute-force search.
+    result = run_accuracy(scenario, decoys=2, repeat=1)
+    assert result["disagreements"] == []
+    assert result["planted_found"]["pyramid"] == result["planted_found"]["scales"] == result["targets"]
+    assert result["false_positives"]["pyramid"] == result["false_positives"]["scales"]
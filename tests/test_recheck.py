@@ -0,0 +1,66 @@
+import dataclasses
+
+import cv2
+import numpy as np
+
+from autoclicker.app import AutoClickerApp
+from autoclicker.capture import SyntheticCaptureBackend, VirtualDesktopCapture
+from autoclicker.click import RecordingClickBackend
+from autoclicker.config import load_config
+from autoclicker.targets import TargetIndex
+
+POSITIONS = [(80, 60), (300, 60), (180, 220)]
+
+
+def _button() -> np.ndarray:
+    # A soft-edged flat button: its response stays above the confidence for a
+    # few pixels around the peak, so the first such location is not the peak.
+    button = np.full((48, 64, 3), 40, np.uint8)
+    cv2.rectangle(button, (12, 12), (52, 36), (200, 180, 160), -1)
+    return cv2.GaussianBlur(button, (0, 0), 6)
+
+
+def _app(tmp_path, find_all: bool) -> AutoClickerApp:
+    button = _button()
+    targets = tmp_path / "targets"
+    targets.mkdir()
+    cv2.imwrite(str(targets / "button.png"), button)
+    frame = np.full((320, 480, 4), 40, np.uint8)
+    for x, y in POSITIONS:
+        frame[y : y + button.shape[0], x : x + button.shape[1], :3] = button
+    config = dataclasses.replace(
+        load_config(),
+        find_all=find_all,
+        max_clicks_per_frame=len(POSITIONS),
+        change_detection=False,
+        locality=False,
+        hit_order=False,
+        cold_every=0,
+        log_clicks=False,
+        record_dir="",
+        metrics=False,
+        template_cache="",
+        scales=[1.0],
+    )
+    app = AutoClickerApp(
+        config,
+        capture=VirtualDesktopCapture(SyntheticCaptureBackend(frames=[frame])),
+        clicker=RecordingClickBackend(),
+    )
+    app.targets = TargetIndex(str(targets), app.matcher)
+    app.targets.refresh()
+    return app
+
+
+def test_recheck_keeps_every_hit_of_an_unchanged_frame(tmp_path):
+    app = _app(tmp_path, find_all=True)
+    clicked = app.scan_once()
+    assert len(clicked) == len(POSITIONS)
+    assert app.cooldowns.stats.stale_hits == 0
+
+
+def test_recheck_keeps_the_hit_of_an_unchanged_frame_without_find_all(tmp_path):
+    app = _app(tmp_path, find_all=False)
+    hit = app._find_first(app.targets.targets, app.capture.screenshot().pixels, None)
+    capture = app.capture.screenshot()
+    assert app._recheck(hit, capture, app.capture.screenshot, None) is not None
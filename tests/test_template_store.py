@@ -0,0 +1,50 @@
+import os
+
+import cv2
+import numpy as np
+
+from autoclicker import template_store
+from autoclicker.template_store import TemplateStore
+
+
+def _targets(tmp_path, count: int) -> list[tuple[str, str]]:
+    rng = np.random.default_rng(0)
+    targets = []
+    for i in range(count):
+        path = str(tmp_path / f"t{i}.png")
+        cv2.imwrite(path, rng.integers(0, 256, size=(30, 40, 3), dtype=np.uint8))
+        targets.append((f"t{i}.png", path))
+    return targets
+
+
+def test_reload_while_the_old_file_is_mapped(tmp_path, monkeypatch, capsys):
+    targets = _targets(tmp_path, 3)
+    store = TemplateStore(str(tmp_path / "cache" / "template_cache.npz"))
+    live = store.load(targets[:2], [1.0, 1.5], True)
+
+    # As on Windows: a file that live variants still map can be neither replaced nor deleted.
+    real_remove, real_replace = os.remove, os.replace
+
+    def mapped(path):
+        raise PermissionError(path)
+
+    def replace(src, dst):
+        if os.path.exists(dst):
+            mapped(dst)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(template_store.os, "remove", mapped)
+    monkeypatch.setattr(template_store.os, "replace", replace)
+    reloaded = store.load(targets, [1.0, 1.5], True)
+    assert store.stats.rebuilt == 1 and store.stats.cached == 2
+    assert "Warning" not in capsys.readouterr().out
+    assert np.array_equal(live[targets[0][1]][1.0].gray, reloaded[targets[0][1]][1.0].gray)
+    assert sorted(os.listdir(tmp_path / "cache")) == ["template_cache.1.npz", "template_cache.npz"]
+
+    # A fresh store reads the newest generation; the old one goes once it can be deleted.
+    monkeypatch.setattr(template_store.os, "remove", real_remove)
+    monkeypatch.setattr(template_store.os, "replace", real_replace)
+    other = TemplateStore(store.path)
+    other.load(targets, [1.0, 1.5], True)
+    assert other.stats.rebuilt == 0
+    assert os.listdir(tmp_path / "cache") == ["template_cache.1.npz"]